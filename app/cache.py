@@ -0,0 +1,161 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+
+_MISSING = object()
+
+
+class LRUTTLCache:
+    """Thread-safe LRU cache whose entries expire after ``ttl`` seconds."""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def generation(self) -> int:
+        with self._lock:
+            return self._generation
+
+    def set(self, key: Hashable, value: Any, generation: int = None) -> None:
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            # Even for a missing key, a load may be in flight
+            self._generation += 1
+            if self._entries.pop(key, _MISSING) is not _MISSING:
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+
+class ReferenceCache:
+    """Per-entity snapshots of small tables, reloaded on expiry or ``bump()``."""
+
+    def __init__(self, default_ttl: float = 600.0):
+        self.default_ttl = default_ttl
+        self._loaders: dict[str, tuple[Callable[[Any], Any], float]] = {}
+        self._versions: dict[str, int] = {}
+        self._snapshots: dict[str, tuple[int, float, Any]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bumps = 0
+
+    def register(
+        self, entity: str, loader: Callable[[Any], Any], ttl: float = None
+    ) -> None:
+        """``loader(session)`` builds the snapshot of ``entity``."""
+        with self._lock:
+            self._loaders[entity] = (loader, self.default_ttl if ttl is None else ttl)
+
+    def get(self, entity: str, session) -> Any:
+        with self._lock:
+            loader, ttl = self._loaders[entity]
+            version = self._versions.get(entity, 0)
+            snapshot = self._snapshots.get(entity)
+            if (
+                snapshot is not None
+                and snapshot[0] == version
+                and snapshot[1] > time.monotonic()
+            ):
+                self.hits += 1
+                return snapshot[2]
+            self.misses += 1
+        value = loader(session)
+        with self._lock:
+            if self._versions.get(entity, 0) == version:
+                self._snapshots[entity] = (version, time.monotonic() + ttl, value)
+        return value
+
+    def bump(self, entity: str) -> int:
+        """Mark ``entity`` as changed; returns its new version."""
+        with self._lock:
+            version = self._versions.get(entity, 0) + 1
+            self._versions[entity] = version
+            self._snapshots.pop(entity, None)
+            self.bumps += 1
+            return version
+
+    def clear(self) -> None:
+        with self._lock:
+            for entity in self._loaders:
+                self._versions[entity] = self._versions.get(entity, 0) + 1
+            self._snapshots.clear()
+
+    def version(self, entity: str) -> int:
+        with self._lock:
+            return self._versions.get(entity, 0)
+
+    def warm(self, session, entities: list[str] = None) -> list[str]:
+        """Load the snapshots of ``entities`` (default: all registered)."""
+        entities = list(self._loaders) if entities is None else entities
+        for entity in entities:
+            self.get(entity, session)
+        return entities
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entities": {
+                    entity: {
+                        "version": self._versions.get(entity, 0),
+                        "ttl": ttl,
+                        "loaded": entity in self._snapshots,
+                    }
+                    for entity, (_, ttl) in self._loaders.items()
+                },
+                "hits": self.hits,
+                "misses": self.misses,
+                "bumps": self.bumps,
+            }
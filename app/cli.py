@@ -0,0 +1,149 @@
+"""Maintenance commands, run as ``python -m app.cli <command>``."""
+import argparse
+import sys
+
+from app.database import SessionLocal
+from app.services import asset_import
+from app.services import feature_group as feature_group_service
+from app.services import folder as folder_service
+from app.services import folder_visibility as folder_visibility_service
+from app.services import tag_usage
+
+
+def rebuild_feature_group_closure(args, session):
+    rows = feature_group_service.rebuild_featureGroup_closure(session=session)
+    print(f"feature_group_closure rebuilt with {rows} rows")
+
+
+def backfill_folder_paths(args, session):
+    orphans = folder_service.backfill_folder_paths(session=session)
+    print(f"folder paths backfilled, {orphans} folders unreachable from a root")
+
+
+def dedupe_folder_assets(args, session):
+    removed = folder_service.dedupe_folder_assets(session=session)
+    print(f"{removed} duplicate folder/asset links removed")
+
+
+def rebuild_user_visible_folders(args, session):
+    rows = folder_visibility_service.rebuild_user_visible_folders(session=session)
+    print(f"user_visible_folders rebuilt with {rows} rows")
+
+
+def check_user_visible_folders(args, session):
+    diff = folder_visibility_service.check_user_visible_folders(session=session)
+    for row in diff["missing"]:
+        print(f"missing user_id={row[0]} folder_id={row[1]} source={row[2]}")
+    for row in diff["extra"]:
+        print(f"extra user_id={row[0]} folder_id={row[1]} source={row[2]}")
+    print(f"{len(diff['missing'])} missing, {len(diff['extra'])} extra")
+    if diff["missing"] or diff["extra"]:
+        sys.exit(1)
+
+
+def reconcile_tag_usage(args, session):
+    fixed = tag_usage.reconcile_tag_usage(session=session, client_id=args.client_id)
+    print(
+        f"tag_usage_counters reconciled: {fixed['created']} created, "
+        f"{fixed['corrected']} corrected, {fixed['removed']} removed"
+    )
+
+
+def _reconcile_tag_usage_arguments(parser):
+    parser.add_argument("--client-id", type=int, help="Only this client's tags")
+
+
+def import_assets(args, session):
+    format = args.format or ("csv" if args.path.endswith(".csv") else "ndjson")
+
+    def report(summary):
+        print(
+            f"{summary.rows} rows: {summary.created} created, "
+            f"{summary.updated} updated, {summary.failed} failed "
+            f"({summary.rows_per_second} rows/s)",
+            file=sys.stderr,
+        )
+
+    importer = asset_import.AssetImporter(
+        session=session,
+        user_id=args.user_id,
+        format=format,
+        on_chunk=report,
+        chunk_size=args.chunk_size,
+    )
+    with open(args.path, "rb") as lines:
+        importer.feed(lines)
+    summary = importer.finish()
+    for error in summary.errors:
+        print(f"line {error.line}: {error.detail}")
+    report(summary)
+    if summary.failed:
+        sys.exit(1)
+
+
+def _import_assets_arguments(parser):
+    parser.add_argument("path", help="NDJSON or CSV file to import")
+    parser.add_argument("--user-id", type=int, required=True, help="created_by")
+    parser.add_argument("--format", choices=asset_import.IMPORT_FORMATS)
+    parser.add_argument(
+        "--chunk-size", type=int, default=asset_import.IMPORT_CHUNK_SIZE
+    )
+
+
+COMMANDS = {
+    "rebuild-feature-group-closure": (
+        rebuild_feature_group_closure,
+        "Recompute feature_group_closure from the parent/child edges",
+    ),
+    "backfill-folder-paths": (
+        backfill_folder_paths,
+        "Recompute folders.path and folders.depth from parent_id",
+    ),
+    "dedupe-folder-assets": (
+        dedupe_folder_assets,
+        "Remove duplicate folders_assets rows before adding the unique key",
+    ),
+    "rebuild-user-visible-folders": (
+        rebuild_user_visible_folders,
+        "Recompute the user_visible_folders index",
+    ),
+    "check-user-visible-folders": (
+        check_user_visible_folders,
+        "Diff user_visible_folders against the live derivation",
+    ),
+    "reconcile-tag-usage": (
+        reconcile_tag_usage,
+        "Recompute tag_usage_counters from assets_tags and fix drift",
+    ),
+    "import-assets": (
+        import_assets,
+        "Upsert assets from an NDJSON/CSV file by (client_id, external_id)",
+    ),
+}
+
+# Extra command-line arguments per command
+ARGUMENTS = {
+    "reconcile-tag-usage": _reconcile_tag_usage_arguments,
+    "import-assets": _import_assets_arguments,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for name, (_, help_text) in COMMANDS.items():
+        subparser = subparsers.add_parser(name, help=help_text)
+        if name in ARGUMENTS:
+            ARGUMENTS[name](subparser)
+    args = parser.parse_args(argv)
+
+    handler, _ = COMMANDS[args.command]
+    session = SessionLocal()
+    try:
+        handler(args, session)
+    finally:
+        session.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
 import os
-from typing import Annotated
+from typing import Annotated, Callable
 
 from fastapi import Depends
 from sqlalchemy import create_engine
@@ -20,3 +20,13 @@ def get_db():
 
 
 db_dependency = Annotated[Session, Depends(get_db)]
+
+
+def get_session_factory() -> Callable[[], Session]:
+    # For work that outlives the request's session, e.g. streamed responses
+    return SessionLocal
+
+
+session_factory_dependency = Annotated[
+    Callable[[], Session], Depends(get_session_factory)
+]
@@ -1,4 +1,10 @@
+import logging
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.database import SessionLocal
 from app.routes.folder import router as folder_router
 from app.routes.assets import router as assets_router
 from app.routes.language import router as language_router
@@ -7,9 +13,25 @@ from app.routes.feature import router as feature_router
 from app.routes.feature_group import router as featureGroup_router
 from app.routes.market import router as market_router
 from app.routes.user import router as user_router
+from app.services.reference import warm_reference_cache
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    session = SessionLocal()
+    try:
+        warm_reference_cache(session)
+    except SQLAlchemyError:
+        # Reads load the snapshots lazily if the database isn't reachable yet
+        logger.exception("Reference cache warm-up failed")
+    finally:
+        session.close()
+    yield
 
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 
 @app.get("/")
@@ -6,13 +6,17 @@ from sqlalchemy import (
     DateTime,
     Float,
     ForeignKey,
+    Index,
     Integer,
     String,
+    UniqueConstraint,
+    func,
+    select,
     text,
     Boolean,
 )
 from sqlalchemy.dialects.mysql import ENUM, TINYINT, VARCHAR
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import column_property, relationship
 from sqlalchemy.ext.declarative import declarative_base
 
 Base = declarative_base()
@@ -52,6 +56,16 @@ class Asset(Base):
     )
     asset_type = Column(ENUM("LINK", "DOCUMENT", "IMAGE", "VIDEO"))
 
+    __table_args__ = (
+        Index("ix_assets_client_id_id", "client_id", "id"),
+        Index("ix_assets_client_id_asset_type", "client_id", "asset_type"),
+        Index(
+            "ix_assets_client_id_external_id", "client_id", "external_id", unique=True
+        ),
+        # High-water mark polled by the search index
+        Index("ix_assets_updated_at", "updated_at"),
+    )
+
 
 class Document(Asset):
     __tablename__ = "documents"
@@ -157,6 +171,17 @@ class Folder(Base):
     deleted_by = Column(
         Integer, nullable=True, comment="A reference to the ID of the user"
     )
+    path = Column(
+        VARCHAR(767),
+        index=True,
+        comment="Ids from the root down to this folder, e.g. /1/5/23/",
+    )
+    depth = Column(
+        Integer,
+        nullable=False,
+        server_default=text("'0'"),
+        comment="0 for root folders",
+    )
 
     parent = relationship("Folder", remote_side=[id], backref="subfolders")
 
@@ -213,6 +238,11 @@ class User(Base):
 
 class AssetsFolder(Base):
     __tablename__ = "folders_assets"
+    __table_args__ = (
+        UniqueConstraint(
+            "folder_id", "asset_id", name="uq_folders_assets_folder_id_asset_id"
+        ),
+    )
 
     id = Column(Integer, primary_key=True)
     asset_id = Column(
@@ -293,6 +323,26 @@ class FeatureGroupsFeatureGroup(Base):
     )
 
 
+class FeatureGroupClosure(Base):
+    __tablename__ = "feature_group_closure"
+
+    ancestor_id = Column(
+        ForeignKey("feature_groups.id", ondelete="CASCADE", onupdate="CASCADE"),
+        primary_key=True,
+    )
+    descendant_id = Column(
+        ForeignKey("feature_groups.id", ondelete="CASCADE", onupdate="CASCADE"),
+        primary_key=True,
+        index=True,
+    )
+    depth = Column(
+        Integer,
+        nullable=False,
+        server_default=text("'0'"),
+        comment="Length of the shortest parent/child path; 0 is the group itself",
+    )
+
+
 class FeatureGroupsFeature(Base):
     __tablename__ = "feature_groups_features"
 
@@ -387,3 +437,52 @@ class UsersFolder(Base):
 
     folder = relationship("Folder")
     user = relationship("User")
+
+
+class UserVisibleFolder(Base):
+    __tablename__ = "user_visible_folders"
+
+    user_id = Column(
+        ForeignKey("users.id", ondelete="CASCADE", onupdate="CASCADE"),
+        primary_key=True,
+    )
+    folder_id = Column(
+        ForeignKey("folders.id", ondelete="CASCADE", onupdate="CASCADE"),
+        primary_key=True,
+        index=True,
+    )
+    source = Column(
+        ENUM("feature_group", "board"),
+        nullable=False,
+        comment="Feature-group folder of the user's market, or a board of the user",
+    )
+
+
+class TagUsageCounter(Base):
+    __tablename__ = "tag_usage_counters"
+    __table_args__ = (
+        Index("ix_tag_usage_counters_client_id_usage_count", "client_id", "usage_count"),
+    )
+
+    tag_id = Column(
+        ForeignKey("tags.id", ondelete="CASCADE", onupdate="CASCADE"),
+        primary_key=True,
+    )
+    client_id = Column(Integer, nullable=False)
+    usage_count = Column(
+        Integer,
+        nullable=False,
+        server_default=text("'0'"),
+        comment="Links of the tag to non-deleted assets",
+    )
+
+
+Tag.usage_count = column_property(
+    func.coalesce(
+        select(TagUsageCounter.usage_count)
+        .where(TagUsageCounter.tag_id == Tag.id)
+        .correlate_except(TagUsageCounter)
+        .scalar_subquery(),
+        0,
+    )
+)
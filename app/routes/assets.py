@@ -1,77 +1,175 @@
-from typing import List
+import logging
+from typing import List, Optional
 from datetime import datetime, timezone
-from fastapi import HTTPException, APIRouter
+from fastapi import HTTPException, APIRouter, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 
 from fastapi import Depends
-from app.database import db_dependency
-from app.schemas.asset import AssetRead, AssetCreate, AssetUpdate
+from app.database import db_dependency, session_factory_dependency
+from app.schemas.asset import (
+    AssetBatchItem,
+    AssetBatchResult,
+    AssetCreate,
+    AssetFacets,
+    AssetFilters,
+    AssetImportSummary,
+    AssetRead,
+    AssetUpdate,
+    AssetsTagsResult,
+    AssetsTagsUpdate,
+)
 from app.services import asset as asset_service
+from app.services import asset_export
+from app.services import asset_import
 from app.services import folder as folder_service
-from app.services import user as user_service
+from app.services import tag as tag_service
 from app.schemas.asset import AssetType, DeleteAsset
 from app.routes.utils import (
-    check_user,
     check_folder_permission,
     check_asset,
-    user_has_root_feature,
-    user_has_corporate_feature,
+    parse_asset_filters,
+    parse_asset_include,
+    permission_dependency,
+    set_next_cursor,
 )
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 
 # Get all the assets the user has access to
 @router.get("/", response_model=List[AssetRead])
 def read_assets(
     db: db_dependency,
+    ctx: permission_dependency,
+    response: Response,
     page: int = 0,
-    limit: int = 5,
-    user: user_service.User = Depends(check_user),
+    limit: int = Query(5, ge=1),
+    cursor: Optional[str] = None,
+    include: set[str] = Depends(parse_asset_include),
+    filters: AssetFilters = Depends(parse_asset_filters),
 ):
-    if user_service.user_has_feature(user_id=user.id, feature_slug="root", session=db):
-        assets = asset_service.get_all_assets(session=db, page=page, limit=limit)
-    elif user_service.user_has_feature(
-        user_id=user.id, feature_slug="corporate", session=db
-    ):
-        assets = asset_service.get_client_assets(
-            client_id=user.client_id, session=db, page=page, limit=limit
+    user = ctx.user
+    try:
+        if ctx.is_root:
+            assets, next_cursor = asset_service.get_all_assets(
+                session=db, page=page, limit=limit, cursor=cursor, filters=filters
+            )
+        elif ctx.is_corporate:
+            assets, next_cursor = asset_service.get_client_assets(
+                client_id=ctx.client_id,
+                session=db,
+                page=page,
+                limit=limit,
+                cursor=cursor,
+                filters=filters,
+            )
+        else:
+            assets, next_cursor = asset_service.get_user_visible_assets(
+                user_id=user.id,
+                session=db,
+                page=page,
+                limit=limit,
+                cursor=cursor,
+                filters=filters,
+            )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    set_next_cursor(response, next_cursor)
+    return asset_service.serialize_assets(assets=assets, session=db, include=include)
+
+
+# Counts per facet of the assets GET / would list with the same filters
+@router.get("/facets", response_model=AssetFacets)
+def read_asset_facets(
+    db: db_dependency,
+    ctx: permission_dependency,
+    filters: AssetFilters = Depends(parse_asset_filters),
+):
+    if ctx.is_root:
+        return asset_service.get_asset_facets(session=db, filters=filters)
+    if ctx.is_corporate:
+        return asset_service.get_asset_facets(
+            session=db, client_id=ctx.client_id, filters=filters
+        )
+    return asset_service.get_asset_facets(
+        session=db, user_id=ctx.user.id, filters=filters
+    )
+
+
+@router.get("/export")
+def export_assets(
+    sessions: session_factory_dependency,
+    ctx: permission_dependency,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    filters: AssetFilters = Depends(parse_asset_filters),
+):
+    if ctx.is_root:
+        rows = asset_export.stream_asset_rows(sessions, filters=filters)
+    elif ctx.is_corporate:
+        rows = asset_export.stream_asset_rows(
+            sessions, client_id=ctx.client_id, filters=filters
         )
     else:
-        fgs = user_service.fetch_all_feature_groups(user_id=user.id, session=db)
-        folders_fgs = folder_service.get_user_regular_folders(
-            user=user, user_feature_group_ids=[fg.id for fg in fgs], session=db
+        rows = asset_export.stream_asset_rows(
+            sessions, user_id=ctx.user.id, filters=filters
         )
-        folders_boards = folder_service.get_user_boards(user=user, session=db)
-        folder_ids = [f.id for f in folders_fgs + folders_boards]
-        assets = asset_service.get_folders_assets(
-            folder_ids=folder_ids, session=db, page=page, limit=limit
+    return StreamingResponse(
+        asset_export.ENCODERS[format](rows),
+        media_type=asset_export.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="assets.{format}"'},
+    )
+
+
+@router.get("/search", response_model=List[AssetRead])
+def search_assets(
+    db: db_dependency,
+    ctx: permission_dependency,
+    q: str = Query(..., min_length=1),
+    page: int = 0,
+    limit: int = 5,
+    include: set[str] = Depends(parse_asset_include),
+):
+    if ctx.is_root:
+        assets = asset_service.search_assets(
+            query=q, session=db, limit=limit, page=page
         )
-    return assets
+    elif ctx.is_corporate:
+        assets = asset_service.search_assets(
+            query=q, session=db, client_id=ctx.client_id, limit=limit, page=page
+        )
+    else:
+        assets = asset_service.search_assets(
+            query=q, session=db, user_id=ctx.user.id, limit=limit, page=page
+        )
+    return asset_service.serialize_assets(assets=assets, session=db, include=include)
 
 
 @router.get("/{asset_id}", response_model=AssetRead)
 def get_asset(
     db: db_dependency,
     asset_id: int,
+    ctx: permission_dependency,
     parent_folder_id: int = None,
-    user: user_service.User = Depends(check_user),
+    include: set[str] = Depends(parse_asset_include),
 ):
+    user = ctx.user
     asset = asset_service.get_by_id(asset_id=asset_id, session=db)
 
     if not asset:
         raise HTTPException(status_code=404, detail="Asset not found")
 
-    if asset.is_deleted and not user_has_root_feature(user_id=user.id, session=db):
+    if asset.is_deleted and not ctx.is_root:
         raise HTTPException(status_code=404, detail="Asset not found")
 
-    if user_has_root_feature(user_id=user.id, session=db) or (
-        user_has_corporate_feature(user_id=user.id, session=db)
-        and user.client_id == asset.client_id
-    ):
-        return asset
+    if ctx.is_root or ctx.is_corporate_for(asset.client_id):
+        return asset_service.serialize_asset(asset=asset, session=db, include=include)
 
     if parent_folder_id:
         parent_folder = folder_service.get_by_id(folder_id=parent_folder_id, session=db)
+        if not parent_folder:
+            raise HTTPException(status_code=404, detail="Folder not found")
         folder_permission = folder_service.folder_is_accessible(
             user=user, folder=parent_folder, session=db
         )
@@ -85,48 +183,237 @@ def get_asset(
             status_code=403, detail="You don't have permission to access this asset"
         )
 
-    return asset
+    return asset_service.serialize_asset(asset=asset, session=db, include=include)
 
 
 @router.post("/", response_model=AssetRead)
 def create_asset(
     db: db_dependency,
     asset: AssetCreate,
-    user: user_service.User = Depends(check_user),
+    ctx: permission_dependency,
 ):
     if folder_id := asset.folder_id:
-        check_folder_permission(db, user, folder_id, "write")
+        check_folder_permission(db, ctx, folder_id, "write")
     asset_base = asset.model_dump(exclude={"folder_id", "metadata"})
     metadata = asset.metadata.model_dump(exclude_unset=True)
-    return asset_service.create_asset(
-        user_id=user.id,
+    db_asset = asset_service.create_asset(
+        user_id=ctx.user.id,
         asset_base=asset_base,
         session=db,
         metadata=metadata,
         asset_type=AssetType(asset.asset_type),
     )
+    return asset_service.serialize_asset(asset=db_asset, session=db)
+
+
+@router.post("/batch", response_model=List[AssetBatchResult])
+def create_assets(
+    db: db_dependency,
+    items: List[AssetBatchItem],
+    ctx: permission_dependency,
+):
+    if len(items) > asset_service.MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {asset_service.MAX_BATCH_SIZE} assets per batch",
+        )
+
+    # One permission check per distinct folder, failures reported per item
+    folder_errors = {}
+    for folder_id in {item.folder_id for item in items if item.folder_id}:
+        try:
+            check_folder_permission(db, ctx, folder_id, "write")
+        except HTTPException as e:
+            folder_errors[folder_id] = e
+    folders_clients = folder_service.get_folders_clients(
+        folders_ids=list({item.folder_id for item in items if item.folder_id}),
+        session=db,
+    )
+    tags_clients = tag_service.get_tags_clients(
+        tags_ids=list({tag_id for item in items for tag_id in item.tags_ids}),
+        session=db,
+    )
+
+    results = {}
+    accepted = []
+    for index, item in enumerate(items):
+        if item.folder_id in folder_errors:
+            error = folder_errors[item.folder_id]
+            results[index] = AssetBatchResult(
+                index=index, status_code=error.status_code, detail=error.detail
+            )
+        elif item.folder_id and folders_clients.get(item.folder_id) != item.client_id:
+            results[index] = AssetBatchResult(
+                index=index,
+                status_code=404,
+                detail=f"Folder {item.folder_id} not found for this client",
+            )
+        elif unknown := [
+            tag_id
+            for tag_id in item.tags_ids
+            if tags_clients.get(tag_id) != item.client_id
+        ]:
+            results[index] = AssetBatchResult(
+                index=index,
+                status_code=404,
+                detail=f"Tags not found for this client: {unknown}",
+            )
+        else:
+            accepted.append(index)
+
+    if accepted:
+        created = asset_service.create_assets(
+            user_id=ctx.user.id, items=[items[i] for i in accepted], session=db
+        )
+        serialized = asset_service.serialize_assets(assets=created, session=db)
+        for index, asset in zip(accepted, serialized):
+            results[index] = AssetBatchResult(
+                index=index, status_code=201, asset=asset
+            )
+
+    return [results[index] for index in range(len(items))]
+
+
+# Add and/or remove tags on many assets in one transaction
+@router.post("/tags", response_model=AssetsTagsResult)
+def update_assets_tags(
+    db: db_dependency,
+    update: AssetsTagsUpdate,
+    ctx: permission_dependency,
+):
+    if len(update.assets_ids) > asset_service.MAX_TAGGING_ASSETS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {asset_service.MAX_TAGGING_ASSETS} assets per request",
+        )
+    if set(update.add_tags_ids) & set(update.remove_tags_ids):
+        raise HTTPException(
+            status_code=400, detail="A tag cannot be both added and removed"
+        )
+
+    owners = asset_service.get_assets_owners(assets_ids=update.assets_ids, session=db)
+    missing = sorted(set(update.assets_ids) - owners.keys())
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Assets not found: {missing}")
+    forbidden = sorted(
+        asset_id
+        for asset_id, (client_id, created_by) in owners.items()
+        if not ctx.is_root
+        and not ctx.is_corporate_for(client_id)
+        and created_by != ctx.user.id
+    )
+    if forbidden:
+        raise HTTPException(
+            status_code=403,
+            detail=f"You don't have permission to update these assets: {forbidden}",
+        )
+
+    tags_clients = tag_service.get_tags_clients(
+        tags_ids=list(set(update.add_tags_ids)), session=db
+    )
+    assets_clients = {client_id for client_id, _ in owners.values()}
+    unknown = sorted(
+        tag_id
+        for tag_id in set(update.add_tags_ids)
+        if tag_id not in tags_clients or {tags_clients[tag_id]} != assets_clients
+    )
+    if unknown:
+        raise HTTPException(
+            status_code=404, detail=f"Tags not found for these assets: {unknown}"
+        )
+
+    removed = asset_service.remove_tags_from_assets(
+        assets_ids=update.assets_ids, tags_ids=update.remove_tags_ids, session=db
+    )
+    added = asset_service.add_tags_to_assets(
+        assets_ids=update.assets_ids, tags_ids=update.add_tags_ids, session=db
+    )
+    db.commit()
+    return AssetsTagsResult(assets=len(owners), added=added, removed=removed)
+
+
+async def _request_chunks(request: Request):
+    # Complete lines of the body, undecoded, grouped as they arrive
+    buffer = b""
+    async for chunk in request.stream():
+        *lines, buffer = (buffer + chunk).split(b"\n")
+        if lines:
+            yield lines
+    if buffer:
+        yield [buffer]
+
+
+# Upserts the NDJSON/CSV request body by (client_id, external_id)
+@router.post("/import", response_model=AssetImportSummary)
+async def import_assets(
+    request: Request,
+    db: db_dependency,
+    ctx: permission_dependency,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+):
+    folder_errors = {}
+
+    def check_row(row):
+        if row.folder_id and row.folder_id not in folder_errors:
+            try:
+                check_folder_permission(db, ctx, row.folder_id, "write")
+                folder_errors[row.folder_id] = None
+            except HTTPException as e:
+                folder_errors[row.folder_id] = e.detail
+        return folder_errors.get(row.folder_id)
+
+    def can_update(client_id, created_by):
+        return (
+            ctx.is_root
+            or ctx.is_corporate_for(client_id)
+            or created_by == ctx.user.id
+        )
+
+    def report(summary):
+        # Rows are written as the body arrives, so the caller's upload
+        # progress tracks this; the running totals go to the log
+        logger.info(
+            "Import by user %s: %s rows, %s created, %s updated, %s failed "
+            "(%s rows/s)",
+            ctx.user.id,
+            summary.rows,
+            summary.created,
+            summary.updated,
+            summary.failed,
+            summary.rows_per_second,
+        )
+
+    importer = asset_import.AssetImporter(
+        session=db,
+        user_id=ctx.user.id,
+        format=format,
+        check_row=check_row,
+        can_update=can_update,
+        on_chunk=report,
+    )
+    # Rows are parsed and written off the event loop, one network chunk at a time
+    async for chunk in _request_chunks(request):
+        await run_in_threadpool(importer.feed, chunk)
+    return await run_in_threadpool(importer.finish)
 
 
 @router.put("/{asset_id}", response_model=AssetRead)
 def update_asset(
     db: db_dependency,
     asset_data: AssetUpdate,
-    user: user_service.User = Depends(check_user),
+    ctx: permission_dependency,
     asset: asset_service.Asset = Depends(check_asset),
 ):
-    if asset.is_deleted and not user_has_root_feature(user_id=user.id, session=db):
+    if asset.is_deleted and not ctx.is_root:
         raise HTTPException(status_code=404, detail="Asset not found")
 
     parent_folder_id = asset_data.folder_id
     if parent_folder_id:
-        check_folder_permission(db, user, parent_folder_id, role="write")
+        check_folder_permission(db, ctx, parent_folder_id, role="write")
     elif (
-        not user_has_root_feature(user_id=user.id, session=db)
-        and not (
-            user_has_corporate_feature(user_id=user.id, session=db)
-            and asset.client_id == user.client_id
-        )
-        and not asset.created_by == user.id
+        not ctx.is_root
+        and not ctx.is_corporate_for(asset.client_id)
+        and not asset.created_by == ctx.user.id
     ):  # for root assetsP
         raise HTTPException(
             status_code=403,
@@ -142,33 +429,32 @@ def update_asset(
         else None
     )
     tags_ids = asset_data.tags_ids
-    return asset_service.update_asset(
+    db_asset = asset_service.update_asset(
         asset_id=asset.id,
         asset_base=asset_base,
         session=db,
         metadata=metadata,
         tags_ids=tags_ids,
     )
+    return asset_service.serialize_asset(asset=db_asset, session=db)
 
 
 @router.delete("/{asset_id}")
 def delete_asset(
     db: db_dependency,
+    ctx: permission_dependency,
     parent_folder_id: int = None,
-    user: user_service.User = Depends(check_user),
     asset: asset_service.Asset = Depends(check_asset),
 ):
+    user = ctx.user
     if asset.is_deleted:
         raise HTTPException(status_code=404, detail="Asset not found")
 
     if parent_folder_id:
-        check_folder_permission(db, user, parent_folder_id, role="write")
+        check_folder_permission(db, ctx, parent_folder_id, role="write")
     elif (
-        not user_has_root_feature(user_id=user.id, session=db)
-        and not (
-            user_has_corporate_feature(user_id=user.id, session=db)
-            and asset.client_id == user.client_id
-        )
+        not ctx.is_root
+        and not ctx.is_corporate_for(asset.client_id)
         and not asset.created_by == user.id
     ):  # for root assets
         raise HTTPException(status_code=403, detail="You don't have permission")
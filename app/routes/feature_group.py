@@ -14,6 +14,8 @@ from app.services.feature_group import (
     create_featureGroup,
     update_featureGroup,
     delete_featureGroup,
+    add_featureGroup_child,
+    remove_featureGroup_child,
 )
 from app.services import user as user_service
 
@@ -111,3 +113,32 @@ def delete_featureGroup_entry(featureGroup_id: int, db: db_dependency, user_id:
         )
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
+
+
+@router.post("/{featureGroup_id}/children/{child_id}", status_code=204)
+def add_featureGroup_child_entry(
+    featureGroup_id: int, child_id: int, db: db_dependency, user_id: int
+):
+    user_has_root_feature = user_service.user_has_feature(
+        user_id=user_id, feature_slug="root", session=db
+    )
+    if not user_has_root_feature:
+        raise HTTPException(status_code=403, detail="You don't have permission")
+    add_featureGroup_child(parent_id=featureGroup_id, child_id=child_id, session=db)
+
+
+@router.delete("/{featureGroup_id}/children/{child_id}", status_code=204)
+def remove_featureGroup_child_entry(
+    featureGroup_id: int, child_id: int, db: db_dependency, user_id: int
+):
+    user_has_root_feature = user_service.user_has_feature(
+        user_id=user_id, feature_slug="root", session=db
+    )
+    if not user_has_root_feature:
+        raise HTTPException(status_code=403, detail="You don't have permission")
+    try:
+        remove_featureGroup_child(
+            parent_id=featureGroup_id, child_id=child_id, session=db
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
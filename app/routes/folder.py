@@ -1,10 +1,13 @@
-from typing import List
+from typing import List, Optional
 
-from fastapi import HTTPException, APIRouter, Depends
+from fastapi import HTTPException, APIRouter, Depends, Query, Response
 
 from app.database import db_dependency
-from app.models.models import Folder, User
+from app.models.models import Folder
 from app.schemas.folder import (
+    FolderAssetsMove,
+    FolderAssetsResult,
+    FolderAssetsUpdate,
     FolderReadNoChild,
     FolderReadTree,
     FolderReadWithAssets,
@@ -13,55 +16,89 @@ from app.schemas.folder import (
     FolderDelete,
 )
 from app.services import folder as folder_service
-from app.services import user as user_service
 from app.services import asset as asset_service
 from datetime import timezone
 from datetime import datetime
-from app.routes.utils import check_user, check_folder, user_has_root_feature
+from app.routes.utils import (
+    check_folder,
+    check_folder_permission,
+    parse_asset_include,
+    PermissionContext,
+    permission_dependency,
+    set_next_cursor,
+)
 
 
 router = APIRouter()
 
 
 @router.get("/", response_model=List[FolderReadNoChild])
-def read_folders(db: db_dependency, user_id: int):
-    return get_folders(db=db, user_id=user_id)
+def read_folders(db: db_dependency, ctx: permission_dependency):
+    return get_folders(db=db, ctx=ctx)
 
 
 @router.get("/tree", response_model=List[FolderReadTree])
-def read_folders_tree(db: db_dependency, user_id: int):
-    return get_folders(db=db, user_id=user_id)
+def read_folders_tree(
+    db: db_dependency,
+    ctx: permission_dependency,
+    max_depth: int = Query(
+        folder_service.FOLDER_TREE_MAX_DEPTH,
+        ge=0,
+        le=folder_service.FOLDER_TREE_MAX_DEPTH,
+    ),
+):
+    folders = get_folders(db=db, ctx=ctx)
+    return folder_service.load_folder_trees(
+        folders=folders, session=db, max_depth=max_depth
+    )
 
 
 @router.get("/boards", response_model=List[FolderReadNoChild])
-def read_folders_boards(db: db_dependency, user_id: int):
-    return get_boards(db=db, user_id=user_id)
+def read_folders_boards(db: db_dependency, ctx: permission_dependency):
+    return get_boards(db=db, ctx=ctx)
 
 
 @router.get("/boards/tree", response_model=List[FolderReadTree])
-def read_folders_boards(db: db_dependency, user_id: int):
-    return get_boards(db=db, user_id=user_id)
+def read_folders_boards_tree(
+    db: db_dependency,
+    ctx: permission_dependency,
+    max_depth: int = Query(
+        folder_service.FOLDER_TREE_MAX_DEPTH,
+        ge=0,
+        le=folder_service.FOLDER_TREE_MAX_DEPTH,
+    ),
+):
+    boards = get_boards(db=db, ctx=ctx)
+    return folder_service.load_folder_trees(
+        folders=boards, session=db, max_depth=max_depth
+    )
 
 
 @router.get("/{folder_id}", response_model=FolderReadWithAssets)
 def read_folder(
     db: db_dependency,
-    user_id: int,
-    limit: int = 5,
+    ctx: permission_dependency,
+    response: Response,
+    limit: int = Query(5, ge=1),
     page: int = 0,
+    cursor: Optional[str] = None,
+    include: set[str] = Depends(parse_asset_include),
     folder: Folder = Depends(check_folder),
-    user: user_service.User = Depends(check_user),
 ):
-    if folder.is_deleted and not user_has_root_feature(user_id=user.id, session=db):
+    if folder.is_deleted and not ctx.is_root:
         raise HTTPException(status_code=404, detail="Folder not found")
 
-    if not check_folder_access(db=db, user=user, folder=folder):
+    if not check_folder_access(db=db, ctx=ctx, folder=folder):
         raise HTTPException(status_code=403, detail="Folder not accessible")
 
     # Get assets in the folder with pagination
-    assets = asset_service.get_folder_assets(
-        folder=folder, session=db, limit=limit, page=page
-    )
+    try:
+        assets, next_cursor = asset_service.get_folder_assets(
+            folder=folder, session=db, limit=limit, page=page, cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    set_next_cursor(response, next_cursor)
 
     return FolderReadWithAssets(
         id=folder.id,
@@ -72,16 +109,92 @@ def read_folder(
         client_id=folder.client_id,
         is_public=folder.is_public,
         subfolders=folder.subfolders,
-        assets=assets,
+        assets=asset_service.serialize_assets(
+            assets=assets, session=db, include=include
+        ),
+    )
+
+
+@router.get("/{folder_id}/ancestors", response_model=List[FolderReadNoChild])
+def read_folder_ancestors(
+    db: db_dependency,
+    ctx: permission_dependency,
+    folder: Folder = Depends(check_folder),
+):
+    if folder.is_deleted and not ctx.is_root:
+        raise HTTPException(status_code=404, detail="Folder not found")
+
+    if not check_folder_access(db=db, ctx=ctx, folder=folder):
+        raise HTTPException(status_code=403, detail="Folder not accessible")
+
+    return folder_service.get_ancestors(folder=folder, session=db)
+
+
+@router.get("/{folder_id}/subtree", response_model=List[FolderReadNoChild])
+def read_folder_subtree(
+    db: db_dependency,
+    ctx: permission_dependency,
+    max_depth: Optional[int] = Query(None, ge=0),
+    folder: Folder = Depends(check_folder),
+):
+    if folder.is_deleted and not ctx.is_root:
+        raise HTTPException(status_code=404, detail="Folder not found")
+
+    if not check_folder_access(db=db, ctx=ctx, folder=folder):
+        raise HTTPException(status_code=403, detail="Folder not accessible")
+
+    return folder_service.get_subtree(folder=folder, session=db, max_depth=max_depth)
+
+
+@router.post("/{folder_id}/assets:link", response_model=FolderAssetsResult)
+def link_folder_assets(
+    db: db_dependency,
+    ctx: permission_dependency,
+    update: FolderAssetsUpdate,
+    folder_id: int,
+):
+    folder = check_folder_writable(db=db, ctx=ctx, folder_id=folder_id)
+    linked = folder_service.link_assets(
+        folder=folder, assets_ids=update.assets_ids, session=db
+    )
+    return FolderAssetsResult(assets=linked)
+
+
+@router.post("/{folder_id}/assets:unlink", response_model=FolderAssetsResult)
+def unlink_folder_assets(
+    db: db_dependency,
+    ctx: permission_dependency,
+    update: FolderAssetsUpdate,
+    folder_id: int,
+):
+    folder = check_folder_writable(db=db, ctx=ctx, folder_id=folder_id)
+    unlinked = folder_service.unlink_assets(
+        folder=folder, assets_ids=update.assets_ids, session=db
     )
+    return FolderAssetsResult(assets=unlinked)
+
+
+# Moves the assets from body.source_folder_id into folder_id
+@router.post("/{folder_id}/assets:move", response_model=FolderAssetsResult)
+def move_folder_assets(
+    db: db_dependency,
+    ctx: permission_dependency,
+    move: FolderAssetsMove,
+    folder_id: int,
+):
+    target = check_folder_writable(db=db, ctx=ctx, folder_id=folder_id)
+    source = check_folder_writable(db=db, ctx=ctx, folder_id=move.source_folder_id)
+    moved = folder_service.move_assets(
+        source=source, target=target, assets_ids=move.assets_ids, session=db
+    )
+    return FolderAssetsResult(assets=moved)
 
 
 @router.post("/", response_model=FolderReadNoChild)
 def create_folder(
     db: db_dependency,
-    user_id: int,
     folder: FolderCreate,
-    user: user_service.User = Depends(check_user),
+    ctx: permission_dependency,
 ):
     if folder.parent_id:
         parent_folder_db = folder_service.get_by_id(
@@ -90,7 +203,7 @@ def create_folder(
         if (
             parent_folder_db
             and not check_folder_create_permission(
-                db=db, user=user, parent_folder=parent_folder_db
+                db=db, ctx=ctx, parent_folder=parent_folder_db
             )
             and not parent_folder_db.is_deleted
         ):
@@ -98,7 +211,9 @@ def create_folder(
                 status_code=403,
                 detail="You don't have permission to create this folder",
             )
-    result = folder_service.create_folder(user_id=user_id, folder=folder, session=db)
+    result = folder_service.create_folder(
+        user_id=ctx.user.id, folder=folder, session=db
+    )
 
     return result
 
@@ -107,16 +222,16 @@ def create_folder(
 def update_folder(
     db: db_dependency,
     folder_update: FolderUpdate,
+    ctx: permission_dependency,
     folder: Folder = Depends(check_folder),
-    user: user_service.User = Depends(check_user),
 ):
-    if folder.is_deleted and not user_has_root_feature(user_id=user.id, session=db):
+    if folder.is_deleted and not ctx.is_root:
         raise HTTPException(status_code=404, detail="Folder not found")
 
-    if not check_folder_access(db=db, user=user, folder=folder):
+    if not check_folder_access(db=db, ctx=ctx, folder=folder):
         raise HTTPException(status_code=403, detail="Folder not accessible")
 
-    if not check_folder_update_permission(db=db, user=user, folder=folder):
+    if not check_folder_update_permission(db=db, ctx=ctx, folder=folder):
         raise HTTPException(
             status_code=403, detail="You don't have permission to update this folder"
         )
@@ -131,145 +246,101 @@ def update_folder(
 @router.delete("/{folder_id}")
 def delete_folder(
     db: db_dependency,
-    user: user_service.User = Depends(check_user),
+    ctx: permission_dependency,
     folder: Folder = Depends(check_folder),
 ):
-    if folder.is_deleted and not user_has_root_feature(user_id=user.id, session=db):
+    if folder.is_deleted and not ctx.is_root:
         raise HTTPException(status_code=404, detail="Folder not found")
 
-    if not check_folder_access(db=db, user=user, folder=folder):
+    if not check_folder_access(db=db, ctx=ctx, folder=folder):
         raise HTTPException(status_code=403, detail="Folder not accessible")
 
-    if not check_folder_remove_permission(db=db, user=user, folder=folder):
+    if not check_folder_remove_permission(db=db, ctx=ctx, folder=folder):
         raise HTTPException(
             status_code=403, detail="You don't have permission to remove this folder"
         )
 
     folder_delete = FolderDelete(
-        id=folder.id, deleted_by=user.id, deleted_at=datetime.now(timezone.utc)
+        id=folder.id, deleted_by=ctx.user.id, deleted_at=datetime.now(timezone.utc)
     )
     folder_service.delete_folder(folder=folder_delete, session=db)
 
 
-def get_folders(db: db_dependency, user_id: int):
-    user = user_service.get_by_id(user_id=user_id, session=db)
+def check_folder_writable(db: db_dependency, ctx: PermissionContext, folder_id: int):
+    folder = check_folder(db=db, folder_id=folder_id)
+    if folder.is_deleted:
+        raise HTTPException(status_code=404, detail="Folder not found")
+    check_folder_permission(db, ctx, folder_id, role="write")
+    return folder
 
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
 
-    if user_service.user_has_feature(user_id=user_id, feature_slug="root", session=db):
+def get_folders(db: db_dependency, ctx: PermissionContext):
+    if ctx.is_root:
         folders = folder_service.get_user_root_folders(session=db)
-    elif user_service.user_has_feature(
-        user_id=user_id, feature_slug="corporate", session=db
-    ):
+    elif ctx.is_corporate:
         folders = folder_service.get_user_corporate_folders(
-            client_id=user.client_id, session=db
+            client_id=ctx.client_id, session=db
         )
     else:
-        fgs = user_service.fetch_all_feature_groups(user_id=user_id, session=db)
-        folders = folder_service.get_user_regular_folders(
-            user=user, user_feature_group_ids=[fg.id for fg in fgs], session=db
-        )
+        folders = folder_service.get_user_regular_folders(user=ctx.user, session=db)
 
     return folders
 
 
-def get_boards(db: db_dependency, user_id: int):
-    user = user_service.get_by_id(user_id=user_id, session=db)
-
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    folders = folder_service.get_user_boards(user=user, session=db)
+def get_boards(db: db_dependency, ctx: PermissionContext):
+    folders = folder_service.get_user_boards(user=ctx.user, session=db)
     return folders
 
 
-def check_folder_access(db: db_dependency, user: User, folder: Folder):
-    if user_service.user_has_feature(user_id=user.id, feature_slug="root", session=db):
-        return True
-    if (
-        user_service.user_has_feature(
-            user_id=user.id, feature_slug="corporate", session=db
-        )
-        and folder.client_id == user.client_id
-    ):
+def check_folder_access(db: db_dependency, ctx: PermissionContext, folder: Folder):
+    if ctx.is_root or ctx.is_corporate_for(folder.client_id):
         return True
 
-    fg_ids = []
-    if not folder.is_user_folder:
-        fgs = user_service.fetch_all_feature_groups(user_id=user.id, session=db)
-        fg_ids = [fg.id for fg in fgs]
     return folder_service.folder_is_accessible(
-        user=user, folder=folder, session=db, user_feature_group_ids=fg_ids
+        user=ctx.user, folder=folder, session=db
     )
 
 
-def check_folder_update_permission(db: db_dependency, user: User, folder: Folder):
-    if user_service.user_has_feature(user_id=user.id, feature_slug="root", session=db):
-        return True
-    if (
-        user_service.user_has_feature(
-            user_id=user.id, feature_slug="corporate", session=db
-        )
-        and folder.client_id == user.client_id
-    ):
+def check_folder_update_permission(
+    db: db_dependency, ctx: PermissionContext, folder: Folder
+):
+    if ctx.is_root or ctx.is_corporate_for(folder.client_id):
         return True
 
-    user_folder = user_service.fetch_user_role_for_a_folder(
-        user_id=user.id, folder_id=folder.id, session=db
-    )
-
     required_roles = {"owner", "admin", "write"}
-    if user_folder.role in required_roles or user.id == folder.owned_by:
+    if ctx.folder_role(folder.id) in required_roles or ctx.user.id == folder.owned_by:
         return True
 
     return False
 
 
-def check_folder_remove_permission(db: db_dependency, user: User, folder: Folder):
-    if user_service.user_has_feature(user_id=user.id, feature_slug="root", session=db):
-        return True
-
-    if (
-        user_service.user_has_feature(
-            user_id=user.id, feature_slug="corporate", session=db
-        )
-        and folder.client_id == user.client_id
-    ):
+def check_folder_remove_permission(
+    db: db_dependency, ctx: PermissionContext, folder: Folder
+):
+    if ctx.is_root or ctx.is_corporate_for(folder.client_id):
         return True
 
-    user_folder = user_service.fetch_user_role_for_a_folder(
-        user_id=user.id, folder_id=folder.id, session=db
-    )
     required_roles = {"owner", "admin"}
-    if user_folder.role in required_roles:
+    if ctx.folder_role(folder.id) in required_roles:
         return True
 
     return False
 
 
 def check_folder_create_permission(
-    db: db_dependency, user: User, parent_folder: Folder
+    db: db_dependency, ctx: PermissionContext, parent_folder: Folder
 ):
-    if not check_folder_access(db=db, user=user, folder=parent_folder):
+    if not check_folder_access(db=db, ctx=ctx, folder=parent_folder):
         raise HTTPException(status_code=403, detail="Parent folder not accessible")
 
-    if user_service.user_has_feature(user_id=user.id, feature_slug="root", session=db):
+    if ctx.is_root or ctx.is_corporate_for(parent_folder.client_id):
         return True
 
+    required_roles = {"owner", "admin", "write"}
     if (
-        user_service.user_has_feature(
-            user_id=user.id, feature_slug="corporate", session=db
-        )
-        and parent_folder.client_id == user.client_id
+        ctx.folder_role(parent_folder.id) in required_roles
+        or ctx.user.id == parent_folder.owned_by
     ):
         return True
 
-    user_folder = user_service.fetch_user_role_for_a_folder(
-        user_id=user.id, folder_id=parent_folder.id, session=db
-    )
-    required_roles = {"owner", "admin", "write"}
-    if user_folder.role in required_roles or user.id == parent_folder.owned_by:
-        return True
-
     return False
@@ -1,35 +1,84 @@
-from typing import List
+from typing import List, Optional
 
-from fastapi import HTTPException, APIRouter
+from fastapi import HTTPException, APIRouter, Header, Query, Response
 
 from fastapi import Depends
 from app.database import db_dependency
-from app.services import user as user_service
 from app.services import tag as tag_service
-from app.routes.utils import (
-    check_user,
-    check_tag,
-    user_has_root_feature,
-    user_has_corporate_feature,
-)
+from app.services import tag_dictionary, tag_usage
+from app.routes.utils import check_tag, permission_dependency, set_next_cursor
 from app.schemas.tag import TagBase, TagCreate, TagRead, TagUpdate
 from app.models.models import Tag
 
 router = APIRouter()
 
 
+def _scoped_client_id(ctx, client_id: Optional[int]) -> int:
+    # Root may read another client's tags; everyone defaults to their own
+    if client_id is not None and client_id != ctx.client_id and not ctx.is_root:
+        raise HTTPException(status_code=403, detail="You don't have permission")
+    client_id = client_id if client_id is not None else ctx.client_id
+    if not client_id:
+        raise HTTPException(
+            status_code=400, detail="Client ID is missing for the authenticated user."
+        )
+    return client_id
+
+
 @router.get("/", response_model=List[TagRead])
-def get_tags(db: db_dependency, _: user_service.User = Depends(check_user)):
-    return tag_service.get_all_tags(session=db)
+def get_tags(
+    db: db_dependency,
+    ctx: permission_dependency,
+    response: Response,
+    client_id: Optional[int] = None,
+    limit: int = Query(50, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+):
+    client_id = _scoped_client_id(ctx, client_id)
+    dictionary = tag_dictionary.get_tag_dictionary(client_id=client_id, session=db)
+    if if_none_match == dictionary.etag:
+        return Response(status_code=304, headers={"ETag": dictionary.etag})
+    try:
+        tags, next_cursor = dictionary.page(limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    response.headers["ETag"] = dictionary.etag
+    set_next_cursor(response, next_cursor)
+    return tags
+
+
+@router.get("/suggest", response_model=List[TagRead])
+def suggest_tags(
+    db: db_dependency,
+    ctx: permission_dependency,
+    prefix: str = Query(..., min_length=1),
+    limit: int = Query(10, ge=1, le=tag_dictionary.MAX_SUGGESTIONS),
+    client_id: Optional[int] = None,
+):
+    client_id = _scoped_client_id(ctx, client_id)
+    dictionary = tag_dictionary.get_tag_dictionary(client_id=client_id, session=db)
+    return dictionary.suggest(prefix=prefix, limit=limit)
+
+
+@router.get("/popular", response_model=List[TagRead])
+def get_popular_tags(
+    db: db_dependency,
+    ctx: permission_dependency,
+    limit: int = Query(20, ge=1, le=1000),
+    client_id: Optional[int] = None,
+):
+    client_id = _scoped_client_id(ctx, client_id)
+    return tag_usage.get_popular_tags(client_id=client_id, limit=limit, session=db)
 
 
 @router.post("/", response_model=TagRead)
 def create_tag(
     db: db_dependency, 
     tag: TagBase, 
-    user: user_service.User = Depends(check_user)  
+    ctx: permission_dependency,
 ):
-    if user_service.user_has_feature(user_id=user.id, feature_slug="root", session=db):
+    if ctx.is_root:
         client_id = tag.client_id
         if not client_id:
             raise HTTPException(
@@ -37,7 +86,7 @@ def create_tag(
                 detail="Client ID must be provided for root users."
             )
     else:
-        client_id = user.client_id
+        client_id = ctx.client_id
         if not client_id:
             raise HTTPException(
                 status_code=400,
@@ -56,48 +105,36 @@ def create_tag(
 def create_tags(
     db: db_dependency, 
     tags: List[TagCreate],  
-    user: user_service.User = Depends(check_user)
+    ctx: permission_dependency,
 ):
-    created_tags = []
-    
-    for tag in tags:
-        if user_service.user_has_feature(user_id=user.id, feature_slug="root", session=db):
-            client_id = tag.client_id
-            if not client_id:
-                raise HTTPException(
-                    status_code=400,
-                    detail="Client ID must be provided for root users."
-                )
-        else:
-            client_id = user.client_id
-            if not client_id:
-                raise HTTPException(
-                    status_code=400,
-                    detail="Client ID is missing for the authenticated user."
-                )
-
-        db_tag = Tag(
-            **tag.model_dump(exclude={"client_id"}),  
-            client_id=client_id
+    if not ctx.is_root and not ctx.client_id:
+        raise HTTPException(
+            status_code=400,
+            detail="Client ID is missing for the authenticated user."
+        )
+    if ctx.is_root and any(not tag.client_id for tag in tags):
+        raise HTTPException(
+            status_code=400,
+            detail="Client ID must be provided for root users."
         )
 
-        created_tags.append(tag_service.create_tag(tag=db_tag, session=db))
-    
-    return created_tags
-
+    client_tags = [
+        tag.model_copy(
+            update={"client_id": tag.client_id if ctx.is_root else ctx.client_id}
+        )
+        for tag in tags
+    ]
+    return tag_service.create_tags(tags=client_tags, session=db)
 
 
 @router.put("/{tag_id}", response_model=TagRead)
 def update_tag(
     db: db_dependency,
     tag_data: TagUpdate,
+    ctx: permission_dependency,
     tag: Tag = Depends(check_tag),
-    user: user_service.User = Depends(check_user),
 ):
-    if not user_has_root_feature(user_id=user.id, session=db) and not (
-        user_has_corporate_feature(user_id=user.id, session=db)
-        and tag.client_id == user.client_id
-    ):
+    if not ctx.is_root and not ctx.is_corporate_for(tag.client_id):
         raise HTTPException(status_code=403, detail="You don't have permission")
 
     tag_service.update_tag(tag_id=tag.id, tag=tag_data, session=db)
@@ -107,13 +144,10 @@ def update_tag(
 @router.delete("/{tag_id}")
 def delete_tag(
     db: db_dependency,
+    ctx: permission_dependency,
     tag: Tag = Depends(check_tag),
-    user: user_service.User = Depends(check_user),
 ):
-    if not user_has_root_feature(user_id=user.id, session=db) and not (
-        user_has_corporate_feature(user_id=user.id, session=db)
-        and tag.client_id == user.client_id
-    ):
+    if not ctx.is_root and not ctx.is_corporate_for(tag.client_id):
         raise HTTPException(status_code=403, detail="You don't have permission")
     tag_service.delete_tag(tag=tag, session=db)
     return {"message": "Tag deleted"}
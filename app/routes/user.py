@@ -1,9 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query
 from pymysql import IntegrityError
 from typing import List, Optional
 
 from app.database import db_dependency
-from app.routes.utils import check_user
+from app.routes.utils import permission_dependency
 from app.schemas.user import UserCreate, UserRead, UserUpdate
 from app.services.user import (
     create_user,
@@ -21,17 +21,18 @@ router = APIRouter()
 @router.get("/all", response_model=List[UserRead])
 def read_all_users(
     db: db_dependency,
+    ctx: permission_dependency,
     page: int = Query(0, ge=0),  
     limit: int = Query(5, le=100),  
     search: Optional[str] = Query(None, max_length=100),  
     order: Optional[str] = Query("asc", regex="^(asc|desc)$"),  
-    user: user_service.User = Depends(check_user)  
 ):
-    if user_service.user_has_feature(user_id=user.id, feature_slug="root", session=db):
+    user = ctx.user
+    if ctx.is_root:
         users = get_users_all(
             session=db, page=page, limit=limit, search=search, order=order
         )
-    elif user_service.user_has_feature(user_id=user.id, feature_slug="corporate", session=db):
+    elif ctx.is_corporate:
         if user.client_id: 
             users = get_client_users(
                 client_id=user.client_id, session=db, page=page, limit=limit, search=search, order=order
@@ -47,6 +48,16 @@ def read_all_users(
         raise HTTPException(status_code=404, detail=str(e))
     
 
+@router.get("/permission_cache")
+def read_permission_cache_stats(db: db_dependency, user_id: int):
+    user_has_root_feature = user_service.user_has_feature(
+        user_id=user_id, feature_slug="root", session=db
+    )
+    if not user_has_root_feature:
+        raise HTTPException(status_code=403, detail="You don't have permission")
+    return user_service.permission_cache_stats()
+
+
 @router.post("/create", response_model=UserRead)
 def create_new_user(user: UserCreate, db: db_dependency, user_id: int):
     user_has_root_feature = user_service.user_has_feature(
@@ -1,10 +1,15 @@
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Annotated, Optional
+
 from app.database import db_dependency
+from app.schemas.asset import AssetFilters, AssetType
 from app.services import user as user_service
 from app.services import folder as folder_service
 from app.services import asset as asset_service
 from app.services import tag as tag_service
-from fastapi import HTTPException
-from functools import partial
+from fastapi import Depends, HTTPException, Query, Response
+from sqlalchemy.orm import Session
 
 
 def check_user(db: db_dependency, user_id: int):
@@ -21,26 +26,72 @@ def check_folder(db: db_dependency, folder_id: int):
     return folder
 
 
+@dataclass(frozen=True)
+class PermissionContext:
+    """Permissions of the requesting user, resolved once per request."""
+
+    user: user_service.User
+    client_id: Optional[int]
+    market_id: Optional[int]
+    feature_slugs: frozenset[str]
+    feature_group_ids: frozenset[int]
+    session: Session = field(repr=False, compare=False)
+    _folder_roles: dict = field(default_factory=dict, repr=False, compare=False)
+
+    @property
+    def is_root(self) -> bool:
+        return "root" in self.feature_slugs
+
+    @property
+    def is_corporate(self) -> bool:
+        return "corporate" in self.feature_slugs
+
+    def has_feature(self, feature_slug: str) -> bool:
+        return feature_slug in self.feature_slugs
+
+    def is_corporate_for(self, client_id: Optional[int]) -> bool:
+        return self.is_corporate and client_id == self.client_id
+
+    def folder_role(self, folder_id: int) -> Optional[str]:
+        # Loaded on first use; misses are remembered as None
+        if folder_id not in self._folder_roles:
+            user_folder = user_service.fetch_user_role_for_a_folder(
+                user_id=self.user.id, folder_id=folder_id, session=self.session
+            )
+            self._folder_roles[folder_id] = user_folder.role if user_folder else None
+        return self._folder_roles[folder_id]
+
+
+def get_permission_context(
+    db: db_dependency, user: user_service.User = Depends(check_user)
+) -> PermissionContext:
+    feature_group_ids, feature_slugs = user_service.resolve_user_permissions(
+        user_id=user.id, session=db
+    )
+    return PermissionContext(
+        user=user,
+        client_id=user.client_id,
+        market_id=user.market_id,
+        feature_slugs=feature_slugs,
+        feature_group_ids=feature_group_ids,
+        session=db,
+    )
+
+
+permission_dependency = Annotated[PermissionContext, Depends(get_permission_context)]
+
+
 def check_folder_permission(
     db: db_dependency,
-    user: user_service.User,
+    ctx: PermissionContext,
     folder_id: int,
     role: str = None,
 ):
-    if not folder_service.get_by_id(folder_id=folder_id, session=db):
-        raise HTTPException(status_code=404, detail="Folder not found")
-
-    if user_service.user_has_feature(user_id=user.id, feature_slug="root", session=db):
-        return True
-
     folder = folder_service.get_by_id(folder_id=folder_id, session=db)
+    if not folder:
+        raise HTTPException(status_code=404, detail="Folder not found")
 
-    if (
-        user_service.user_has_feature(
-            user_id=user.id, feature_slug="corporate", session=db
-        )
-        and folder.client_id == user.client_id
-    ):
+    if ctx.is_root or ctx.is_corporate_for(folder.client_id):
         return True
 
     message = (
@@ -52,13 +103,11 @@ def check_folder_permission(
     if not folder.is_user_folder:
         raise HTTPException(status_code=403, detail=message)
 
-    user_folder = user_service.fetch_user_role_for_a_folder(
-        user_id=user.id, folder_id=folder_id, session=db
-    )
-    if not user_folder:
+    user_role = ctx.folder_role(folder_id)
+    if not user_role:
         raise HTTPException(status_code=403, detail=message)
 
-    if role and user_folder.role not in {role, "owner"}:
+    if role and user_role not in {role, "owner"}:
         raise HTTPException(status_code=403, detail=message)
 
     return True
@@ -78,7 +127,45 @@ def check_tag(db: db_dependency, tag_id: int):
     return tag
 
 
-user_has_root_feature = partial(user_service.user_has_feature, feature_slug="root")
-user_has_corporate_feature = partial(
-    user_service.user_has_feature, feature_slug="corporate"
-)
+def set_next_cursor(response: Response, next_cursor: Optional[str]):
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+
+
+ASSET_INCLUDES = {"metadata", "languages"}
+
+
+def parse_asset_include(include: Optional[str] = None) -> set[str]:
+    """Comma-separated ``include`` query parameter of the asset listings."""
+    requested = {part.strip() for part in (include or "").split(",") if part.strip()}
+    unknown = requested - ASSET_INCLUDES
+    if unknown:
+        raise HTTPException(
+            status_code=400, detail=f"Unknown include: {', '.join(sorted(unknown))}"
+        )
+    return requested
+
+
+def parse_asset_filters(
+    asset_type: list[AssetType] = Query([]),
+    tag_id: list[int] = Query([]),
+    language_id: list[int] = Query([]),
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    updated_from: Optional[datetime] = None,
+    updated_to: Optional[datetime] = None,
+    is_shareable: Optional[bool] = None,
+    is_downloadable: Optional[bool] = None,
+) -> AssetFilters:
+    """Filter query parameters of the asset listings; list ones may repeat."""
+    return AssetFilters(
+        asset_types=asset_type,
+        tags_ids=tag_id,
+        languages_ids=language_id,
+        created_from=created_from,
+        created_to=created_to,
+        updated_from=updated_from,
+        updated_to=updated_to,
+        is_shareable=is_shareable,
+        is_downloadable=is_downloadable,
+    )
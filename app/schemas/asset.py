@@ -42,6 +42,16 @@ class AssetBase(BaseModel):
 class AssetRead(AssetBase):
     id: int
     tags_ids: list[int] = Field(default_factory=list, description="IDs of the tags")
+    languages_ids: list[int] = Field(
+        default_factory=list,
+        description="IDs of the languages, only filled with include=languages",
+    )
+    # Not read from the ORM object, whose ``metadata`` is the SQLAlchemy MetaData
+    metadata: Optional[dict] = Field(
+        None,
+        validation_alias="type_metadata",
+        description="Type-specific metadata, only filled with include=metadata",
+    )
 
     class Config:
         from_attributes = True
@@ -54,6 +64,40 @@ class AssetType(Enum):
     VIDEO = "VIDEO"
 
 
+class AssetFilters(BaseModel):
+    asset_types: list[AssetType] = Field(
+        default_factory=list, description="Match any of these asset types"
+    )
+    tags_ids: list[int] = Field(
+        default_factory=list, description="Match assets with any of these tags"
+    )
+    languages_ids: list[int] = Field(
+        default_factory=list, description="Match assets in any of these languages"
+    )
+    created_from: Optional[datetime] = Field(None, description="Created at or after")
+    created_to: Optional[datetime] = Field(None, description="Created before")
+    updated_from: Optional[datetime] = Field(None, description="Updated at or after")
+    updated_to: Optional[datetime] = Field(None, description="Updated before")
+    is_shareable: Optional[bool] = Field(None, description="Shareable flag")
+    is_downloadable: Optional[bool] = Field(None, description="Downloadable flag")
+
+
+class AssetFacets(BaseModel):
+    total: int = Field(..., description="Number of assets matching the filters")
+    asset_type: dict[str, int] = Field(
+        default_factory=dict, description="Matching assets per asset type"
+    )
+    tags: dict[int, int] = Field(
+        default_factory=dict, description="Matching assets per tag ID"
+    )
+    languages: dict[int, int] = Field(
+        default_factory=dict, description="Matching assets per language ID"
+    )
+    client_id: dict[int, int] = Field(
+        default_factory=dict, description="Matching assets per client ID"
+    )
+
+
 class VideoMetadata(BaseModel):
     size: int
     extension: str
@@ -121,6 +165,42 @@ class AssetCreate(BaseModel):
         use_enum_values = True
 
 
+class AssetBatchItem(AssetCreate):
+    tags_ids: list[int] = Field(
+        default_factory=list, description="IDs of the tags to assign"
+    )
+
+
+class AssetBatchResult(BaseModel):
+    index: int = Field(..., description="Position of the item in the request")
+    status_code: int = Field(..., description="HTTP status of this item")
+    asset: Optional[AssetRead] = Field(None, description="The created asset")
+    detail: Optional[str] = Field(None, description="Why the item was rejected")
+
+
+class AssetImportRow(AssetBatchItem):
+    external_id: str = Field(
+        ..., max_length=255, description="ID in the source system, the upsert key"
+    )
+
+
+class AssetImportError(BaseModel):
+    line: int = Field(..., description="Line of the row in the imported body")
+    detail: str = Field(..., description="Why the row was not imported")
+
+
+class AssetImportSummary(BaseModel):
+    rows: int = Field(..., description="Rows read")
+    created: int = Field(..., description="Assets created")
+    updated: int = Field(..., description="Existing assets updated")
+    failed: int = Field(..., description="Rows rejected")
+    errors: list[AssetImportError] = Field(
+        default_factory=list, description="Per-row errors, the first ones only"
+    )
+    seconds: float = Field(..., description="Time spent importing")
+    rows_per_second: float = Field(..., description="Import throughput")
+
+
 class AssetUpdate(BaseModel):
     title: Optional[str] = Field(None, max_length=255, description="Title of the asset")
     slug: Optional[str] = Field(None, max_length=255, description="Slug of the asset")
@@ -147,6 +227,22 @@ class AssetUpdate(BaseModel):
         from_attributes = True
 
 
+class AssetsTagsUpdate(BaseModel):
+    assets_ids: list[int] = Field(..., description="IDs of the assets to retag")
+    add_tags_ids: list[int] = Field(
+        default_factory=list, description="IDs of the tags to add to every asset"
+    )
+    remove_tags_ids: list[int] = Field(
+        default_factory=list, description="IDs of the tags to remove from every asset"
+    )
+
+
+class AssetsTagsResult(BaseModel):
+    assets: int = Field(..., description="Number of assets updated")
+    added: int = Field(..., description="Number of tag links created")
+    removed: int = Field(..., description="Number of tag links deleted")
+
+
 class DeleteAsset(BaseModel):
     id: int
     deleted_by: int
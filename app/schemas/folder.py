@@ -43,6 +43,20 @@ class FolderDelete(BaseModel):
         from_attributes = True
 
 
+class FolderAssetsUpdate(BaseModel):
+    assets_ids: List[int] = Field(..., description="IDs of the assets")
+
+
+class FolderAssetsMove(FolderAssetsUpdate):
+    source_folder_id: int = Field(
+        ..., description="ID of the folder the assets are moved out of"
+    )
+
+
+class FolderAssetsResult(BaseModel):
+    assets: int = Field(..., description="Number of asset links changed")
+
+
 class FolderReadNoChild(FolderBase):
     id: int
 
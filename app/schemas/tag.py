@@ -22,6 +22,7 @@ class TagCreate(TagBase):
 
 class TagRead(TagBase):
     id: int
+    usage_count: int = 0
 
     class Config:
         from_attributes = True
@@ -1,4 +1,7 @@
-from typing import Any, List
+from collections import Counter
+from contextlib import contextmanager
+from decimal import Decimal
+from typing import Any, List, Optional
 from app.models.models import (
     Folder,
     Asset,
@@ -8,11 +11,37 @@ from app.models.models import (
     Image,
     Video,
     AssetsTag,
+    AssetsLanguage,
+    Language,
+    Tag,
+    UserVisibleFolder,
 )
+from sqlalchemy import (
+    String,
+    and_,
+    cast,
+    exists,
+    func,
+    insert,
+    literal,
+    select,
+    union_all,
+)
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from datetime import datetime, timezone
+from fastapi import HTTPException
 from abc import ABC, abstractmethod
-from app.schemas.asset import AssetType, DeleteAsset
+from app.schemas.asset import (
+    AssetBatchItem,
+    AssetFacets,
+    AssetFilters,
+    AssetRead,
+    AssetType,
+    DeleteAsset,
+)
+from app.services import asset_search, tag_usage
+from app.services.pagination import paginate
 
 
 SPECIFIC_ASSETS = {
@@ -23,46 +52,198 @@ SPECIFIC_ASSETS = {
 }
 
 
-def get_folder_assets(folder: Folder, session: Session, limit: int = 5, page: int = 0):
-    assets = (
+def get_folder_assets(
+    folder: Folder,
+    session: Session,
+    limit: int = 5,
+    page: int = 0,
+    cursor: Optional[str] = None,
+):
+    query = (
         session.query(Asset)
         .join(AssetsFolder)
         .filter(AssetsFolder.folder_id == folder.id)
-        .limit(limit)
-        .offset(page * limit)
-        .all()
     )
-    return assets
+    return paginate(query, AssetsFolder.asset_id, limit, page, cursor)
+
+
+def apply_asset_filters(query, filters: Optional[AssetFilters]):
+    """Narrow an ``Asset`` query. Values of one filter are OR-ed, filters AND-ed."""
+    if filters is None:
+        return query
+    if filters.asset_types:
+        asset_types = [asset_type.value for asset_type in filters.asset_types]
+        query = query.filter(Asset.asset_type.in_(asset_types))
+    if filters.tags_ids:
+        query = query.filter(
+            exists()
+            .where(AssetsTag.asset_id == Asset.id)
+            .where(AssetsTag.tag_id.in_(filters.tags_ids))
+        )
+    if filters.languages_ids:
+        query = query.filter(
+            exists()
+            .where(AssetsLanguage.asset_id == Asset.id)
+            .where(AssetsLanguage.language_id.in_(filters.languages_ids))
+        )
+    if filters.created_from:
+        query = query.filter(Asset.created_at >= filters.created_from)
+    if filters.created_to:
+        query = query.filter(Asset.created_at < filters.created_to)
+    if filters.updated_from:
+        query = query.filter(Asset.updated_at >= filters.updated_from)
+    if filters.updated_to:
+        query = query.filter(Asset.updated_at < filters.updated_to)
+    if filters.is_shareable is not None:
+        query = query.filter(Asset.is_shareable == filters.is_shareable)
+    if filters.is_downloadable is not None:
+        query = query.filter(Asset.is_downloadable == filters.is_downloadable)
+    return query
+
+
+def get_all_assets(
+    session: Session,
+    limit: int = 5,
+    page: int = 0,
+    cursor: Optional[str] = None,
+    filters: Optional[AssetFilters] = None,
+):
+    query = apply_asset_filters(session.query(Asset), filters)
+    return paginate(query, Asset.id, limit, page, cursor)
 
 
-def get_all_assets(session: Session, limit: int = 5, page: int = 0):
-    assets = session.query(Asset).limit(limit).offset(page * limit).all()
-    return assets
+def get_client_assets(
+    client_id: int,
+    session: Session,
+    limit: int = 5,
+    page: int = 0,
+    cursor: Optional[str] = None,
+    filters: Optional[AssetFilters] = None,
+):
+    query = session.query(Asset).filter_by(client_id=client_id)
+    query = apply_asset_filters(query, filters)
+    return paginate(query, Asset.id, limit, page, cursor)
+
+
+def user_visible_assets_filter(user_id: int, session: Session):
+    """EXISTS clause true for assets linked to a folder the user can see."""
+    return (
+        session.query(AssetsFolder.asset_id)
+        .join(UserVisibleFolder, UserVisibleFolder.folder_id == AssetsFolder.folder_id)
+        .join(Folder, Folder.id == AssetsFolder.folder_id)
+        .filter(UserVisibleFolder.user_id == user_id)
+        .filter(Folder.is_deleted == False)
+        .filter(AssetsFolder.asset_id == Asset.id)
+        .exists()
+    )
 
 
-def get_client_assets(client_id: int, session: Session, limit: int = 5, page: int = 0):
-    assets = (
+def get_user_visible_assets(
+    user_id: int,
+    session: Session,
+    limit: int = 5,
+    page: int = 0,
+    cursor: Optional[str] = None,
+    filters: Optional[AssetFilters] = None,
+):
+    """Assets linked to any folder in the user's visibility index."""
+    query = (
         session.query(Asset)
-        .filter_by(client_id=client_id)
-        .limit(limit)
-        .offset(page * limit)
-        .all()
+        .filter(Asset.is_deleted == False)
+        .filter(user_visible_assets_filter(user_id, session))
     )
-    return assets
+    query = apply_asset_filters(query, filters)
+    return paginate(query, Asset.id, limit, page, cursor)
 
 
-def get_folders_assets(
-    folder_ids: list[int], session: Session, limit: int = 5, page: int = 0
+def scope_assets_query(
+    query,
+    session: Session,
+    client_id: Optional[int] = None,
+    user_id: Optional[int] = None,
 ):
-    assets = (
-        session.query(Asset)
-        .join(AssetsFolder)
-        .filter(AssetsFolder.folder_id.in_(folder_ids))
-        .limit(limit)
-        .offset(page * limit)
-        .all()
-    )
-    return assets
+    """Restrict an asset query the way the /assets listing does per role."""
+    if client_id is not None:
+        query = query.filter(Asset.client_id == client_id)
+    if user_id is not None:
+        query = query.filter(Asset.is_deleted == False).filter(
+            user_visible_assets_filter(user_id, session)
+        )
+    return query
+
+
+def get_asset_facets(
+    session: Session,
+    client_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    filters: Optional[AssetFilters] = None,
+) -> AssetFacets:
+    """Facet counts of the filtered assets, in one UNION ALL query."""
+    query = session.query(Asset.id, Asset.asset_type, Asset.client_id)
+    query = scope_assets_query(query, session, client_id=client_id, user_id=user_id)
+    matching = apply_asset_filters(query, filters).cte("matching_assets")
+
+    def facet(name, key, *joins):
+        stmt = select(
+            literal(name).label("facet"),
+            cast(key, String).label("value"),
+            func.count(func.distinct(matching.c.id)).label("count"),
+        ).select_from(matching)
+        for target, onclause in joins:
+            stmt = stmt.join(target, onclause)
+        return stmt.group_by(key)
+
+    rows = session.execute(
+        union_all(
+            facet("asset_type", matching.c.asset_type),
+            facet("client_id", matching.c.client_id),
+            facet(
+                "tags",
+                AssetsTag.tag_id,
+                (AssetsTag, AssetsTag.asset_id == matching.c.id),
+                (Tag, and_(Tag.id == AssetsTag.tag_id, Tag.is_deleted == False)),
+            ),
+            facet(
+                "languages",
+                AssetsLanguage.language_id,
+                (AssetsLanguage, AssetsLanguage.asset_id == matching.c.id),
+            ),
+        )
+    ).all()
+
+    facets = {"asset_type": {}, "client_id": {}, "tags": {}, "languages": {}}
+    for name, value, count in rows:
+        if value is not None:
+            facets[name][value] = count
+    return AssetFacets(total=sum(facets["asset_type"].values()), **facets)
+
+
+def search_assets(
+    query: str,
+    session: Session,
+    client_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    limit: int = 5,
+    page: int = 0,
+) -> List[Asset]:
+    """Ranked full-text matches, checked for visibility in ranked batches."""
+    ranked_ids = asset_search.search_asset_ids(query, session, client_id=client_id)
+    wanted = (page + 1) * limit
+    ranked = []
+    for start in range(0, len(ranked_ids), asset_search.CANDIDATE_BATCH):
+        batch = ranked_ids[start : start + asset_search.CANDIDATE_BATCH]
+        candidates = session.query(Asset).filter(
+            Asset.id.in_(batch), Asset.is_deleted == False
+        )
+        if user_id is not None:
+            candidates = candidates.filter(
+                user_visible_assets_filter(user_id, session)
+            )
+        assets = {asset.id: asset for asset in candidates.all()}
+        ranked.extend(assets[asset_id] for asset_id in batch if asset_id in assets)
+        if len(ranked) >= wanted:
+            break
+    return ranked[page * limit : wanted]
 
 
 def get_by_id(asset_id: int, session: Session) -> Asset:
@@ -70,6 +251,90 @@ def get_by_id(asset_id: int, session: Session) -> Asset:
     return asset
 
 
+def load_assets_metadata(assets: List[Asset], session: Session) -> dict:
+    """Type-specific columns by asset id, one query per subtype in ``assets``."""
+    ids_by_type = {}
+    for asset in assets:
+        if asset.asset_type in SPECIFIC_ASSETS:
+            ids_by_type.setdefault(asset.asset_type, []).append(asset.id)
+
+    metadata = {}
+    for asset_type, asset_ids in ids_by_type.items():
+        table = SPECIFIC_ASSETS[asset_type].__table__
+        rows = session.execute(select(table).where(table.c.id.in_(asset_ids)))
+        for row in rows.mappings():
+            values = {
+                key: float(value) if isinstance(value, Decimal) else value
+                for key, value in row.items()
+            }
+            metadata[values.pop("id")] = values
+    return metadata
+
+
+def _group_links(rows) -> dict:
+    grouped = {}
+    for asset_id, linked_id in rows:
+        grouped.setdefault(asset_id, []).append(linked_id)
+    return grouped
+
+
+def load_assets_tags_ids(asset_ids: List[int], session: Session) -> dict:
+    """Non-deleted tag ids by asset id, for a whole page in one query."""
+    rows = (
+        session.query(AssetsTag.asset_id, AssetsTag.tag_id)
+        .join(Tag, Tag.id == AssetsTag.tag_id)
+        .filter(AssetsTag.asset_id.in_(asset_ids))
+        .filter(Tag.is_deleted == False)
+        .order_by(AssetsTag.asset_id, AssetsTag.tag_id)
+        .all()
+    )
+    return _group_links(rows)
+
+
+def load_assets_languages_ids(asset_ids: List[int], session: Session) -> dict:
+    """Non-deleted language ids by asset id, for a whole page in one query."""
+    rows = (
+        session.query(AssetsLanguage.asset_id, AssetsLanguage.language_id)
+        .join(Language, Language.id == AssetsLanguage.language_id)
+        .filter(AssetsLanguage.asset_id.in_(asset_ids))
+        .filter(Language.is_deleted == False)
+        .order_by(AssetsLanguage.asset_id, AssetsLanguage.language_id)
+        .all()
+    )
+    return _group_links(rows)
+
+
+def serialize_assets(
+    assets: List[Asset], session: Session, include: set[str] = frozenset()
+) -> List[AssetRead]:
+    if not assets:
+        return []
+    asset_ids = [asset.id for asset in assets]
+    tags_ids = load_assets_tags_ids(asset_ids, session)
+    languages_ids = (
+        load_assets_languages_ids(asset_ids, session)
+        if "languages" in include
+        else {}
+    )
+    metadata = load_assets_metadata(assets, session) if "metadata" in include else {}
+
+    results = []
+    for asset in assets:
+        extra = {"tags_ids": tags_ids.get(asset.id, [])}
+        if "languages" in include:
+            extra["languages_ids"] = languages_ids.get(asset.id, [])
+        if "metadata" in include:
+            extra["metadata"] = metadata.get(asset.id)
+        results.append(AssetRead.model_validate(asset).model_copy(update=extra))
+    return results
+
+
+def serialize_asset(
+    asset: Asset, session: Session, include: set[str] = frozenset()
+) -> AssetRead:
+    return serialize_assets([asset], session, include)[0]
+
+
 def get_specific_asset_by_id(asset_id: int, type: AssetType, session: Session) -> Any:
     specific_asset_type = SPECIFIC_ASSETS[type]
     asset = session.query(specific_asset_type).get(asset_id)
@@ -90,6 +355,18 @@ def get_asset_parents_folders(asset_id: int, session: Session) -> List[Folder]:
     return parents_folders
 
 
+@contextmanager
+def _unique_external_id(session: Session):
+    """Roll back and 409 when the block reuses a client's external_id."""
+    try:
+        yield
+    except IntegrityError:
+        session.rollback()
+        raise HTTPException(
+            status_code=409, detail="external_id is already used by another asset"
+        )
+
+
 def create_asset(
     user_id: int,
     asset_base: dict,
@@ -103,12 +380,60 @@ def create_asset(
 
     specific_asset_type = AssetFactory.get_asset(asset_type)
     specific_asset = specific_asset_type.create(data)
-    session.add(specific_asset)
-    session.commit()
+    with _unique_external_id(session):
+        session.add(specific_asset)
+        session.commit()
     session.refresh(specific_asset)
     return specific_asset
 
 
+# Items accepted by one POST /assets/batch call
+MAX_BATCH_SIZE = 1000
+# Assets retagged by one POST /assets/tags call
+MAX_TAGGING_ASSETS = 10000
+
+
+def create_assets(
+    user_id: int, items: List[AssetBatchItem], session: Session
+) -> List[Asset]:
+    assets = []
+    for item in items:
+        data = item.model_dump(exclude={"folder_id", "metadata", "tags_ids"})
+        data.update(item.metadata.model_dump(exclude_unset=True))
+        data["created_by"] = user_id
+        asset_factory = AssetFactory.get_asset(AssetType(item.asset_type))
+        assets.append(asset_factory.create(data))
+    with _unique_external_id(session):
+        session.add_all(assets)
+        session.flush()
+    asset_ids = [asset.id for asset in assets]
+
+    folder_links = [
+        {"folder_id": item.folder_id, "asset_id": asset.id}
+        for item, asset in zip(items, assets)
+        if item.folder_id
+    ]
+    tag_links = [
+        {"asset_id": asset.id, "tag_id": tag_id}
+        for item, asset in zip(items, assets)
+        for tag_id in dict.fromkeys(item.tags_ids)
+    ]
+    if folder_links:
+        session.execute(insert(AssetsFolder), folder_links)
+    if tag_links:
+        session.execute(insert(AssetsTag), tag_links)
+        tag_usage.queue_tag_usage_change(
+            session, added=Counter(link["tag_id"] for link in tag_links)
+        )
+    session.commit()
+
+    created = {
+        asset.id: asset
+        for asset in session.query(Asset).filter(Asset.id.in_(asset_ids)).all()
+    }
+    return [created[asset_id] for asset_id in asset_ids]
+
+
 def update_asset(
     asset_id: int,
     asset_base: dict,
@@ -132,12 +457,17 @@ def update_asset(
         assign_tags_to_asset(asset_id=asset_id, tags_ids=tags_ids, session=session)
 
     asset_db.updated_at = datetime.now(timezone.utc)
-    session.commit()
+    with _unique_external_id(session):
+        session.commit()
     session.refresh(asset_db)
     return asset_db
 
 
 def delete_asset(asset: DeleteAsset, session: Session):
+    # Counted before the update, while the asset still counts as in use
+    tag_usage.queue_tag_usage_change(
+        session, removed=tag_usage.count_tag_links(session, [asset.id])
+    )
     session.query(Asset).filter(Asset.id == asset.id).update(
         {
             "is_deleted": True,
@@ -145,20 +475,93 @@ def delete_asset(asset: DeleteAsset, session: Session):
             "deleted_by": asset.deleted_by,
         }
     )
+    asset_search.queue_search_refresh(session, asset_ids=[asset.id])
     session.commit()
 
 
 def assign_tags_to_asset(asset_id: int, tags_ids: list[int], session: Session):
-    asset_tags = session.query(AssetsTag).filter(AssetsTag.asset_id == asset_id).all()
-    tags_to_remove = [tag for tag in asset_tags if tag.tag_id not in tags_ids]
-    for tag in tags_to_remove:
-        session.delete(tag)
-    tags_to_add = [
-        tag for tag in tags_ids if tag not in [tag.tag_id for tag in asset_tags]
+    """Make ``tags_ids`` the tags of the asset. Does not commit."""
+    current = {
+        tag_id
+        for (tag_id,) in session.query(AssetsTag.tag_id)
+        .filter(AssetsTag.asset_id == asset_id)
+        .all()
+    }
+    wanted = set(tags_ids)
+    if current - wanted:
+        session.query(AssetsTag).filter(
+            AssetsTag.asset_id == asset_id, AssetsTag.tag_id.in_(current - wanted)
+        ).delete(synchronize_session=False)
+    if wanted - current:
+        session.execute(
+            insert(AssetsTag),
+            [{"asset_id": asset_id, "tag_id": tag_id} for tag_id in wanted - current],
+        )
+    if current != wanted and tag_usage.live_assets(session, [asset_id]):
+        tag_usage.queue_tag_usage_change(
+            session, added=Counter(wanted - current), removed=Counter(current - wanted)
+        )
+    asset_search.queue_search_refresh(session, asset_ids=[asset_id])
+
+
+def get_assets_owners(assets_ids: list[int], session: Session) -> dict:
+    """``(client_id, created_by)`` of each non-deleted asset among the ids."""
+    if not assets_ids:
+        return {}
+    rows = (
+        session.query(Asset.id, Asset.client_id, Asset.created_by)
+        .filter(Asset.id.in_(assets_ids), Asset.is_deleted == False)
+        .all()
+    )
+    return {
+        asset_id: (client_id, created_by) for asset_id, client_id, created_by in rows
+    }
+
+
+def add_tags_to_assets(
+    assets_ids: list[int], tags_ids: list[int], session: Session
+) -> int:
+    """Link every tag to every asset, skipping existing links. Does not commit."""
+    if not assets_ids or not tags_ids:
+        return 0
+    existing = set(
+        session.query(AssetsTag.asset_id, AssetsTag.tag_id)
+        .filter(AssetsTag.asset_id.in_(assets_ids), AssetsTag.tag_id.in_(tags_ids))
+        .all()
+    )
+    links = [
+        {"asset_id": asset_id, "tag_id": tag_id}
+        for asset_id in dict.fromkeys(assets_ids)
+        for tag_id in dict.fromkeys(tags_ids)
+        if (asset_id, tag_id) not in existing
     ]
-    for tag_id in tags_to_add:
-        session.add(AssetsTag(asset_id=asset_id, tag_id=tag_id))
-    session.commit()
+    if links:
+        session.execute(insert(AssetsTag), links)
+        live = tag_usage.live_assets(session, assets_ids)
+        tag_usage.queue_tag_usage_change(
+            session,
+            added=Counter(link["tag_id"] for link in links if link["asset_id"] in live),
+        )
+    asset_search.queue_search_refresh(session, asset_ids=assets_ids)
+    return len(links)
+
+
+def remove_tags_from_assets(
+    assets_ids: list[int], tags_ids: list[int], session: Session
+) -> int:
+    """Unlink the tags from the assets with one DELETE. Does not commit."""
+    if not assets_ids or not tags_ids:
+        return 0
+    tag_usage.queue_tag_usage_change(
+        session, removed=tag_usage.count_tag_links(session, assets_ids, tags_ids)
+    )
+    removed = (
+        session.query(AssetsTag)
+        .filter(AssetsTag.asset_id.in_(assets_ids), AssetsTag.tag_id.in_(tags_ids))
+        .delete(synchronize_session=False)
+    )
+    asset_search.queue_search_refresh(session, asset_ids=assets_ids)
+    return removed
 
 
 class IAsset(ABC):
@@ -0,0 +1,99 @@
+"""Streaming export of asset rows for ``GET /assets/export``."""
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Callable, Iterable, Iterator, Optional
+
+from sqlalchemy.orm import Session
+
+from app.models.models import Asset
+from app.schemas.asset import AssetFilters
+from app.services.asset import apply_asset_filters, scope_assets_query
+
+EXPORT_COLUMNS = (
+    Asset.id,
+    Asset.title,
+    Asset.slug,
+    Asset.description,
+    Asset.external_id,
+    Asset.asset_type,
+    Asset.client_id,
+    Asset.is_shareable,
+    Asset.is_downloadable,
+    Asset.thumbnail_url,
+    Asset.created_by,
+    Asset.created_at,
+    Asset.updated_at,
+)
+EXPORT_FIELDS = [column.key for column in EXPORT_COLUMNS]
+BOOLEAN_FIELDS = {"is_shareable", "is_downloadable"}
+# Rows fetched from the server-side cursor and sent to the client at a time
+EXPORT_BATCH_SIZE = 1000
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def stream_asset_rows(
+    session_factory: Callable[[], Session],
+    client_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    filters: Optional[AssetFilters] = None,
+) -> Iterator[dict]:
+    """Yield the exported assets as dicts, ordered by id, from a session of its own."""
+    session = session_factory()
+    try:
+        query = session.query(*EXPORT_COLUMNS)
+        query = scope_assets_query(
+            query, session, client_id=client_id, user_id=user_id
+        )
+        query = apply_asset_filters(query, filters).order_by(Asset.id)
+        for row in query.yield_per(EXPORT_BATCH_SIZE):
+            record = row._asdict()
+            for field in BOOLEAN_FIELDS:
+                record[field] = bool(record[field])
+            yield record
+    finally:
+        session.close()
+
+
+def _batched(lines: Iterable[str]) -> Iterator[str]:
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) == EXPORT_BATCH_SIZE:
+            yield "".join(batch)
+            batch = []
+    if batch:
+        yield "".join(batch)
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def encode_ndjson(rows: Iterable[dict]) -> Iterator[str]:
+    return _batched(
+        json.dumps(row, default=_json_default, separators=(",", ":")) + "\n"
+        for row in rows
+    )
+
+
+def encode_csv(rows: Iterable[dict]) -> Iterator[str]:
+    def lines():
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+
+    return _batched(lines())
+
+
+ENCODERS = {"ndjson": encode_ndjson, "csv": encode_csv}
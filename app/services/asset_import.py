@@ -0,0 +1,324 @@
+"""Chunked NDJSON/CSV import of assets, upserting by (client_id, external_id)."""
+import csv
+import json
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Callable, Iterable, Optional, Union
+
+from pydantic import ValidationError
+from sqlalchemy import and_, insert, or_, update
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app.models.models import Asset, AssetsFolder, AssetsTag
+from app.schemas.asset import (
+    AssetImportError,
+    AssetImportRow,
+    AssetImportSummary,
+    AssetType,
+)
+from app.services import asset_search, tag_usage
+from app.services.asset import SPECIFIC_ASSETS, AssetFactory
+from app.services.folder import get_folders_clients
+from app.services.tag import get_tags_clients
+
+IMPORT_FORMATS = ("ndjson", "csv")
+# Rows written per transaction
+IMPORT_CHUNK_SIZE = 500
+# Row errors kept for the summary; later ones are only counted
+MAX_REPORTED_ERRORS = 1000
+
+_NOT_UPDATED = {"folder_id", "metadata", "tags_ids", "asset_type", "client_id"}
+
+
+def _validation_detail(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in e['loc'])}: {e['msg']}"
+        for e in error.errors()
+    )
+
+
+def _csv_record(header: list[str], values: list[str]) -> dict:
+    record = {}
+    for key, value in zip(header, values):
+        if value == "":
+            continue
+        if key == "tags_ids":
+            value = [tag_id for tag_id in value.split("|") if tag_id]
+        if key.startswith("metadata."):
+            record.setdefault("metadata", {})[key[len("metadata.") :]] = value
+        else:
+            record[key] = value
+    return record
+
+
+class AssetImporter:
+    """Feed it lines with ``feed()``, then call ``finish()`` for the summary."""
+
+    def __init__(
+        self,
+        session: Session,
+        user_id: int,
+        format: str = "ndjson",
+        check_row: Callable[[AssetImportRow], Optional[str]] = None,
+        can_update: Callable[[int, int], bool] = None,
+        on_chunk: Callable[[AssetImportSummary], None] = None,
+        chunk_size: int = IMPORT_CHUNK_SIZE,
+    ):
+        if format not in IMPORT_FORMATS:
+            raise ValueError(f"Unknown import format: {format}")
+        self.session = session
+        self.user_id = user_id
+        self.format = format
+        self.check_row = check_row
+        self.can_update = can_update
+        self.on_chunk = on_chunk
+        self.chunk_size = chunk_size
+        self.started = time.monotonic()
+        self.line = 0
+        self.header: Optional[list[str]] = None
+        self.pending: list[tuple[int, AssetImportRow]] = []
+        self.pending_keys: set[tuple[int, str]] = set()
+        self.rows = self.created = self.updated = self.failed = 0
+        self.errors: list[AssetImportError] = []
+
+    def _fail(self, line: int, detail: str):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(AssetImportError(line=line, detail=detail))
+
+    def _parse(self, text: str) -> dict:
+        if self.format == "ndjson":
+            return json.loads(text)
+        return _csv_record(self.header, next(csv.reader([text])))
+
+    def feed(self, lines: Iterable[Union[str, bytes]]):
+        for text in lines:
+            self.line += 1
+            if isinstance(text, bytes):
+                try:
+                    text = text.decode("utf-8")
+                except UnicodeDecodeError as e:
+                    self.rows += 1
+                    self._fail(self.line, f"Invalid UTF-8 at byte {e.start}")
+                    continue
+            text = text.strip()
+            if not text:
+                continue
+            if self.format == "csv" and self.header is None:
+                self.header = next(csv.reader([text]))
+                continue
+            self.rows += 1
+            try:
+                row = AssetImportRow.model_validate(self._parse(text))
+            except ValidationError as e:
+                self._fail(self.line, _validation_detail(e))
+                continue
+            except (ValueError, csv.Error) as e:
+                self._fail(self.line, f"Unreadable row: {e}")
+                continue
+            key = (row.client_id, row.external_id)
+            if key in self.pending_keys:
+                self._flush_pending()
+            self.pending.append((self.line, row))
+            self.pending_keys.add(key)
+            if len(self.pending) >= self.chunk_size:
+                self._flush_pending()
+
+    def finish(self) -> AssetImportSummary:
+        self._flush_pending()
+        return self.summary()
+
+    def summary(self) -> AssetImportSummary:
+        seconds = time.monotonic() - self.started
+        return AssetImportSummary(
+            rows=self.rows,
+            created=self.created,
+            updated=self.updated,
+            failed=self.failed,
+            errors=self.errors,
+            seconds=round(seconds, 3),
+            rows_per_second=round(self.rows / seconds, 1) if seconds else 0.0,
+        )
+
+    def _flush_pending(self):
+        if not self.pending:
+            return
+        chunk, self.pending = self.pending, []
+        self.pending_keys = set()
+        self._import_chunk(chunk)
+        if self.on_chunk:
+            self.on_chunk(self.summary())
+
+    def _checked_rows(self, chunk):
+        tags_clients = get_tags_clients(
+            tags_ids=list({tag_id for _, row in chunk for tag_id in row.tags_ids}),
+            session=self.session,
+        )
+        folders_clients = get_folders_clients(
+            folders_ids=list({row.folder_id for _, row in chunk if row.folder_id}),
+            session=self.session,
+        )
+        for line, row in chunk:
+            unknown_tags = [
+                tag_id
+                for tag_id in row.tags_ids
+                if tags_clients.get(tag_id) != row.client_id
+            ]
+            if row.folder_id and folders_clients.get(row.folder_id) != row.client_id:
+                self._fail(line, f"Folder {row.folder_id} not found for this client")
+            elif unknown_tags:
+                self._fail(line, f"Tags not found for this client: {unknown_tags}")
+            elif self.check_row and (error := self.check_row(row)):
+                self._fail(line, error)
+            else:
+                yield line, row
+
+    def _existing_assets(self, rows) -> dict:
+        external_ids: dict[int, set[str]] = {}
+        for _, row in rows:
+            external_ids.setdefault(row.client_id, set()).add(row.external_id)
+        query = self.session.query(
+            Asset.id,
+            Asset.client_id,
+            Asset.external_id,
+            Asset.asset_type,
+            Asset.created_by,
+            Asset.is_deleted,
+        ).filter(
+            or_(
+                *(
+                    and_(Asset.client_id == client_id, Asset.external_id.in_(ids))
+                    for client_id, ids in external_ids.items()
+                )
+            )
+        )
+        return {(row.client_id, row.external_id): row for row in query.all()}
+
+    def _import_chunk(self, chunk):
+        rows = list(self._checked_rows(chunk))
+        if rows:
+            self._upsert(rows)
+
+    def _upsert(self, rows, retry: bool = True):
+        existing = self._existing_assets(rows)
+
+        creates, updates = [], []
+        for line, row in rows:
+            found = existing.get((row.client_id, row.external_id))
+            if found is None:
+                try:
+                    creates.append((line, row, self._new_asset(row)))
+                except TypeError:
+                    self._fail(line, f"Metadata does not match {row.asset_type}")
+            elif found.asset_type != row.asset_type:
+                self._fail(line, f"Existing asset {found.id} is a {found.asset_type}")
+            elif self.can_update and not self.can_update(
+                found.client_id, found.created_by
+            ):
+                self._fail(line, f"No permission to update asset {found.id}")
+            else:
+                updates.append((line, row, found))
+        if not creates and not updates:
+            return
+
+        try:
+            self._write(creates, updates)
+            self.session.commit()
+        except IntegrityError as e:
+            self.session.rollback()
+            if retry:
+                # Another import inserted some of these keys since they were
+                # looked up; the retry updates those assets instead
+                self._upsert(
+                    [(line, row) for line, row, _ in creates + updates], retry=False
+                )
+                return
+            for line, *_ in creates + updates:
+                self._fail(line, f"Chunk rolled back: {e.__class__.__name__}")
+            return
+        except SQLAlchemyError as e:
+            self.session.rollback()
+            for line, *_ in creates + updates:
+                self._fail(line, f"Chunk rolled back: {e.__class__.__name__}")
+            return
+        self.created += len(creates)
+        self.updated += len(updates)
+
+    def _new_asset(self, row: AssetImportRow) -> Asset:
+        data = row.model_dump(exclude={"folder_id", "metadata", "tags_ids"})
+        data.update(row.metadata.model_dump(exclude_unset=True))
+        data["created_by"] = self.user_id
+        return AssetFactory.get_asset(AssetType(row.asset_type)).create(data)
+
+    def _write(self, creates, updates):
+        self.session.add_all([asset for _, _, asset in creates])
+        self.session.flush()
+        targets = [(row, asset.id) for _, row, asset in creates]
+
+        # Restored assets bring their current tag links back into the counters
+        restored = [found.id for _, _, found in updates if found.is_deleted]
+        restored_links = tag_usage.count_tag_links(self.session, restored, live=False)
+
+        if updates:
+            now = datetime.now(timezone.utc)
+            base_rows = []
+            metadata_rows: dict[str, list[dict]] = {}
+            for _, row, found in updates:
+                base = row.model_dump(exclude=_NOT_UPDATED, exclude_unset=True)
+                if found.is_deleted:
+                    base.update(is_deleted=False, deleted_at=None, deleted_by=None)
+                base_rows.append({**base, "id": found.id, "updated_at": now})
+                metadata = row.metadata.model_dump(exclude_unset=True)
+                if metadata:
+                    metadata_rows.setdefault(row.asset_type, []).append(
+                        {**metadata, "id": found.id}
+                    )
+                targets.append((row, found.id))
+            self.session.execute(update(Asset), base_rows)
+            for asset_type, type_rows in metadata_rows.items():
+                self.session.execute(update(SPECIFIC_ASSETS[asset_type]), type_rows)
+            asset_search.queue_search_refresh(
+                self.session, asset_ids=[found.id for _, _, found in updates]
+            )
+
+        asset_ids = [asset_id for _, asset_id in targets]
+        self._add_links(
+            AssetsFolder,
+            "folder_id",
+            {(asset_id, row.folder_id) for row, asset_id in targets if row.folder_id},
+            asset_ids,
+        )
+        tag_links = self._add_links(
+            AssetsTag,
+            "tag_id",
+            {
+                (asset_id, tag_id)
+                for row, asset_id in targets
+                for tag_id in row.tags_ids
+            },
+            asset_ids,
+        )
+        tag_usage.queue_tag_usage_change(
+            self.session,
+            added=Counter(link["tag_id"] for link in tag_links) + restored_links,
+        )
+
+    def _add_links(self, model, key: str, pairs: set, asset_ids: list[int]):
+        """Insert the ``(asset_id, value)`` pairs not linked yet; returns them."""
+        if not pairs:
+            return []
+        column = getattr(model, key)
+        existing = set(
+            self.session.query(model.asset_id, column)
+            .filter(model.asset_id.in_(asset_ids))
+            .all()
+        )
+        links = [
+            {"asset_id": asset_id, key: value}
+            for asset_id, value in sorted(pairs - existing)
+        ]
+        if links:
+            self.session.execute(insert(model), links)
+        return links
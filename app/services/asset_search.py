@@ -0,0 +1,295 @@
+"""In-process inverted index behind ``GET /assets/search``.
+
+Each worker keeps its own copy: it polls ``updated_at`` for writes made
+elsewhere and is rebuilt every ``SEARCH_INDEX_TTL`` seconds.
+"""
+import math
+import os
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+from itertools import chain
+from typing import Iterable, Optional
+
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session
+
+from app.models.models import Asset, AssetsTag, Tag
+from app.services.change_sets import ChangeSet, attribute_values
+
+# Relative weight of a match in each indexed field
+FIELD_WEIGHTS = {"title": 3.0, "slug": 2.0, "tag": 2.0, "description": 1.0}
+# A term matched only by prefix scores this fraction of an exact match
+PREFIX_FACTOR = 0.5
+# Ranked ids handed to the database per visibility check
+CANDIDATE_BATCH = 1000
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: Optional[str]) -> list[str]:
+    return _TOKEN_RE.findall(text.lower()) if text else []
+
+
+class AssetSearchIndex:
+    def __init__(self, poll_interval: float = 10, ttl: float = 600):
+        self.poll_interval = poll_interval
+        self.ttl = ttl
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self._postings: dict[str, dict[int, float]] = {}
+        self._vocabulary: list[str] = []  # sorted, for prefix lookups
+        self._documents: dict[int, tuple[Optional[int], frozenset[str]]] = {}
+        self._tag_assets: dict[int, set[int]] = {}
+        self._asset_tags: dict[int, frozenset[int]] = {}
+        self._stale: set[int] = set()
+        self._loaded = self._rebuilding = False
+        self._loaded_at = self._polled_at = 0.0
+        # (max id, max updated_at) of the assets table as last seen
+        self._high_water = (None, None)
+
+    def __len__(self):
+        return len(self._documents)
+
+    def _add_term(self, term: str, asset_id: int, weight: float):
+        postings = self._postings.get(term)
+        if postings is None:
+            postings = self._postings[term] = {}
+            insort(self._vocabulary, term)
+        postings[asset_id] = max(postings.get(asset_id, 0.0), weight)
+
+    def _remove(self, asset_id: int):
+        document = self._documents.pop(asset_id, None)
+        if document is not None:
+            for term in document[1]:
+                postings = self._postings[term]
+                postings.pop(asset_id, None)
+                if not postings:
+                    del self._postings[term]
+                    del self._vocabulary[bisect_left(self._vocabulary, term)]
+        for tag_id in self._asset_tags.pop(asset_id, ()):
+            self._tag_assets[tag_id].discard(asset_id)
+
+    def put(self, asset_id: int, client_id: Optional[int], fields: dict, tags: dict):
+        """(Re)index one asset. ``tags`` maps tag id -> tag name."""
+        with self._lock:
+            self._remove(asset_id)
+            terms = set()
+            for field, text in chain(
+                fields.items(), (("tag", name) for name in tags.values())
+            ):
+                for term in tokenize(text):
+                    self._add_term(term, asset_id, FIELD_WEIGHTS[field])
+                    terms.add(term)
+            self._documents[asset_id] = (client_id, frozenset(terms))
+            self._asset_tags[asset_id] = frozenset(tags)
+            for tag_id in tags:
+                self._tag_assets.setdefault(tag_id, set()).add(asset_id)
+
+    def discard(self, asset_id: int):
+        with self._lock:
+            self._remove(asset_id)
+
+    def mark_stale(self, asset_ids: Iterable[int] = (), tag_ids: Iterable[int] = ()):
+        with self._lock:
+            self._stale.update(asset_ids)
+            for tag_id in tag_ids:
+                self._stale.update(self._tag_assets.get(tag_id, ()))
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+
+    def sync(self, session: Session):
+        with self._lock:
+            now = time.monotonic()
+            if not self._loaded:
+                self._load_all(session, now)
+                return
+            rebuild = now - self._loaded_at >= self.ttl and not self._rebuilding
+            if rebuild:
+                self._rebuilding = True
+            else:
+                self._refresh(session, now)
+        if rebuild:
+            self._rebuild(session)
+
+    def _load_all(self, session: Session, now: float):
+        # Read before loading so writes racing the load are re-read
+        self._high_water = _high_water(session)
+        _load(self, session)
+        self._loaded = True
+        self._loaded_at = self._polled_at = now
+
+    def _refresh(self, session: Session, now: float):
+        if now - self._polled_at >= self.poll_interval:
+            self._polled_at = now
+            high_water = _high_water(session)
+            if high_water != self._high_water:
+                self._stale.update(_written_since(session, *self._high_water))
+                self._high_water = high_water
+        if self._stale:
+            asset_ids = list(self._stale)
+            self._stale.clear()
+            _load(self, session, asset_ids)
+
+    def _rebuild(self, session: Session):
+        # Built without holding the lock, so searches keep using this index
+        # until the new one is swapped in
+        fresh = AssetSearchIndex(poll_interval=self.poll_interval, ttl=self.ttl)
+        try:
+            fresh._load_all(session, time.monotonic())
+        except BaseException:
+            with self._lock:
+                self._rebuilding = False
+            raise
+        with self._lock:
+            # Assets marked stale while building stay stale
+            for name in _INDEX_STATE:
+                setattr(self, name, getattr(fresh, name))
+            self._rebuilding = False
+
+    def search(self, query: str, client_id: Optional[int] = None) -> list[int]:
+        """Ids of the assets matching every term (or term prefix) of ``query``."""
+        terms = tokenize(query)
+        if not terms:
+            return []
+        with self._lock:
+            total = len(self._documents) or 1
+            scores: Optional[dict[int, float]] = None
+            for query_term in dict.fromkeys(terms):
+                term_scores: dict[int, float] = {}
+                start = bisect_left(self._vocabulary, query_term)
+                for term in self._vocabulary[start:]:
+                    if not term.startswith(query_term):
+                        break
+                    postings = self._postings[term]
+                    idf = math.log(1 + total / len(postings))
+                    factor = 1.0 if term == query_term else PREFIX_FACTOR
+                    for asset_id, weight in postings.items():
+                        score = weight * idf * factor
+                        if score > term_scores.get(asset_id, 0.0):
+                            term_scores[asset_id] = score
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {
+                        asset_id: score + term_scores[asset_id]
+                        for asset_id, score in scores.items()
+                        if asset_id in term_scores
+                    }
+                if not scores:
+                    return []
+            if client_id is not None:
+                scores = {
+                    asset_id: score
+                    for asset_id, score in scores.items()
+                    if self._documents[asset_id][0] == client_id
+                }
+        return sorted(scores, key=lambda asset_id: (-scores[asset_id], asset_id))
+
+
+# What a rebuild replaces
+_INDEX_STATE = (
+    "_postings",
+    "_vocabulary",
+    "_documents",
+    "_tag_assets",
+    "_asset_tags",
+    "_loaded",
+    "_loaded_at",
+    "_polled_at",
+    "_high_water",
+)
+
+
+def _high_water(session: Session) -> tuple:
+    return tuple(session.query(func.max(Asset.id), func.max(Asset.updated_at)).one())
+
+
+def _written_since(session: Session, max_id, updated_at) -> list[int]:
+    """Ids of the assets created after ``max_id`` or updated since ``updated_at``,
+    soft-deleted ones included so they get dropped."""
+    condition = Asset.id > (max_id or 0)
+    if updated_at is not None:
+        condition = or_(condition, Asset.updated_at >= updated_at)
+    return [asset_id for (asset_id,) in session.query(Asset.id).filter(condition)]
+
+
+def _load(index: AssetSearchIndex, session: Session, asset_ids: list[int] = None):
+    assets = session.query(
+        Asset.id, Asset.client_id, Asset.title, Asset.slug, Asset.description
+    ).filter(Asset.is_deleted == False)
+    tags = (
+        session.query(AssetsTag.asset_id, Tag.id, Tag.name)
+        .join(Tag, Tag.id == AssetsTag.tag_id)
+        .filter(Tag.is_deleted == False)
+    )
+    if asset_ids is not None:
+        assets = assets.filter(Asset.id.in_(asset_ids))
+        tags = tags.filter(AssetsTag.asset_id.in_(asset_ids))
+
+    tags_by_asset: dict[int, dict[int, str]] = {}
+    for asset_id, tag_id, name in tags.all():
+        tags_by_asset.setdefault(asset_id, {})[tag_id] = name
+
+    found = set()
+    for asset_id, client_id, title, slug, description in assets.all():
+        found.add(asset_id)
+        index.put(
+            asset_id,
+            client_id,
+            {"title": title, "slug": slug, "description": description},
+            tags_by_asset.get(asset_id, {}),
+        )
+    # Deleted or soft-deleted since they were indexed
+    for asset_id in set(asset_ids or ()) - found:
+        index.discard(asset_id)
+
+
+search_index = AssetSearchIndex(
+    poll_interval=float(os.environ.get("SEARCH_INDEX_POLL_SECONDS", 10)),
+    ttl=float(os.environ.get("SEARCH_INDEX_TTL", 600)),
+)
+
+
+def search_asset_ids(
+    query: str, session: Session, client_id: Optional[int] = None
+) -> list[int]:
+    """Every matching asset id, best first."""
+    search_index.sync(session)
+    return search_index.search(query, client_id=client_id)
+
+
+def _collect_search_changes(session: Session, objects):
+    for obj in objects:
+        if isinstance(obj, Asset):
+            yield ("asset", obj.id)
+        elif isinstance(obj, AssetsTag):
+            yield from (("asset", v) for v in attribute_values(obj, "asset_id"))
+        elif isinstance(obj, Tag):
+            yield ("tag", obj.id)
+
+
+def _apply_search_changes(changes: set):
+    search_index.mark_stale(
+        asset_ids=[key for kind, key in changes if kind == "asset"],
+        tag_ids=[key for kind, key in changes if kind == "tag"],
+    )
+
+
+search_changes = ChangeSet(
+    "search_changes",
+    collect=_collect_search_changes,
+    after_commit=_apply_search_changes,
+)
+
+
+def queue_search_refresh(
+    session: Session, asset_ids: Iterable[int] = (), tag_ids: Iterable[int] = ()
+):
+    search_changes.add(session, (("asset", asset_id) for asset_id in asset_ids))
+    search_changes.add(session, (("tag", tag_id) for tag_id in tag_ids))
@@ -0,0 +1,70 @@
+"""Per-transaction change sets kept in ``session.info``."""
+from itertools import chain
+from typing import Callable, Iterable, Optional
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+
+def attribute_values(obj, attribute: str) -> set:
+    """Current and pre-flush values of ``attribute`` on a flushed object."""
+    history = inspect(obj).attrs[attribute].history
+    return {
+        value
+        for value in chain(history.added, history.unchanged, history.deleted)
+        if value is not None
+    }
+
+
+class ChangeSet:
+    """Keys gathered during a transaction, handled before or after commit."""
+
+    def __init__(
+        self,
+        key: str,
+        collect: Optional[Callable] = None,
+        before_commit: Optional[Callable] = None,
+        after_commit: Optional[Callable] = None,
+        factory: Callable = set,
+    ):
+        self.key = key
+        self.collect = collect
+        self.before_commit = before_commit
+        self.after_commit = after_commit
+        self.factory = factory
+        if collect:
+            event.listen(Session, "after_flush", self._after_flush)
+        if before_commit:
+            event.listen(Session, "before_commit", self._before_commit)
+        if after_commit:
+            event.listen(Session, "after_commit", self._after_commit)
+        event.listen(Session, "after_rollback", self._after_rollback)
+
+    def pending(self, session: Session):
+        return session.info.setdefault(self.key, self.factory())
+
+    def add(self, session: Session, keys: Iterable):
+        self.pending(session).update(keys)
+
+    def _after_flush(self, session: Session, flush_context):
+        keys = self.collect(
+            session, chain(session.new, session.dirty, session.deleted)
+        )
+        self.add(session, keys)
+
+    def _before_commit(self, session: Session):
+        session.flush()
+        if self.after_commit:
+            changes = session.info.get(self.key)
+        else:
+            changes = session.info.pop(self.key, None)
+        if changes:
+            self.before_commit(session, changes)
+
+    def _after_commit(self, session: Session):
+        changes = session.info.pop(self.key, None)
+        if changes:
+            self.after_commit(changes)
+
+    def _after_rollback(self, session: Session):
+        session.info.pop(self.key, None)
@@ -3,9 +3,17 @@ import pytz
 from typing import Optional
 from fastapi import HTTPException
 from sqlalchemy.orm import Session
-from sqlalchemy import asc, desc, or_
 from app.models.models import Feature
 from app.schemas.feature import FeatureCreate, FeatureUpdate, FeatureRead
+from app.services.reference import (
+    bump_reference,
+    get_reference,
+    list_reference,
+    register_reference,
+)
+
+
+register_reference("features", Feature, FeatureRead)
 
 
 def get_feature_all(
@@ -15,25 +23,21 @@ def get_feature_all(
     search: Optional[str] = None,
     order: str = "asc",
 ):
-    query = session.query(Feature).filter(Feature.is_deleted == False)
-    if search:
-        search_term = f"%{search}%"
-        query = query.filter(
-            or_(Feature.name.ilike(search_term), Feature.slug.ilike(search_term))
-        )
-
-    if order == "desc":
-        query = query.order_by(desc(Feature.name))
-    else:
-        query = query.order_by(asc(Feature.name))
-
-    query = query.offset(page * limit).limit(limit)
-
-    features = query.all()
-    return [FeatureRead.parse_obj(feat.__dict__) for feat in features]
+    return list_reference(
+        "features",
+        session,
+        search_fields=("name", "slug"),
+        limit=limit,
+        page=page,
+        search=search,
+        order=order,
+    )
 
 
 def get_feature_id(feature_id: int, session: Session) -> FeatureRead:
+    cached = get_reference("features", feature_id, session)
+    if cached is not None:
+        return cached
     db_feature = (
         session.query(Feature)
         .filter(Feature.id == feature_id, Feature.is_deleted == False)
@@ -59,6 +63,7 @@ def create_feature(feature: FeatureCreate, session: Session) -> FeatureRead:
     db_feature = Feature(name=feature.name, slug=feature.slug, deleted_by=0)
     session.add(db_feature)
     session.commit()
+    bump_reference("features")
     session.refresh(db_feature)
     return FeatureRead.parse_obj(db_feature.__dict__)
 
@@ -79,6 +84,7 @@ def update_feature(
     for field, value in feature.dict(exclude_unset=True).items():
         setattr(db_feature, field, value)
     session.commit()
+    bump_reference("features")
     session.refresh(db_feature)
     db_feature = session.query(Feature).filter(Feature.id == feature_id).first()
     return FeatureRead.parse_obj(db_feature.__dict__)
@@ -96,3 +102,4 @@ def delete_feature(feature_id: int, user_id: int, session: Session):
     db_feature.deleted_at = datetime.now(pytz.utc)
     db_feature.deleted_by = user_id
     session.commit()
+    bump_reference("features")
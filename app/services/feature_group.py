@@ -3,13 +3,26 @@ from typing import Optional
 import pytz
 from fastapi import HTTPException
 from sqlalchemy.orm import Session
-from sqlalchemy import asc, desc, or_
-from app.models.models import FeatureGroup
+from sqlalchemy import func, insert, literal, select
+from app.models.models import (
+    FeatureGroup,
+    FeatureGroupClosure,
+    FeatureGroupsFeatureGroup,
+)
 from app.schemas.feature_group import (
     FeatureGroupCreate,
     FeatureGroupRead,
     FeatureGroupUpdate,
 )
+from app.services.reference import (
+    bump_reference,
+    get_reference,
+    list_reference,
+    register_reference,
+)
+
+
+register_reference("feature_groups", FeatureGroup, FeatureGroupRead)
 
 
 def get_featureGroup_all(
@@ -19,23 +32,21 @@ def get_featureGroup_all(
     search: Optional[str] = None,
     order: str = "asc",
 ):
-    query = session.query(FeatureGroup).filter(FeatureGroup.is_deleted == False)
-    if search:
-        search_term = f"%{search}%"
-        query = query.filter(or_(FeatureGroup.name.ilike(search_term)))
-
-    if order == "desc":
-        query = query.order_by(desc(FeatureGroup.name))
-    else:
-        query = query.order_by(asc(FeatureGroup.name))
-
-    query = query.offset(page * limit).limit(limit)
-
-    featuresGroups = query.all()
-    return [FeatureGroupRead.parse_obj(feat.__dict__) for feat in featuresGroups]
+    return list_reference(
+        "feature_groups",
+        session,
+        search_fields=("name",),
+        limit=limit,
+        page=page,
+        search=search,
+        order=order,
+    )
 
 
 def get_featureGroup_id(featureGroup_id: int, session: Session) -> FeatureGroupRead:
+    cached = get_reference("feature_groups", featureGroup_id, session)
+    if cached is not None:
+        return cached
     db_feature = (
         session.query(FeatureGroup)
         .filter(FeatureGroup.id == featureGroup_id, FeatureGroup.is_deleted == False)
@@ -68,7 +79,14 @@ def create_featureGroup(
         name=featureGroup.name, client_id=featureGroup.client_id, deleted_by=0
     )
     session.add(db_feature)
+    session.flush()
+    session.add(
+        FeatureGroupClosure(
+            ancestor_id=db_feature.id, descendant_id=db_feature.id, depth=0
+        )
+    )
     session.commit()
+    bump_reference("feature_groups")
     session.refresh(db_feature)
     return FeatureGroupRead.parse_obj(db_feature.__dict__)
 
@@ -89,6 +107,7 @@ def update_featureGroup(
     for field, value in featureGroup.dict(exclude_unset=True).items():
         setattr(db_feature, field, value)
     session.commit()
+    bump_reference("feature_groups")
     session.refresh(db_feature)
     db_feature = (
         session.query(FeatureGroup).filter(FeatureGroup.id == featureGroup_id).first()
@@ -108,3 +127,140 @@ def delete_featureGroup(featureGroup_id: int, user_id: int, session: Session):
     db_feature.deleted_at = datetime.now(pytz.utc)
     db_feature.deleted_by = user_id
     session.commit()
+    bump_reference("feature_groups")
+
+
+# Hard stop for hierarchy walks; also bounds cycles in data that predates
+# the closure table, since new edges that would close a cycle are rejected.
+MAX_FEATURE_GROUP_DEPTH = 32
+
+
+def _closure_rows(session: Session, ancestor_ids: list[int] = None):
+    walk = session.query(
+        FeatureGroup.id.label("ancestor_id"),
+        FeatureGroup.id.label("descendant_id"),
+        literal(0).label("depth"),
+    )
+    if ancestor_ids is not None:
+        walk = walk.filter(FeatureGroup.id.in_(ancestor_ids))
+    walk = walk.cte(name="feature_group_walk", recursive=True)
+    step = (
+        session.query(
+            walk.c.ancestor_id,
+            FeatureGroupsFeatureGroup.child_feature_group_id,
+            walk.c.depth + 1,
+        )
+        .join(
+            walk,
+            FeatureGroupsFeatureGroup.parent_feature_group_id
+            == walk.c.descendant_id,
+        )
+        .filter(walk.c.depth < MAX_FEATURE_GROUP_DEPTH)
+    )
+    walk = walk.union(step)
+    return select(
+        walk.c.ancestor_id, walk.c.descendant_id, func.min(walk.c.depth)
+    ).group_by(walk.c.ancestor_id, walk.c.descendant_id)
+
+
+def _insert_closure_rows(session: Session, ancestor_ids: list[int] = None):
+    session.execute(
+        insert(FeatureGroupClosure).from_select(
+            ["ancestor_id", "descendant_id", "depth"],
+            _closure_rows(session, ancestor_ids),
+        )
+    )
+
+
+def _refresh_closure_above(group_id: int, session: Session):
+    # Only the closure rows of the group's ancestors (itself included) can
+    # change when one of its outgoing edges is added or removed.
+    ancestor_ids = [
+        ancestor_id
+        for (ancestor_id,) in session.query(FeatureGroupClosure.ancestor_id)
+        .filter(FeatureGroupClosure.descendant_id == group_id)
+        .all()
+    ] or [group_id]
+    session.query(FeatureGroupClosure).filter(
+        FeatureGroupClosure.ancestor_id.in_(ancestor_ids)
+    ).delete(synchronize_session=False)
+    _insert_closure_rows(session, ancestor_ids)
+
+
+def add_featureGroup_child(parent_id: int, child_id: int, session: Session):
+    if parent_id == child_id:
+        raise HTTPException(
+            status_code=400, detail="A FeatureGroup can't be its own child."
+        )
+    found = (
+        session.query(func.count(FeatureGroup.id))
+        .filter(
+            FeatureGroup.id.in_([parent_id, child_id]),
+            FeatureGroup.is_deleted == False,
+        )
+        .scalar()
+    )
+    if found != 2:
+        raise HTTPException(status_code=404, detail="FeatureGroup not found.")
+
+    existing_edge = (
+        session.query(FeatureGroupsFeatureGroup)
+        .filter(
+            FeatureGroupsFeatureGroup.parent_feature_group_id == parent_id,
+            FeatureGroupsFeatureGroup.child_feature_group_id == child_id,
+        )
+        .first()
+    )
+    if existing_edge:
+        raise HTTPException(
+            status_code=400,
+            detail=f"FeatureGroup {child_id} is already a child of {parent_id}.",
+        )
+
+    creates_cycle = (
+        session.query(FeatureGroupClosure)
+        .filter(
+            FeatureGroupClosure.ancestor_id == child_id,
+            FeatureGroupClosure.descendant_id == parent_id,
+        )
+        .first()
+    )
+    if creates_cycle:
+        raise HTTPException(
+            status_code=400,
+            detail=f"FeatureGroup {child_id} is an ancestor of {parent_id}.",
+        )
+
+    session.add(
+        FeatureGroupsFeatureGroup(
+            parent_feature_group_id=parent_id, child_feature_group_id=child_id
+        )
+    )
+    session.flush()
+    _refresh_closure_above(parent_id, session)
+    session.commit()
+
+
+def remove_featureGroup_child(parent_id: int, child_id: int, session: Session):
+    edge = (
+        session.query(FeatureGroupsFeatureGroup)
+        .filter(
+            FeatureGroupsFeatureGroup.parent_feature_group_id == parent_id,
+            FeatureGroupsFeatureGroup.child_feature_group_id == child_id,
+        )
+        .first()
+    )
+    if not edge:
+        raise ValueError(f"FeatureGroup {child_id} is not a child of {parent_id}.")
+    session.delete(edge)
+    session.flush()
+    _refresh_closure_above(parent_id, session)
+    session.commit()
+
+
+def rebuild_featureGroup_closure(session: Session) -> int:
+    """Recompute the whole closure table from the parent/child edges."""
+    session.query(FeatureGroupClosure).delete(synchronize_session=False)
+    _insert_closure_rows(session)
+    session.commit()
+    return session.query(func.count()).select_from(FeatureGroupClosure).scalar()
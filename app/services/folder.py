@@ -1,16 +1,22 @@
-from sqlalchemy import or_
-from sqlalchemy.orm import Session
+from collections import Counter
+from contextlib import contextmanager
+
+from fastapi import HTTPException
+from sqlalchemy import String, cast, func, insert, literal, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy.orm.attributes import set_committed_value
 
 from app.models.models import (
     Asset,
     Folder,
     User,
-    FeatureGroupsFolder,
-    FeatureGroup,
-    FoldersMarket,
-    UsersFolder,
+    UserVisibleFolder,
     AssetsFolder,
+    AssetsTag,
 )
+from app.services import tag_usage
+from app.services.folder_visibility import queue_folder_refresh
 from app.schemas.folder import (
     FolderCreate,
     FolderReadNoChild,
@@ -40,19 +46,12 @@ def get_user_corporate_folders(client_id: int, session: Session):
     return folders
 
 
-def get_user_regular_folders(
-    user: User, user_feature_group_ids: list[int], session: Session
-):
+def get_user_regular_folders(user: User, session: Session):
     folders = (
         session.query(Folder)
-        .join(FeatureGroupsFolder)
-        .join(FeatureGroup)
-        .join(FoldersMarket)
-        .filter(FeatureGroupsFolder.feature_group_id.in_(user_feature_group_ids))
-        .filter(FeatureGroup.client_id == user.client_id)
-        .filter(Folder.is_user_folder == False)
-        .filter(Folder.is_public == True)
-        .filter(FoldersMarket.market_id == user.market_id)
+        .join(UserVisibleFolder, UserVisibleFolder.folder_id == Folder.id)
+        .filter(UserVisibleFolder.user_id == user.id)
+        .filter(UserVisibleFolder.source == "feature_group")
         .all()
     )
     return folders
@@ -61,56 +60,127 @@ def get_user_regular_folders(
 def get_user_boards(user: User, session: Session):
     folders = (
         session.query(Folder)
-        .join(UsersFolder, isouter=True)
-        .filter(Folder.is_user_folder == True)
-        .filter(Folder.client_id == user.client_id)
-        .filter(or_(UsersFolder.user_id == user.id, Folder.owned_by == user.id))
+        .join(UserVisibleFolder, UserVisibleFolder.folder_id == Folder.id)
+        .filter(UserVisibleFolder.user_id == user.id)
+        .filter(UserVisibleFolder.source == "board")
         .all()
     )
     return folders
 
 
+# Levels below the listed folders that FolderReadTree renders
+FOLDER_TREE_MAX_DEPTH = 2
+
+
+def load_folder_trees(
+    folders: list[Folder], session: Session, max_depth: int = FOLDER_TREE_MAX_DEPTH
+) -> list[Folder]:
+    """Populate ``subfolders`` down to ``max_depth`` with one recursive query."""
+    if not folders:
+        return folders
+
+    tree = (
+        session.query(Folder.id.label("id"), literal(0).label("depth"))
+        .filter(Folder.id.in_([folder.id for folder in folders]))
+        .cte(name="folder_tree", recursive=True)
+    )
+    step = (
+        session.query(Folder.id, tree.c.depth + 1)
+        .join(tree, Folder.parent_id == tree.c.id)
+        .filter(Folder.is_deleted == False)
+        .filter(tree.c.depth < max_depth)
+    )
+    tree = tree.union(step)
+    nodes = (
+        session.query(Folder)
+        .filter(Folder.id.in_(session.query(tree.c.id)))
+        .order_by(Folder.id)
+        .all()
+    )
+
+    children = {}
+    for node in nodes:
+        children.setdefault(node.parent_id, []).append(node)
+    for node in set(nodes).union(folders):
+        set_committed_value(node, "subfolders", children.get(node.id, []))
+    return folders
+
+
 def get_by_id(folder_id: int, session: Session):
     folder = session.query(Folder).get(folder_id)
     return folder
 
 
-def folder_is_accessible(
-    user: User,
-    folder: Folder,
-    session: Session,
-    user_feature_group_ids: list[int] = None,
-):
-    if folder.is_user_folder:
-        folder = (
-            session.query(Folder)
-            .join(UsersFolder, isouter=True)
-            .filter(Folder.id == folder.id)
-            .filter(Folder.is_user_folder == True)
-            .filter(Folder.client_id == user.client_id)
-            .filter(or_(UsersFolder.user_id == user.id, Folder.owned_by == user.id))
-            .first()
-        )
-    else:
-        folder = (
-            session.query(Folder)
-            .join(FeatureGroupsFolder)
-            .join(FeatureGroup)
-            .join(FoldersMarket)
-            .filter(Folder.id == folder.id)
-            .filter(FeatureGroupsFolder.feature_group_id.in_(user_feature_group_ids))
-            .filter(FeatureGroup.client_id == user.client_id)
-            .filter(Folder.is_user_folder == False)
-            .filter(Folder.is_public == True)
-            .filter(FoldersMarket.market_id == user.market_id)
-            .first()
+def folder_is_accessible(user: User, folder: Folder, session: Session):
+    visible = (
+        session.query(UserVisibleFolder)
+        .filter(UserVisibleFolder.user_id == user.id)
+        .filter(UserVisibleFolder.folder_id == folder.id)
+        .first()
+    )
+    return visible is not None
+
+
+def _folder_path(folder: Folder) -> str:
+    # NULL until backfill-folder-paths has run; prefix matching on it would
+    # silently match nothing or build corrupt child paths
+    if folder.path is None:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Folder {folder.id} has no path yet, "
+            "run `python -m app.cli backfill-folder-paths`",
         )
-    return folder is not None
+    return folder.path
+
+
+def _child_path(parent: Folder, folder_id: int) -> str:
+    return f"{_folder_path(parent) if parent else '/'}{folder_id}/"
+
+
+def in_subtree(folder: Folder):
+    """Filter matching the folder and its descendants with one index range scan."""
+    return Folder.path.startswith(_folder_path(folder))
+
+
+def is_in_subtree(folder: Folder, ancestor: Folder) -> bool:
+    return _folder_path(folder).startswith(_folder_path(ancestor))
+
+
+def get_subtree(folder: Folder, session: Session, max_depth: int = None):
+    """The folder and its live descendants, parents first."""
+    query = session.query(Folder).filter(
+        in_subtree(folder), Folder.is_deleted == False
+    )
+    if max_depth is not None:
+        query = query.filter(Folder.depth <= folder.depth + max_depth)
+    return query.order_by(Folder.path).all()
+
+
+def get_ancestors(folder: Folder, session: Session):
+    """Ancestors of the folder, root first, read from its path."""
+    ancestor_ids = [
+        int(part) for part in _folder_path(folder).strip("/").split("/")[:-1]
+    ]
+    if not ancestor_ids:
+        return []
+    return (
+        session.query(Folder)
+        .filter(Folder.id.in_(ancestor_ids))
+        .order_by(Folder.depth)
+        .all()
+    )
 
 
 def create_folder(
     user_id: int, folder: FolderCreate, session: Session
 ) -> FolderReadNoChild:
+    parent = None
+    if folder.parent_id:
+        parent = get_by_id(folder_id=folder.parent_id, session=session)
+        if not parent:
+            raise HTTPException(status_code=404, detail="Parent folder not found")
+        # Fail before inserting rather than after the flush
+        _folder_path(parent)
     db_folder = Folder(
         name=folder.name,
         parent_id=folder.parent_id,
@@ -119,71 +189,215 @@ def create_folder(
         icon=folder.icon,
         client_id=folder.client_id,
         owned_by=user_id,
+        depth=parent.depth + 1 if parent else 0,
     )
     session.add(db_folder)
+    session.flush()
+    db_folder.path = _child_path(parent, db_folder.id)
     session.commit()
     session.refresh(db_folder)
     return FolderReadNoChild.model_validate(db_folder)
 
 
+def move_folder(folder: Folder, parent_id: int, session: Session):
+    """Re-parent the folder and rewrite the paths of its whole subtree."""
+    parent = None
+    if parent_id:
+        parent = get_by_id(folder_id=parent_id, session=session)
+        if not parent:
+            raise HTTPException(status_code=404, detail="Parent folder not found")
+        if is_in_subtree(parent, folder):
+            raise HTTPException(
+                status_code=400,
+                detail="A folder can't be moved into itself or its subfolders",
+            )
+
+    old_path = _folder_path(folder)
+    new_path = _child_path(parent, folder.id)
+    depth_delta = (parent.depth + 1 if parent else 0) - folder.depth
+    session.query(Folder).filter(Folder.path.startswith(old_path)).update(
+        {
+            "path": literal(new_path)
+            + func.substr(Folder.path, len(old_path) + 1, type_=String),
+            "depth": Folder.depth + depth_delta,
+        },
+        synchronize_session=False,
+    )
+    session.query(Folder).filter(Folder.id == folder.id).update(
+        {"parent_id": parent_id}, synchronize_session=False
+    )
+
+
 def update_folder(folder_id: int, folder: FolderUpdate, session: Session):
-    session.query(Folder).filter(Folder.id == folder_id).update(folder.model_dump())
+    changes = folder.model_dump(exclude_unset=True)
+    db_folder = get_by_id(folder_id=folder_id, session=session)
+    if not db_folder:
+        raise HTTPException(status_code=404, detail="Folder not found")
+    if "parent_id" in changes:
+        parent_id = changes.pop("parent_id")
+        if parent_id != db_folder.parent_id:
+            move_folder(folder=db_folder, parent_id=parent_id, session=session)
+    if changes:
+        session.query(Folder).filter(Folder.id == folder_id).update(changes)
+    queue_folder_refresh(session, [folder_id])
     session.commit()
     db_folder = session.query(Folder).get(folder_id)
     return FolderReadNoChild.model_validate(db_folder)
 
 
 def delete_folder(folder: FolderDelete, session: Session):
-    session.query(Folder).filter(Folder.id == folder.id).update(
-        {
-            "is_deleted": True,
-            "deleted_at": folder.deleted_at,
-            "deleted_by": folder.deleted_by,
-        }
+    # Soft-deletes the whole subtree and its assets with set-based UPDATEs
+    deleted = {
+        "is_deleted": True,
+        "deleted_at": folder.deleted_at,
+        "deleted_by": folder.deleted_by,
+    }
+    db_folder = get_by_id(folder_id=folder.id, session=session)
+    live_assets = (
+        Asset.is_deleted == False,
+        Asset.id.in_(
+            session.query(AssetsFolder.asset_id)
+            .join(Folder, Folder.id == AssetsFolder.folder_id)
+            .filter(in_subtree(db_folder))
+        ),
+    )
+    # The bulk UPDATE skips the flush hooks: queue the counter deltas here,
+    # the search index sees the deletes through its updated_at poll
+    tag_usage.queue_tag_usage_change(
+        session,
+        removed=Counter(
+            dict(
+                session.query(AssetsTag.tag_id, func.count(AssetsTag.id))
+                .join(Asset, Asset.id == AssetsTag.asset_id)
+                .filter(*live_assets)
+                .group_by(AssetsTag.tag_id)
+            )
+        ),
+    )
+    session.query(Asset).filter(*live_assets).update(
+        {**deleted, "updated_at": func.now()}, synchronize_session=False
+    )
+    session.query(Folder).filter(in_subtree(db_folder)).update(
+        deleted, synchronize_session=False
     )
-    delete_children_assets(folder, session)
-    delete_children_folders(folder=folder, session=session)
     session.commit()
 
 
-def delete_children_assets(folder, session):
-    session.query(Asset).filter(
-        Asset.id.in_(
-            session.query(AssetsFolder.asset_id).filter(
-                AssetsFolder.folder_id == folder.id
-            )
-        )
-    ).update(
-        {
-            "is_deleted": True,
-            "deleted_at": folder.deleted_at,
-            "deleted_by": folder.deleted_by,
-        },
-        synchronize_session=False,
+def get_folders_clients(folders_ids: list[int], session: Session) -> dict[int, int]:
+    """Client of each non-deleted folder among ``folders_ids``."""
+    if not folders_ids:
+        return {}
+    return dict(
+        session.query(Folder.id, Folder.client_id)
+        .filter(Folder.id.in_(folders_ids), Folder.is_deleted == False)
+        .all()
     )
 
 
-def delete_children_folders(folder: FolderDelete, session: Session):
-    children_folders = session.query(Folder).filter(Folder.parent_id == folder.id).all()
-    children_assets = (
-        session.query(AssetsFolder).filter(AssetsFolder.folder_id == folder.id).all()
+def _check_linkable_assets(folder: Folder, assets_ids: list[int], session: Session):
+    found = {
+        asset_id
+        for (asset_id,) in session.query(Asset.id)
+        .filter(Asset.id.in_(assets_ids))
+        .filter(Asset.client_id == folder.client_id)
+        .filter(Asset.is_deleted == False)
+        .all()
+    }
+    missing = sorted(set(assets_ids) - found)
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Assets not found: {missing}")
+
+
+@contextmanager
+def _unique_links(session: Session):
+    """Commit the link changes made in the block, or 409 on a duplicate link."""
+    try:
+        yield
+        session.commit()
+    except IntegrityError:
+        session.rollback()
+        raise HTTPException(
+            status_code=409, detail="Some assets are already in the target folder"
+        )
+
+
+def link_assets(folder: Folder, assets_ids: list[int], session: Session) -> int:
+    assets_ids = list(dict.fromkeys(assets_ids))
+    _check_linkable_assets(folder, assets_ids, session)
+    links = [{"folder_id": folder.id, "asset_id": asset_id} for asset_id in assets_ids]
+    with _unique_links(session):
+        session.execute(insert(AssetsFolder), links)
+    return len(assets_ids)
+
+
+def unlink_assets(folder: Folder, assets_ids: list[int], session: Session) -> int:
+    removed = (
+        session.query(AssetsFolder)
+        .filter(AssetsFolder.folder_id == folder.id)
+        .filter(AssetsFolder.asset_id.in_(assets_ids))
+        .delete(synchronize_session=False)
     )
+    session.commit()
+    return removed
 
-    if children_assets:
-        delete_children_assets(folder, session)
 
-    if children_folders:
-        folder_ids = [folder.id for folder in children_folders]
-        session.query(Folder).filter(Folder.id.in_(folder_ids)).update(
-            {
-                "is_deleted": True,
-                "deleted_at": folder.deleted_at,
-                "deleted_by": folder.deleted_by,
-            },
-            synchronize_session=False,
+def move_assets(
+    source: Folder, target: Folder, assets_ids: list[int], session: Session
+) -> int:
+    """Re-point the source folder links of the assets at the target folder."""
+    if source.id == target.id:
+        raise HTTPException(
+            status_code=400, detail="Source and target folder are the same"
+        )
+    _check_linkable_assets(target, assets_ids, session)
+    with _unique_links(session):
+        moved = (
+            session.query(AssetsFolder)
+            .filter(AssetsFolder.folder_id == source.id)
+            .filter(AssetsFolder.asset_id.in_(assets_ids))
+            .update({"folder_id": target.id}, synchronize_session=False)
         )
-        for folder_id in folder_ids:
-            folder_delete = FolderDelete(
-                id=folder_id, deleted_by=folder.deleted_by, deleted_at=folder.deleted_at
+    return moved
+
+
+def dedupe_folder_assets(session: Session) -> int:
+    """Drop duplicate (folder_id, asset_id) links, keeping the oldest row."""
+    # Wrapped in a derived table: MySQL can't delete from a table it selects from
+    keep = (
+        session.query(func.min(AssetsFolder.id).label("id"))
+        .group_by(AssetsFolder.folder_id, AssetsFolder.asset_id)
+        .subquery()
+    )
+    removed = (
+        session.query(AssetsFolder)
+        .filter(AssetsFolder.id.notin_(session.query(keep.c.id)))
+        .delete(synchronize_session=False)
+    )
+    session.commit()
+    return removed
+
+
+def backfill_folder_paths(session: Session) -> int:
+    """Recompute ``path`` and ``depth``; returns how many folders were left unreachable."""
+    session.query(Folder).update({"path": None}, synchronize_session=False)
+    session.query(Folder).filter(Folder.parent_id == None).update(
+        {"path": "/" + cast(Folder.id, String) + "/", "depth": 0},
+        synchronize_session=False,
+    )
+    parent = aliased(Folder)
+    depth = 0
+    while True:
+        result = session.execute(
+            update(Folder)
+            .where(Folder.parent_id == parent.id)
+            .where(parent.depth == depth, parent.path != None, Folder.path == None)
+            .values(
+                path=parent.path + cast(Folder.id, String) + "/", depth=depth + 1
             )
-            delete_children_folders(folder=folder_delete, session=session)
+            .execution_options(synchronize_session=False)
+        )
+        if not result.rowcount:
+            break
+        depth += 1
+    session.commit()
+    return session.query(Folder).filter(Folder.path == None).count()
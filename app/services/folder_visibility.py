@@ -0,0 +1,187 @@
+"""Maintenance of the ``user_visible_folders`` index."""
+from sqlalchemy import insert, literal, union
+from sqlalchemy.orm import Session
+
+from app.models.models import (
+    FeatureGroup,
+    FeatureGroupClosure,
+    FeatureGroupsFolder,
+    FeatureGroupsFeatureGroup,
+    FeatureGroupsUser,
+    Folder,
+    FoldersMarket,
+    User,
+    UsersFolder,
+    UserVisibleFolder,
+)
+from app.services.change_sets import ChangeSet, attribute_values
+
+
+def _feature_group_folders(session: Session):
+    return (
+        session.query(
+            User.id.label("user_id"),
+            Folder.id.label("folder_id"),
+            literal("feature_group").label("source"),
+        )
+        .select_from(FeatureGroupsUser)
+        .join(User, User.id == FeatureGroupsUser.user_id)
+        .join(
+            FeatureGroupClosure,
+            FeatureGroupClosure.ancestor_id == FeatureGroupsUser.feature_group_id,
+        )
+        .join(
+            FeatureGroupsFolder,
+            FeatureGroupsFolder.feature_group_id == FeatureGroupClosure.descendant_id,
+        )
+        .join(FeatureGroup, FeatureGroup.id == FeatureGroupsFolder.feature_group_id)
+        .join(Folder, Folder.id == FeatureGroupsFolder.folder_id)
+        .join(FoldersMarket, FoldersMarket.folder_id == Folder.id)
+        .filter(FeatureGroup.client_id == User.client_id)
+        .filter(Folder.is_user_folder == False)
+        .filter(Folder.is_public == True)
+        .filter(FoldersMarket.market_id == User.market_id)
+    )
+
+
+def _owned_boards(session: Session):
+    return (
+        session.query(
+            User.id.label("user_id"),
+            Folder.id.label("folder_id"),
+            literal("board").label("source"),
+        )
+        .select_from(Folder)
+        .join(User, User.id == Folder.owned_by)
+        .filter(Folder.is_user_folder == True)
+        .filter(Folder.client_id == User.client_id)
+    )
+
+
+def _shared_boards(session: Session):
+    return (
+        session.query(
+            User.id.label("user_id"),
+            Folder.id.label("folder_id"),
+            literal("board").label("source"),
+        )
+        .select_from(UsersFolder)
+        .join(User, User.id == UsersFolder.user_id)
+        .join(Folder, Folder.id == UsersFolder.folder_id)
+        .filter(Folder.is_user_folder == True)
+        .filter(Folder.client_id == User.client_id)
+    )
+
+
+def derive_user_visible_folders(
+    session: Session, user_ids: list[int] = None, folder_ids: list[int] = None
+):
+    """Live derivation of the index rows, optionally restricted by user/folder."""
+    queries = []
+    for query in (
+        _feature_group_folders(session),
+        _owned_boards(session),
+        _shared_boards(session),
+    ):
+        if user_ids is not None:
+            query = query.filter(User.id.in_(user_ids))
+        if folder_ids is not None:
+            query = query.filter(Folder.id.in_(folder_ids))
+        queries.append(query.statement)
+    return union(*queries)
+
+
+def refresh_user_visible_folders(
+    session: Session, user_ids: list[int] = None, folder_ids: list[int] = None
+):
+    """Re-derive the index rows of the given users/folders, or all of them."""
+    stale = session.query(UserVisibleFolder)
+    if user_ids is not None:
+        stale = stale.filter(UserVisibleFolder.user_id.in_(user_ids))
+    if folder_ids is not None:
+        stale = stale.filter(UserVisibleFolder.folder_id.in_(folder_ids))
+    stale.delete(synchronize_session=False)
+
+    rows = derive_user_visible_folders(session, user_ids, folder_ids).subquery()
+    session.execute(
+        insert(UserVisibleFolder).from_select(
+            ["user_id", "folder_id", "source"],
+            session.query(rows.c.user_id, rows.c.folder_id, rows.c.source),
+        )
+    )
+
+
+def rebuild_user_visible_folders(session: Session) -> int:
+    refresh_user_visible_folders(session)
+    session.commit()
+    return session.query(UserVisibleFolder).count()
+
+
+def check_user_visible_folders(session: Session, user_ids: list[int] = None):
+    """Rows missing from the index and rows it should not hold."""
+    expected = set(
+        session.execute(derive_user_visible_folders(session, user_ids)).all()
+    )
+    indexed = session.query(
+        UserVisibleFolder.user_id, UserVisibleFolder.folder_id, UserVisibleFolder.source
+    )
+    if user_ids is not None:
+        indexed = indexed.filter(UserVisibleFolder.user_id.in_(user_ids))
+    actual = {tuple(row) for row in indexed.all()}
+    return {
+        "missing": sorted(expected - actual),
+        "extra": sorted(actual - expected),
+    }
+
+
+def _collect_visibility_changes(session: Session, objects):
+    for obj in objects:
+        if isinstance(obj, User):
+            yield ("user", obj.id)
+        elif isinstance(obj, FeatureGroupsUser):
+            yield from (("user", v) for v in attribute_values(obj, "user_id"))
+        elif isinstance(obj, Folder):
+            yield ("folder", obj.id)
+        elif isinstance(obj, (FeatureGroupsFolder, FoldersMarket, UsersFolder)):
+            yield from (("folder", v) for v in attribute_values(obj, "folder_id"))
+        elif isinstance(obj, FeatureGroupsFeatureGroup):
+            yield from (
+                ("group", v)
+                for v in attribute_values(obj, "parent_feature_group_id")
+            )
+        elif isinstance(obj, FeatureGroup):
+            yield ("group", obj.id)
+
+
+def _apply_visibility_changes(session: Session, changes: set):
+    user_ids = {key for kind, key in changes if kind == "user"}
+    folder_ids = {key for kind, key in changes if kind == "folder"}
+    group_ids = {key for kind, key in changes if kind == "group"}
+    if group_ids:
+        # Members of any group that has a changed group below it
+        user_ids.update(
+            user_id
+            for (user_id,) in session.query(FeatureGroupsUser.user_id)
+            .join(
+                FeatureGroupClosure,
+                FeatureGroupClosure.ancestor_id == FeatureGroupsUser.feature_group_id,
+            )
+            .filter(FeatureGroupClosure.descendant_id.in_(group_ids))
+            .distinct()
+            .all()
+        )
+    if user_ids:
+        refresh_user_visible_folders(session, user_ids=list(user_ids))
+    if folder_ids:
+        refresh_user_visible_folders(session, folder_ids=list(folder_ids))
+
+
+visibility_changes = ChangeSet(
+    "visibility_changes",
+    collect=_collect_visibility_changes,
+    before_commit=_apply_visibility_changes,
+)
+
+
+def queue_folder_refresh(session: Session, folder_ids: list[int]):
+    visibility_changes.add(session, (("folder", folder_id) for folder_id in folder_ids))
@@ -3,9 +3,17 @@ from typing import Optional
 import pytz
 from fastapi import HTTPException
 from sqlalchemy.orm import Session
-from sqlalchemy import or_, asc, desc
 from app.models.models import Language
 from app.schemas.language import LanguageCreate, LanguageUpdate, LanguageRead
+from app.services.reference import (
+    bump_reference,
+    get_reference,
+    list_reference,
+    register_reference,
+)
+
+
+register_reference("languages", Language, LanguageRead)
 
 
 def get_language_all(
@@ -15,30 +23,21 @@ def get_language_all(
     search: Optional[str] = None,
     order: str = "asc",
 ):
-    query = session.query(Language).filter(Language.is_deleted == False)
-    if search:
-        search_term = f"%{search}%"
-        query = query.filter(
-            or_(
-                Language.name.ilike(search_term),
-                Language.native_name.ilike(search_term),
-                Language.code_2.ilike(search_term),
-                Language.code_3.ilike(search_term),
-            )
-        )
-
-    if order == "desc":
-        query = query.order_by(desc(Language.name))
-    else:
-        query = query.order_by(asc(Language.name))
-
-    query = query.offset(page * limit).limit(limit)
-
-    languages = query.all()
-    return [LanguageRead.parse_obj(lang.__dict__) for lang in languages]
+    return list_reference(
+        "languages",
+        session,
+        search_fields=("name", "native_name", "code_2", "code_3"),
+        limit=limit,
+        page=page,
+        search=search,
+        order=order,
+    )
 
 
 def get_language_id(language_id: int, session: Session) -> LanguageRead:
+    cached = get_reference("languages", language_id, session)
+    if cached is not None:
+        return cached
     db_language = (
         session.query(Language)
         .filter(Language.id == language_id, Language.is_deleted == False)
@@ -74,6 +73,7 @@ def create_language(language: LanguageCreate, session: Session) -> LanguageRead:
     )
     session.add(db_language)
     session.commit()
+    bump_reference("languages")
     session.refresh(db_language)
     return LanguageRead.parse_obj(db_language.__dict__)
 
@@ -94,6 +94,7 @@ def update_language(
     for field, value in language.dict(exclude_unset=True).items():
         setattr(db_language, field, value)
     session.commit()
+    bump_reference("languages")
     session.refresh(db_language)
     db_language = session.query(Language).filter(Language.id == language_id).first()
     return LanguageRead.parse_obj(db_language.__dict__)
@@ -111,3 +112,4 @@ def delete_language(language_id: int, user_id: int, session: Session):
     db_language.deleted_at = datetime.now(pytz.utc)
     db_language.deleted_by = user_id
     session.commit()
+    bump_reference("languages")
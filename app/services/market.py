@@ -3,9 +3,17 @@ from typing import Optional
 import pytz
 from fastapi import HTTPException
 from sqlalchemy.orm import Session
-from sqlalchemy import asc, desc, or_
 from app.models.models import Market
 from app.schemas.market import MarketCreate, MarketUpdate, MarketRead
+from app.services.reference import (
+    bump_reference,
+    get_reference,
+    list_reference,
+    register_reference,
+)
+
+
+register_reference("markets", Market, MarketRead)
 
 
 def get_market_all(
@@ -15,23 +23,21 @@ def get_market_all(
     search: Optional[str] = None,
     order: str = "asc",
 ):
-    query = session.query(Market).filter(Market.is_deleted == False)
-    if search:
-        search_term = f"%{search}%"
-        query = query.filter(or_(Market.name.ilike(search_term)))
-
-    if order == "desc":
-        query = query.order_by(desc(Market.name))
-    else:
-        query = query.order_by(asc(Market.name))
-
-    query = query.offset(page * limit).limit(limit)
-
-    markets = query.all()
-    return [MarketRead.parse_obj(mark.__dict__) for mark in markets]
+    return list_reference(
+        "markets",
+        session,
+        search_fields=("name",),
+        limit=limit,
+        page=page,
+        search=search,
+        order=order,
+    )
 
 
 def get_market_id(market_id: int, session: Session) -> MarketRead:
+    cached = get_reference("markets", market_id, session)
+    if cached is not None:
+        return cached
     db_market = (
         session.query(Market)
         .filter(Market.id == market_id, Market.is_deleted == False)
@@ -53,6 +59,7 @@ def create_market(market: MarketCreate, session: Session) -> MarketRead:
     db_market = Market(name=market.name, client_id=market.client_id, deleted_by=0)
     session.add(db_market)
     session.commit()
+    bump_reference("markets")
     session.refresh(db_market)
     return MarketRead.parse_obj(db_market.__dict__)
 
@@ -71,6 +78,7 @@ def update_market(market_id: int, market: MarketUpdate, session: Session) -> Mar
     for field, value in market.dict(exclude_unset=True).items():
         setattr(db_market, field, value)
     session.commit()
+    bump_reference("markets")
     session.refresh(db_market)
     db_market = session.query(Market).filter(Market.id == market_id).first()
     return MarketRead.parse_obj(db_market.__dict__)
@@ -88,3 +96,4 @@ def delete_market(market_id: int, user_id: int, session: Session):
     db_market.deleted_at = datetime.now(pytz.utc)
     db_market.deleted_by = user_id
     session.commit()
+    bump_reference("markets")
@@ -0,0 +1,40 @@
+import base64
+import json
+from typing import Optional
+
+from sqlalchemy.orm import Query
+
+
+def encode_cursor(last_id: int) -> str:
+    payload = json.dumps({"id": last_id}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return int(json.loads(base64.urlsafe_b64decode(padded))["id"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def paginate(
+    query: Query,
+    key_column,
+    limit: int,
+    page: int = 0,
+    cursor: Optional[str] = None,
+) -> tuple[list, Optional[str]]:
+    """A page of ``query`` by ``key_column`` and the next page's cursor, or None."""
+    if limit < 1:
+        return [], None
+    query = query.order_by(key_column)
+    if cursor:
+        query = query.filter(key_column > decode_cursor(cursor))
+    else:
+        query = query.offset(page * limit)
+    rows = query.limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1].id)
@@ -0,0 +1,72 @@
+"""Cached reference data: languages, markets, features and feature groups."""
+import os
+from dataclasses import dataclass
+from typing import Any, Iterable, Optional
+
+from sqlalchemy.orm import Session
+
+from app.cache import ReferenceCache
+
+reference_cache = ReferenceCache(
+    default_ttl=float(os.environ.get("REFERENCE_CACHE_TTL", 600))
+)
+
+
+@dataclass(frozen=True)
+class ReferenceRows:
+    rows: tuple  # by name, case-insensitively, then id
+    by_id: dict
+
+    @classmethod
+    def of(cls, items: Iterable) -> "ReferenceRows":
+        rows = tuple(sorted(items, key=lambda item: (item.name.casefold(), item.id)))
+        return cls(rows=rows, by_id={row.id: row for row in rows})
+
+
+def register_reference(entity: str, model, schema):
+    """Cache the non-deleted rows of ``model`` as ``schema`` objects."""
+
+    def load(session: Session) -> ReferenceRows:
+        rows = session.query(model).filter(model.is_deleted == False).all()
+        return ReferenceRows.of(schema.model_validate(row) for row in rows)
+
+    ttl = os.environ.get(f"REFERENCE_CACHE_TTL_{entity.upper()}")
+    reference_cache.register(entity, load, ttl=float(ttl) if ttl else None)
+
+
+def list_reference(
+    entity: str,
+    session: Session,
+    search_fields: tuple[str, ...],
+    limit: int = 5,
+    page: int = 0,
+    search: Optional[str] = None,
+    order: str = "asc",
+) -> list:
+    rows = reference_cache.get(entity, session).rows
+    if search:
+        needle = search.casefold()
+        rows = [
+            row
+            for row in rows
+            if any(needle in (getattr(row, field) or "").casefold() for field in search_fields)
+        ]
+    if order == "desc":
+        rows = rows[::-1]
+    return list(rows[page * limit : (page + 1) * limit])
+
+
+def get_reference(entity: str, id: int, session: Session) -> Optional[Any]:
+    return reference_cache.get(entity, session).by_id.get(id)
+
+
+def bump_reference(entity: str):
+    reference_cache.bump(entity)
+
+
+def warm_reference_cache(session: Session) -> list[str]:
+    return reference_cache.warm(session)
+
+
+def reference_cache_stats() -> dict:
+    return reference_cache.stats()
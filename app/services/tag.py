@@ -1,19 +1,40 @@
+from collections import Counter
+
 from fastapi import HTTPException
-from app.models.models import Tag
+from app.models.models import Tag, TagUsageCounter
 from app.schemas.tag import TagCreate, TagRead, TagUpdate
+from app.services.asset_search import queue_search_refresh
+from app.services.tag_dictionary import queue_tag_dictionary_refresh
+from app.services.tag_usage import add_tag_counters
+from sqlalchemy import and_, insert, or_
 from sqlalchemy.orm import Session
 
 
-def get_all_tags(session: Session):
-    return session.query(Tag).all()
-
-
 def get_tag_by_id(tag_id: int, session: Session):
     return session.query(Tag).filter(Tag.id == tag_id).first()
 
 
+def get_tags_clients(tags_ids: list[int], session: Session) -> dict[int, int]:
+    """Client of each non-deleted tag among ``tags_ids``."""
+    if not tags_ids:
+        return {}
+    return dict(
+        session.query(Tag.id, Tag.client_id)
+        .filter(Tag.id.in_(tags_ids), Tag.is_deleted == False)
+        .all()
+    )
+
+
 def create_tag(tag: Tag, session: Session) -> TagRead:
-    existing_tag = session.query(Tag).filter(Tag.name == tag.name, Tag.is_deleted == False).first()
+    existing_tag = (
+        session.query(Tag)
+        .filter(
+            Tag.client_id == tag.client_id,
+            Tag.name == tag.name,
+            Tag.is_deleted == False,
+        )
+        .first()
+    )
     if existing_tag:
         raise HTTPException(
             status_code=400, detail=f"Tag {tag.name} is already exist."
@@ -25,43 +46,95 @@ def create_tag(tag: Tag, session: Session) -> TagRead:
         deleted_by=0
         )    
     session.add(db_tag)
+    session.flush()
+    add_tag_counters(session, [(db_tag.id, db_tag.client_id)])
     session.commit()
     session.refresh(db_tag)
     return TagRead.parse_obj(db_tag.__dict__)
 
-def create_tags(tags: list[TagCreate], session: Session) -> list[TagRead]:
-    for tag in tags:
-        existing_tag = session.query(Tag).filter(Tag.name == tag.name, Tag.is_deleted == False).first()
-        if existing_tag:
-            raise HTTPException(
-                status_code=400, 
-                detail=f"Tag {tag.name} already exists."
-            )        
-    db_tags = []
+
+def _names_by_client(tags: list[TagCreate]) -> dict[int, set[str]]:
+    names = {}
     for tag in tags:
-        db_tag = Tag(
-            name=tag.name,
-            slug=tag.slug,
-            client_id=tag.client_id,
-            deleted_by=0  
+        names.setdefault(tag.client_id, set()).add(tag.name)
+    return names
+
+
+def _client_names_filter(names: dict[int, set[str]]):
+    return or_(
+        *(
+            and_(Tag.client_id == client_id, Tag.name.in_(client_names))
+            for client_id, client_names in names.items()
         )
-        db_tags.append(db_tag)
-    
-    session.add_all(db_tags)
-    session.commit()    
-    
-    for db_tag in db_tags:
-        session.refresh(db_tag)
-        
-    return [TagRead.parse_obj(db_tag.__dict__) for db_tag in db_tags]
+    )
+
+
+def create_tags(tags: list[TagCreate], session: Session) -> list[TagRead]:
+    if not tags:
+        return []
+    keys = [(tag.client_id, tag.name) for tag in tags]
+    repeated = sorted({name for (_, name), count in Counter(keys).items() if count > 1})
+    if repeated:
+        raise HTTPException(
+            status_code=400, detail=f"Tags repeated in the request: {repeated}"
+        )
+
+    names = _names_by_client(tags)
+    existing = sorted(
+        name
+        for (name,) in session.query(Tag.name)
+        .filter(_client_names_filter(names), Tag.is_deleted == False)
+        .all()
+    )
+    if existing:
+        raise HTTPException(
+            status_code=400, detail=f"Tags already exist: {existing}"
+        )
+
+    session.execute(
+        insert(Tag),
+        [
+            {
+                "name": tag.name,
+                "slug": tag.slug,
+                "client_id": tag.client_id,
+                "is_deleted": False,
+                "deleted_by": 0,
+            }
+            for tag in tags
+        ],
+    )
+    created = {
+        (db_tag.client_id, db_tag.name): db_tag
+        for db_tag in session.query(Tag)
+        .filter(_client_names_filter(names), Tag.is_deleted == False)
+        .all()
+    }
+    # Serialized before the commit expires the loaded rows
+    result = [TagRead.model_validate(created[key]) for key in keys]
+    add_tag_counters(session, [(tag.id, tag.client_id) for tag in result])
+    for client_id in names:
+        queue_tag_dictionary_refresh(
+            session,
+            client_id,
+            [tag.id for tag in result if tag.client_id == client_id],
+        )
+    session.commit()
+    return result
 
 
 def update_tag(tag_id: int, tag: TagUpdate, session: Session):
+    db_tag = get_tag_by_id(tag_id=tag_id, session=session)
     session.query(Tag).filter(Tag.id == tag_id).update(tag.model_dump())
+    queue_search_refresh(session, tag_ids=[tag_id])
+    queue_tag_dictionary_refresh(session, db_tag.client_id, [tag_id])
     session.commit()
     return tag
 
 
 def delete_tag(tag: Tag, session: Session):
+    session.query(TagUsageCounter).filter(TagUsageCounter.tag_id == tag.id).delete()
     session.query(Tag).filter(Tag.id == tag.id).delete()
+    queue_search_refresh(session, tag_ids=[tag.id])
+    queue_tag_dictionary_refresh(session, tag.client_id, [tag.id])
     session.commit()
@@ -0,0 +1,197 @@
+"""Per-client in-memory tag dictionaries behind ``GET /tags`` and ``/tags/suggest``."""
+import hashlib
+import os
+import threading
+from bisect import bisect_left, bisect_right, insort
+from heapq import nlargest
+from typing import Iterable, Optional
+
+from sqlalchemy.orm import Session
+
+from app.cache import LRUTTLCache
+from app.models.models import Tag
+from app.schemas.tag import TagRead
+from app.services.change_sets import ChangeSet, attribute_values
+from app.services.pagination import decode_cursor, encode_cursor
+
+# Upper bound of ``limit`` for suggestions
+MAX_SUGGESTIONS = 50
+# Ranked suggestions remembered per dictionary; a tag change only drops the
+# prefixes of its name and slug
+SUGGESTION_CACHE_SIZE = 1024
+
+
+def _tag_hash(tag: TagRead) -> int:
+    digest = hashlib.blake2b(
+        f"{tag.id}\0{tag.name}\0{tag.slug}\0{tag.usage_count}".encode(), digest_size=8
+    )
+    return int.from_bytes(digest.digest(), "big")
+
+
+class TagDictionary:
+    """Non-deleted tags of one client; ``version`` is the ETag."""
+
+    def __init__(self, client_id: int, tags: Iterable[TagRead]):
+        self.client_id = client_id
+        self._lock = threading.Lock()
+        self._tags: dict[int, TagRead] = {}
+        self._ids: list[int] = []
+        self._keys: list[tuple[str, int]] = []
+        self._rank: dict[int, tuple] = {}
+        self._hash = 0
+        self._suggestions: dict[str, list[int]] = {}
+        self._stale: set[int] = set()
+        for tag in tags:
+            self._add(tag)
+        self._ids.sort()
+        self._keys.sort()
+
+    def _add(self, tag: TagRead, ordered: bool = False):
+        self._tags[tag.id] = tag
+        self._hash ^= _tag_hash(tag)
+        # Most used first, then shortest name, then oldest
+        self._rank[tag.id] = (tag.usage_count, -len(tag.name), -tag.id)
+        keys = {(tag.name.lower(), tag.id), (tag.slug.lower(), tag.id)}
+        self._forget(keys)
+        if ordered:
+            insort(self._ids, tag.id)
+            for key in keys:
+                insort(self._keys, key)
+        else:
+            self._ids.append(tag.id)
+            self._keys.extend(keys)
+
+    def _remove(self, tag_id: int):
+        tag = self._tags.pop(tag_id, None)
+        if tag is None:
+            return
+        self._hash ^= _tag_hash(tag)
+        del self._rank[tag_id]
+        del self._ids[bisect_left(self._ids, tag_id)]
+        keys = {(tag.name.lower(), tag_id), (tag.slug.lower(), tag_id)}
+        self._forget(keys)
+        for key in keys:
+            del self._keys[bisect_left(self._keys, key)]
+
+    def _forget(self, keys):
+        """Drop remembered suggestions for every prefix of ``keys``."""
+        if self._suggestions:
+            for key, _ in keys:
+                for end in range(1, len(key) + 1):
+                    self._suggestions.pop(key[:end], None)
+
+    def __len__(self):
+        return len(self._tags)
+
+    @property
+    def version(self) -> str:
+        return f"{self._hash:016x}"
+
+    @property
+    def etag(self) -> str:
+        return f'"tags-{self.client_id}-{self.version}"'
+
+    def mark_stale(self, tag_ids: Iterable[int]):
+        with self._lock:
+            self._stale.update(tag_ids)
+
+    def sync(self, session: Session):
+        """Re-read the stale tags and patch them in."""
+        with self._lock:
+            if not self._stale:
+                return
+            tag_ids, self._stale = list(self._stale), set()
+            rows = session.query(Tag).filter(Tag.id.in_(tag_ids)).all()
+            for tag_id in tag_ids:
+                self._remove(tag_id)
+            for row in rows:
+                if row.client_id == self.client_id and not row.is_deleted:
+                    self._add(TagRead.model_validate(row), ordered=True)
+
+    def page(self, limit: int, cursor: Optional[str] = None):
+        """``(tags, next_cursor)`` using the same cursors as ``paginate``."""
+        with self._lock:
+            start = bisect_right(self._ids, decode_cursor(cursor)) if cursor else 0
+            ids = self._ids[start : start + limit]
+            more = start + limit < len(self._ids)
+            tags = [self._tags[tag_id] for tag_id in ids]
+        return tags, encode_cursor(ids[-1]) if more and ids else None
+
+    def suggest(self, prefix: str, limit: int = 10) -> list[TagRead]:
+        """Tags whose name or slug starts with ``prefix``, most used first."""
+        prefix = prefix.lower()
+        with self._lock:
+            ranked = self._suggestions.get(prefix)
+            if ranked is None:
+                start = bisect_left(self._keys, (prefix,))
+                end = bisect_left(self._keys, (prefix + "\U0010ffff",), start)
+                matches = {tag_id for _, tag_id in self._keys[start:end]}
+                ranked = nlargest(MAX_SUGGESTIONS, matches, key=self._rank.__getitem__)
+                if len(self._suggestions) >= SUGGESTION_CACHE_SIZE:
+                    self._suggestions.clear()
+                self._suggestions[prefix] = ranked
+            return [self._tags[tag_id] for tag_id in ranked[:limit]]
+
+
+# TagDictionary per client_id
+_tag_dictionaries = LRUTTLCache(
+    maxsize=int(os.environ.get("TAG_CACHE_MAXSIZE", 1000)),
+    ttl=float(os.environ.get("TAG_CACHE_TTL", 300)),
+)
+
+
+def tag_dictionary_stats() -> dict:
+    return _tag_dictionaries.stats()
+
+
+def get_tag_dictionary(client_id: int, session: Session) -> TagDictionary:
+    dictionary = _tag_dictionaries.get(client_id)
+    if dictionary is None:
+        generation = _tag_dictionaries.generation()
+        rows = (
+            session.query(Tag)
+            .filter(Tag.client_id == client_id, Tag.is_deleted == False)
+            .all()
+        )
+        dictionary = TagDictionary(
+            client_id=client_id,
+            tags=(TagRead.model_validate(row) for row in rows),
+        )
+        _tag_dictionaries.set(client_id, dictionary, generation=generation)
+    else:
+        dictionary.sync(session)
+    return dictionary
+
+
+def _collect_tag_dictionary_changes(session: Session, objects):
+    for obj in objects:
+        if isinstance(obj, Tag):
+            yield from (
+                (client_id, obj.id) for client_id in attribute_values(obj, "client_id")
+            )
+
+
+def _apply_tag_dictionary_changes(changes: set):
+    stale: dict[int, set[int]] = {}
+    for client_id, tag_id in changes:
+        stale.setdefault(client_id, set()).add(tag_id)
+    for client_id, tag_ids in stale.items():
+        dictionary = _tag_dictionaries.get(client_id)
+        if dictionary is not None:
+            dictionary.mark_stale(tag_ids)
+        else:
+            # Keeps a dictionary being loaded right now from being cached
+            _tag_dictionaries.invalidate(client_id)
+
+
+tag_dictionary_changes = ChangeSet(
+    "tag_dictionary_changes",
+    collect=_collect_tag_dictionary_changes,
+    after_commit=_apply_tag_dictionary_changes,
+)
+
+
+def queue_tag_dictionary_refresh(
+    session: Session, client_id: int, tag_ids: Iterable[int]
+):
+    tag_dictionary_changes.add(session, ((client_id, tag_id) for tag_id in tag_ids))
@@ -0,0 +1,174 @@
+"""Maintenance of the ``tag_usage_counters`` table."""
+from collections import Counter
+from itertools import chain
+from typing import Iterable, Mapping
+
+from sqlalchemy import and_, bindparam, func, insert, inspect, update
+from sqlalchemy.orm import Session
+
+from app.models.models import Asset, AssetsTag, Tag, TagUsageCounter
+from app.services.change_sets import ChangeSet
+from app.services.tag_dictionary import queue_tag_dictionary_refresh
+
+
+def count_tag_links(
+    session: Session,
+    assets_ids: Iterable[int],
+    tags_ids: Iterable[int] = None,
+    live: bool = True,
+) -> Counter:
+    assets_ids = list(assets_ids)
+    if not assets_ids:
+        return Counter()
+    query = session.query(AssetsTag.tag_id, func.count(AssetsTag.id)).filter(
+        AssetsTag.asset_id.in_(assets_ids)
+    )
+    if tags_ids is not None:
+        query = query.filter(AssetsTag.tag_id.in_(list(tags_ids)))
+    if live:
+        query = query.join(Asset, Asset.id == AssetsTag.asset_id).filter(
+            Asset.is_deleted == False
+        )
+    return Counter(dict(query.group_by(AssetsTag.tag_id).all()))
+
+
+def live_assets(session: Session, assets_ids: Iterable[int]) -> set[int]:
+    """The ids among ``assets_ids`` of assets that are not deleted."""
+    return {
+        asset_id
+        for (asset_id,) in session.query(Asset.id)
+        .filter(Asset.id.in_(list(assets_ids)), Asset.is_deleted == False)
+        .all()
+    }
+
+
+def queue_tag_usage_change(
+    session: Session,
+    added: Mapping[int, int] = None,
+    removed: Mapping[int, int] = None,
+):
+    """Schedule counter changes, both given as tag_id -> number of links."""
+    changes = tag_usage_changes.pending(session)
+    changes.update(added or {})
+    changes.subtract(removed or {})
+
+
+def add_tag_counters(session: Session, tags: Iterable[tuple[int, int]]):
+    """Create zeroed counters for new ``(tag_id, client_id)`` pairs."""
+    rows = [{"tag_id": tag_id, "client_id": client_id} for tag_id, client_id in tags]
+    if rows:
+        session.execute(insert(TagUsageCounter), rows)
+
+
+def get_popular_tags(client_id: int, limit: int, session: Session) -> list[Tag]:
+    """Non-deleted tags of the client in use, most used first."""
+    return (
+        session.query(Tag)
+        .join(TagUsageCounter, TagUsageCounter.tag_id == Tag.id)
+        .filter(
+            TagUsageCounter.client_id == client_id,
+            TagUsageCounter.usage_count > 0,
+            Tag.is_deleted == False,
+        )
+        .order_by(TagUsageCounter.usage_count.desc(), Tag.id)
+        .limit(limit)
+        .all()
+    )
+
+
+def reconcile_tag_usage(session: Session, client_id: int = None) -> dict:
+    """Recompute the counters and return how many were created, corrected and removed."""
+    expected_query = (
+        session.query(Tag.id, Tag.client_id, func.count(Asset.id))
+        .outerjoin(AssetsTag, AssetsTag.tag_id == Tag.id)
+        .outerjoin(
+            Asset, and_(Asset.id == AssetsTag.asset_id, Asset.is_deleted == False)
+        )
+        .group_by(Tag.id, Tag.client_id)
+    )
+    actual_query = session.query(
+        TagUsageCounter.tag_id, TagUsageCounter.client_id, TagUsageCounter.usage_count
+    )
+    if client_id is not None:
+        expected_query = expected_query.filter(Tag.client_id == client_id)
+        actual_query = actual_query.filter(TagUsageCounter.client_id == client_id)
+    expected = {tag_id: (client, count) for tag_id, client, count in expected_query}
+    actual = {tag_id: (client, count) for tag_id, client, count in actual_query}
+
+    missing = [
+        {"tag_id": tag_id, "client_id": client, "usage_count": count}
+        for tag_id, (client, count) in expected.items()
+        if tag_id not in actual
+    ]
+    drifted = [
+        {"tag_id": tag_id, "client_id": client, "usage_count": count}
+        for tag_id, (client, count) in expected.items()
+        if tag_id in actual and actual[tag_id] != (client, count)
+    ]
+    orphans = [tag_id for tag_id in actual if tag_id not in expected]
+
+    if missing:
+        session.execute(insert(TagUsageCounter), missing)
+    if drifted:
+        session.execute(update(TagUsageCounter), drifted)
+    if orphans:
+        session.query(TagUsageCounter).filter(
+            TagUsageCounter.tag_id.in_(orphans)
+        ).delete(synchronize_session=False)
+    for client, tag_ids in _tags_by_client(
+        (row["tag_id"], row["client_id"]) for row in chain(missing, drifted)
+    ).items():
+        queue_tag_dictionary_refresh(session, client, tag_ids)
+    session.commit()
+    return {"created": len(missing), "corrected": len(drifted), "removed": len(orphans)}
+
+
+def _tags_by_client(tags: Iterable[tuple[int, int]]) -> dict[int, list[int]]:
+    grouped = {}
+    for tag_id, client_id in tags:
+        grouped.setdefault(client_id, []).append(tag_id)
+    return grouped
+
+
+def _collect_asset_soft_deletes(session: Session, objects) -> Counter:
+    deleted, restored = [], []
+    for obj in objects:
+        if not isinstance(obj, Asset):
+            continue
+        history = inspect(obj).attrs.is_deleted.history
+        if history.added and history.deleted:
+            if bool(history.added[0]) and not bool(history.deleted[0]):
+                deleted.append(obj.id)
+            elif bool(history.deleted[0]) and not bool(history.added[0]):
+                restored.append(obj.id)
+    deltas = count_tag_links(session, restored, live=False)
+    deltas.subtract(count_tag_links(session, deleted, live=False))
+    return deltas
+
+
+def _apply_tag_usage_changes(session: Session, changes: Counter):
+    deltas = sorted((tag_id, delta) for tag_id, delta in changes.items() if delta)
+    if not deltas:
+        return
+    counters = TagUsageCounter.__table__
+    session.execute(
+        update(counters)
+        .where(counters.c.tag_id == bindparam("b_tag_id"))
+        .values(usage_count=counters.c.usage_count + bindparam("b_delta")),
+        [{"b_tag_id": tag_id, "b_delta": delta} for tag_id, delta in deltas],
+    )
+    clients = (
+        session.query(TagUsageCounter.tag_id, TagUsageCounter.client_id)
+        .filter(TagUsageCounter.tag_id.in_([tag_id for tag_id, _ in deltas]))
+        .all()
+    )
+    for client_id, tag_ids in _tags_by_client(clients).items():
+        queue_tag_dictionary_refresh(session, client_id, tag_ids)
+
+
+tag_usage_changes = ChangeSet(
+    "tag_usage_changes",
+    collect=_collect_asset_soft_deletes,
+    before_commit=_apply_tag_usage_changes,
+    factory=Counter,
+)
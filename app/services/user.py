@@ -1,12 +1,17 @@
+import os
 from datetime import datetime
 from typing import Optional
 from fastapi import HTTPException
 import pytz
-from sqlalchemy import asc, desc, or_
-from sqlalchemy.orm import Session
+from sqlalchemy import and_, asc, desc, func, or_
+from sqlalchemy.orm import Session, aliased
+
+from app.cache import LRUTTLCache
+from app.services.change_sets import ChangeSet, attribute_values
 
 from app.models.models import (
     FeatureGroup,
+    FeatureGroupClosure,
     FeatureGroupsUser,
     FeatureGroupsFeatureGroup,
     FeatureGroupsFeature,
@@ -130,58 +135,194 @@ def delete_user(userup_id: int, user_id: int, session: Session):
 
 #-----------------------------------------------------------
 
-def fetch_all_feature_groups(user_id: int, session: Session):
-    # Fetch initial feature groups for the user
-    initial_groups = (
-        session.query(FeatureGroupsUser.feature_group_id)
-        .filter_by(user_id=user_id)
-        .all()
+# Effective permissions per user_id: (feature_group_ids, feature_slugs)
+_permission_cache = LRUTTLCache(
+    maxsize=int(os.environ.get("PERMISSION_CACHE_MAXSIZE", 10000)),
+    ttl=float(os.environ.get("PERMISSION_CACHE_TTL", 300)),
+)
+
+
+def permission_cache_stats() -> dict:
+    return _permission_cache.stats()
+
+
+def _collect_permission_changes(session: Session, objects):
+    for obj in objects:
+        if isinstance(obj, FeatureGroupsUser):
+            yield from (("user", v) for v in attribute_values(obj, "user_id"))
+        elif isinstance(obj, FeatureGroupsFeatureGroup):
+            yield from (
+                ("group", v)
+                for v in attribute_values(obj, "parent_feature_group_id")
+            )
+        elif isinstance(obj, FeatureGroupsFeature):
+            yield from (
+                ("group", v) for v in attribute_values(obj, "feature_group_id")
+            )
+        elif isinstance(obj, FeatureGroup):
+            yield ("group", obj.id)
+        elif isinstance(obj, Feature):
+            yield ("feature", obj.id)
+
+
+def _resolve_permission_changes(session: Session, changes: set):
+    # A group or feature reaches the members of every group that includes
+    # it; cached entries can't tell, e.g. after a group is restored
+    groups = {key for kind, key in changes if kind == "group"}
+    features = {key for kind, key in changes if kind == "feature"}
+    if not groups and not features:
+        return
+    changes.difference_update(("group", key) for key in groups)
+    changes.difference_update(("feature", key) for key in features)
+    members = (
+        session.query(FeatureGroupsUser.user_id)
+        .join(
+            FeatureGroupClosure,
+            FeatureGroupClosure.ancestor_id == FeatureGroupsUser.feature_group_id,
+        )
+        .outerjoin(
+            FeatureGroupsFeature,
+            FeatureGroupsFeature.feature_group_id == FeatureGroupClosure.descendant_id,
+        )
+        .filter(
+            or_(
+                FeatureGroupClosure.descendant_id.in_(groups),
+                FeatureGroupsFeature.feature_id.in_(features),
+            )
+        )
+        .distinct()
     )
-    feature_group_ids = {group[0] for group in initial_groups}
+    changes.update(("user", user_id) for (user_id,) in members.all())
+
 
-    # Stack for recursive search
-    stack = list(feature_group_ids)
+def _apply_permission_changes(changes: set):
+    # Only ("user", user_id) entries are left once resolved
+    for _, user_id in changes:
+        _permission_cache.invalidate(user_id)
 
-    while stack:
-        current_group = stack.pop()
 
-        # Find child feature groups
-        child_groups = (
-            session.query(FeatureGroupsFeatureGroup.child_feature_group_id)
-            .filter(FeatureGroupsFeatureGroup.parent_feature_group_id == current_group)
-            .all()
+permission_changes = ChangeSet(
+    "permission_changes",
+    collect=_collect_permission_changes,
+    before_commit=_resolve_permission_changes,
+    after_commit=_apply_permission_changes,
+)
+
+
+def feature_group_hierarchy(user_id: int, session: Session):
+    """``(feature_group_id, depth)`` of every live group reachable from the user's groups."""
+    user_group = aliased(FeatureGroup)
+    group = aliased(FeatureGroup)
+    above, below = aliased(FeatureGroupClosure), aliased(FeatureGroupClosure)
+    through_deleted = (
+        session.query(above.descendant_id)
+        .join(below, below.ancestor_id == above.descendant_id)
+        .join(FeatureGroup, FeatureGroup.id == above.descendant_id)
+        .filter(
+            above.ancestor_id == FeatureGroupClosure.ancestor_id,
+            below.descendant_id == FeatureGroupClosure.descendant_id,
+            FeatureGroup.is_deleted == True,
+        )
+        .exists()
+    )
+    return (
+        session.query(
+            FeatureGroupClosure.descendant_id.label("feature_group_id"),
+            func.min(FeatureGroupClosure.depth).label("depth"),
+        )
+        .join(
+            FeatureGroupsUser,
+            FeatureGroupsUser.feature_group_id == FeatureGroupClosure.ancestor_id,
+        )
+        .join(user_group, user_group.id == FeatureGroupClosure.ancestor_id)
+        .join(group, group.id == FeatureGroupClosure.descendant_id)
+        .filter(
+            FeatureGroupsUser.user_id == user_id,
+            user_group.is_deleted == False,
+            group.is_deleted == False,
+            ~through_deleted,
         )
-        for child_group in child_groups:
-            child_group_id = child_group[0]
-            if child_group_id not in feature_group_ids:
-                feature_group_ids.add(child_group_id)
-                stack.append(child_group_id)
+        .group_by(FeatureGroupClosure.descendant_id)
+        .subquery(name="feature_group_hierarchy")
+    )
+
 
-    # Fetch FeatureGroup objects
+def fetch_all_feature_groups(user_id: int, session: Session):
+    hierarchy = feature_group_hierarchy(user_id, session)
     return (
-        session.query(FeatureGroup).filter(FeatureGroup.id.in_(feature_group_ids)).all()
+        session.query(FeatureGroup)
+        .filter(FeatureGroup.id.in_(session.query(hierarchy.c.feature_group_id)))
+        .all()
     )
 
 
-def fetch_all_user_features(user_id: int, session: Session):
-    fgs = fetch_all_feature_groups(user_id, session)
-    features = set()
-    for fg in fgs:
-        fg_features = (
-            session.query(Feature)
-            .join(FeatureGroupsFeature)
-            .filter(FeatureGroupsFeature.feature_group_id == fg.id)
-            .all()
+def _user_features_query(user_id: int, session: Session, *entities):
+    # user -> groups -> transitive children -> features, skipping soft deletes
+    hierarchy = feature_group_hierarchy(user_id, session)
+    return (
+        session.query(*entities)
+        .select_from(Feature)
+        .join(FeatureGroupsFeature, FeatureGroupsFeature.feature_id == Feature.id)
+        .join(FeatureGroup, FeatureGroup.id == FeatureGroupsFeature.feature_group_id)
+        .filter(
+            FeatureGroupsFeature.feature_group_id.in_(
+                session.query(hierarchy.c.feature_group_id)
+            )
         )
-        for feature in fg_features:
-            features.add(feature)
-    return features
+        .filter(Feature.is_deleted == False, FeatureGroup.is_deleted == False)
+        .distinct()
+    )
+
+
+def fetch_all_user_features(user_id: int, session: Session):
+    return set(_user_features_query(user_id, session, Feature).all())
+
+
+def user_feature_slugs(user_id: int, session: Session) -> frozenset[str]:
+    _, feature_slugs = resolve_user_permissions(user_id, session)
+    return feature_slugs
 
 
 def user_has_feature(user_id: int, feature_slug: str, session: Session) -> bool:
-    user_features = fetch_all_user_features(user_id, session)
-    slugs = [f.slug for f in user_features]
-    return feature_slug in slugs
+    return feature_slug in user_feature_slugs(user_id, session)
+
+
+def resolve_user_permissions(
+    user_id: int, session: Session
+) -> tuple[frozenset[int], frozenset[str]]:
+    cached = _permission_cache.get(user_id)
+    if cached is not None:
+        return cached
+
+    generation = _permission_cache.generation()
+    hierarchy = feature_group_hierarchy(user_id, session)
+    rows = (
+        session.query(hierarchy.c.feature_group_id, Feature.slug)
+        .select_from(hierarchy)
+        .outerjoin(FeatureGroup, FeatureGroup.id == hierarchy.c.feature_group_id)
+        .outerjoin(
+            FeatureGroupsFeature,
+            and_(
+                FeatureGroupsFeature.feature_group_id == hierarchy.c.feature_group_id,
+                FeatureGroup.is_deleted == False,
+            ),
+        )
+        .outerjoin(
+            Feature,
+            and_(
+                Feature.id == FeatureGroupsFeature.feature_id,
+                Feature.is_deleted == False,
+            ),
+        )
+        .distinct()
+        .all()
+    )
+    feature_group_ids = frozenset(group_id for group_id, _ in rows)
+    feature_slugs = frozenset(slug for _, slug in rows if slug is not None)
+    _permission_cache.set(
+        user_id, (feature_group_ids, feature_slugs), generation=generation
+    )
+    return feature_group_ids, feature_slugs
 
 
 def get_by_id(user_id: int, session: Session) -> User:
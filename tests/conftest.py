@@ -0,0 +1,163 @@
+"""Runs the app against an in-memory SQLite database.
+
+The models target MySQL; the hooks below only make their DDL acceptable to
+SQLite.
+"""
+import os
+from datetime import datetime
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.dialects.mysql import ENUM, TINYINT
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.schema import CreateColumn
+
+from app.database import get_db, get_session_factory
+from app.main import app
+from app.models.models import (
+    AssetsFolder,
+    Document,
+    Feature,
+    FeatureGroup,
+    FeatureGroupsFeature,
+    FeatureGroupsFolder,
+    FeatureGroupsUser,
+    Folder,
+    FoldersMarket,
+    Market,
+    Tag,
+    User,
+    metadata,
+)
+from app.services import asset_search, tag_dictionary
+from app.services import user as user_service
+from app.services.feature_group import rebuild_featureGroup_closure
+from app.services.folder import backfill_folder_paths
+from app.services.folder_visibility import rebuild_user_visible_folders
+from app.services.reference import reference_cache
+
+
+@compiles(TINYINT, "sqlite")
+def _tinyint(type_, compiler, **kw):
+    return "INTEGER"
+
+
+@compiles(ENUM, "sqlite")
+def _enum(type_, compiler, **kw):
+    return "VARCHAR(32)"
+
+
+@compiles(CreateColumn, "sqlite")
+def _create_column(element, compiler, **kw):
+    return compiler.visit_create_column(element, **kw).replace(
+        " ON UPDATE CURRENT_TIMESTAMP", ""
+    )
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    """The caches are process-wide; every test starts and ends with them empty."""
+    caches = (
+        user_service._permission_cache,
+        asset_search.search_index,
+        tag_dictionary._tag_dictionaries,
+        reference_cache,
+    )
+    for cache in caches:
+        cache.clear()
+    yield
+    for cache in caches:
+        cache.clear()
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def session(engine):
+    session = sessionmaker(bind=engine, autoflush=False)()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def statements(engine):
+    """SQL statements run through ``engine``, in order."""
+    executed = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    return executed
+
+
+@pytest.fixture
+def client(engine, session):
+    app.dependency_overrides[get_db] = lambda: session
+    app.dependency_overrides[get_session_factory] = lambda: sessionmaker(bind=engine)
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+ROOT, CORPORATE, REGULAR = 1, 2, 3
+
+
+@pytest.fixture
+def data(session):
+    """Root, corporate and regular users of client 1, a public folder the
+    regular user sees through feature group 3, one asset in it and one tag."""
+    session.add_all(
+        [
+            User(id=ROOT, name="root", username="r", email="e", client_id=1, market_id=1),
+            User(id=CORPORATE, name="corp", username="c", email="e", client_id=1, market_id=1),
+            User(id=REGULAR, name="reg", username="g", email="e", client_id=1, market_id=1),
+            Market(id=1, name="m", client_id=1, deleted_by=0),
+            Feature(id=1, name="root", slug="root", deleted_by=0),
+            Feature(id=2, name="corporate", slug="corporate", deleted_by=0),
+        ]
+        + [FeatureGroup(id=i, name=f"g{i}", client_id=1, deleted_by=0) for i in (1, 2, 3)]
+    )
+    session.flush()
+    session.add_all(
+        [
+            FeatureGroupsFeature(feature_group_id=1, feature_id=1),
+            FeatureGroupsFeature(feature_group_id=2, feature_id=2),
+            FeatureGroupsUser(feature_group_id=1, user_id=ROOT),
+            FeatureGroupsUser(feature_group_id=2, user_id=CORPORATE),
+            FeatureGroupsUser(feature_group_id=3, user_id=REGULAR),
+            Folder(id=1, name="pub", created_by=ROOT, icon="i", client_id=1, is_public=1, owned_by=ROOT),
+            Document(
+                id=1, title="a", slug="a", thumbnail_url="t", created_by=REGULAR,
+                client_id=1, asset_type="DOCUMENT", extension="pdf", preview_url="p",
+                download_url="d", created_at=datetime(2024, 1, 1), updated_at=datetime(2024, 1, 1),
+            ),
+            Tag(id=1, name="t", slug="t", client_id=1, deleted_by=0),
+        ]
+    )
+    session.flush()
+    session.add_all(
+        [
+            FeatureGroupsFolder(feature_group_id=3, folder_id=1),
+            FoldersMarket(folder_id=1, market_id=1),
+            AssetsFolder(asset_id=1, folder_id=1),
+        ]
+    )
+    session.commit()
+    rebuild_featureGroup_closure(session)
+    backfill_folder_paths(session)
+    rebuild_user_visible_folders(session)
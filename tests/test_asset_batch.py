@@ -0,0 +1,27 @@
+from app.models.models import AssetsFolder
+
+ROOT = 1
+
+
+def item(**fields):
+    return {
+        "title": "b", "slug": "b", "thumbnail_url": "t", "client_id": 1,
+        "asset_type": "LINK", "metadata": {"url": "u"}, **fields,
+    }
+
+
+def test_folder_of_another_client_is_rejected_per_item(client, session, data, statements):
+    statements.clear()
+    response = client.post(
+        f"/assets/batch?user_id={ROOT}",
+        json=[item(folder_id=1, client_id=2), item(folder_id=1), item(folder_id=99)],
+    )
+
+    assert response.status_code == 200, response.text
+    results = response.json()
+    assert [result["status_code"] for result in results] == [404, 201, 404]
+    assert results[0]["detail"] == "Folder 1 not found for this client"
+    links = session.query(AssetsFolder.asset_id).filter_by(folder_id=1).all()
+    assert sorted(asset_id for (asset_id,) in links) == [1, results[1]["asset"]["id"]]
+    # One lookup for all the folders of the batch
+    assert len([s for s in statements if "folders.client_id AS folders_client_id" in s]) == 1
@@ -0,0 +1,23 @@
+import csv
+import io
+import json
+
+from app.services import asset_export
+
+ROOT, REGULAR = 1, 3
+
+
+def test_ndjson_export_of_visible_assets(client, data):
+    response = client.get(f"/assets/export?user_id={REGULAR}")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [(row["id"], row["is_shareable"]) for row in rows] == [(1, True)]
+
+
+def test_csv_export_with_filters(client, data):
+    response = client.get(f"/assets/export?user_id={ROOT}&format=csv&asset_type=LINK")
+
+    rows = list(csv.reader(io.StringIO(response.text)))
+    assert rows == [asset_export.EXPORT_FIELDS]
@@ -0,0 +1,97 @@
+import json
+import logging
+from datetime import datetime
+
+from app.models.models import Asset, Folder, Link, Tag
+from app.services import asset_import, tag_usage
+
+ROOT = 1
+
+
+def row(external_id, title, **fields):
+    return {
+        "external_id": external_id, "client_id": 1, "title": title, "slug": external_id,
+        "thumbnail_url": "t", "asset_type": "LINK", "metadata": {"url": "u"}, **fields,
+    }
+
+
+def run_import(session, rows, **options):
+    importer = asset_import.AssetImporter(session=session, user_id=ROOT, **options)
+    importer.feed(json.dumps(r) for r in rows)
+    return importer.finish()
+
+
+def test_last_row_with_the_same_external_id_wins(session, data):
+    summary = run_import(session, [row("x", "first"), row("y", "other"), row("x", "last")])
+
+    assert (summary.created, summary.updated, summary.failed) == (2, 1, 0)
+    assert session.query(Link).filter_by(external_id="x").one().title == "last"
+
+
+def test_matching_soft_deleted_asset_is_restored(session, data):
+    run_import(session, [row("x", "first", tags_ids=[1])])
+    tag_usage.reconcile_tag_usage(session)
+    asset = session.query(Asset).filter_by(external_id="x").one()
+    asset.is_deleted, asset.deleted_at, asset.deleted_by = 1, datetime(2024, 1, 2), ROOT
+    session.commit()
+    assert session.get(Tag, 1).usage_count == 0
+
+    summary = run_import(session, [row("x", "again")])
+
+    session.expire_all()
+    assert summary.updated == 1
+    assert (asset.is_deleted, asset.deleted_at, asset.title) == (0, None, "again")
+    assert session.get(Tag, 1).usage_count == 1
+    assert tag_usage.reconcile_tag_usage(session)["corrected"] == 0
+
+
+def test_key_inserted_concurrently_is_updated(session, data, monkeypatch):
+    run_import(session, [row("x", "theirs")])
+    lookup = asset_import.AssetImporter._existing_assets
+    calls = []
+
+    def stale_lookup(self, rows):
+        # The first lookup runs before the other import's insert
+        calls.append(rows)
+        return {} if len(calls) == 1 else lookup(self, rows)
+
+    monkeypatch.setattr(asset_import.AssetImporter, "_existing_assets", stale_lookup)
+    summary = run_import(session, [row("x", "ours")])
+
+    assert (summary.created, summary.updated, summary.failed) == (0, 1, 0)
+    assert session.query(Link).filter_by(external_id="x").one().title == "ours"
+
+
+def test_import_endpoint_reports_progress(client, data, caplog):
+    body = "\n".join(json.dumps(row(f"x{i}", "t")) for i in range(3))
+    with caplog.at_level(logging.INFO, logger="app.routes.assets"):
+        response = client.post(f"/assets/import?user_id={ROOT}", content=body)
+
+    assert response.json()["created"] == 3
+    assert "3 rows, 3 created" in caplog.text
+
+
+def test_invalid_utf8_line_is_reported(client, data):
+    body = b"\n".join(
+        [json.dumps(row("a", "ok")).encode(), b'{"title": "\xff"}', json.dumps(row("b", "ok")).encode()]
+    )
+    response = client.post(f"/assets/import?user_id={ROOT}", content=body)
+
+    assert response.status_code == 200
+    summary = response.json()
+    assert (summary["created"], summary["failed"]) == (2, 1)
+    assert summary["errors"][0]["line"] == 2
+
+
+def test_unknown_folder_fails_only_its_row(session, data, statements):
+    session.add(Folder(id=2, name="other", created_by=ROOT, icon="i", client_id=2, owned_by=ROOT))
+    session.commit()
+    statements.clear()
+
+    summary = run_import(
+        session, [row("a", "ok", folder_id=1), row("b", "no", folder_id=99), row("c", "no", folder_id=2)]
+    )
+
+    assert (summary.created, summary.failed) == (1, 2)
+    assert [error.line for error in summary.errors] == [2, 3]
+    assert sum("folders.client_id AS folders_client_id" in s for s in statements) == 1
@@ -0,0 +1,101 @@
+import threading
+from datetime import datetime
+
+import pytest
+from sqlalchemy import insert, update
+
+from app.models.models import Asset, AssetsFolder
+from app.services import asset_search
+from app.services import asset as asset_service
+
+ROOT, REGULAR = 1, 3
+
+
+def asset_row(id, title, client_id=1):
+    return {
+        "id": id, "title": title, "slug": f"a{id}", "thumbnail_url": "t",
+        "created_by": ROOT, "client_id": client_id, "asset_type": "DOCUMENT",
+        "created_at": datetime(2024, 1, 1), "updated_at": datetime(2024, 1, 1),
+    }
+
+
+@pytest.fixture
+def index(monkeypatch):
+    monkeypatch.setattr(asset_search.search_index, "poll_interval", 0)
+    return asset_search.search_index
+
+
+def test_invisible_matches_do_not_hide_visible_ones(session, data, index, monkeypatch):
+    monkeypatch.setattr(asset_search, "CANDIDATE_BATCH", 2)
+    # Better ranked (lower ids) but outside the regular user's folders
+    session.execute(insert(Asset), [asset_row(i, "foo") for i in range(2, 7)])
+    session.execute(insert(Asset), [asset_row(7, "foo", client_id=2)])
+    session.execute(insert(Asset), [asset_row(8, "foo")])
+    session.add(AssetsFolder(asset_id=8, folder_id=1))
+    session.commit()
+
+    found = asset_service.search_assets("foo", session, client_id=1, user_id=REGULAR)
+
+    assert [asset.id for asset in found] == [8]
+
+
+def test_writes_from_other_workers_are_picked_up(session, data, index):
+    assert asset_search.search_asset_ids("bar", session) == []
+    # Bulk statements bypass this process's flush hooks, like another worker
+    session.execute(insert(Asset), [asset_row(2, "bar")])
+    session.execute(
+        update(Asset)
+        .where(Asset.id == 1)
+        .values(title="bar", updated_at=datetime(2024, 1, 2))
+    )
+    session.commit()
+
+    assert sorted(asset_search.search_asset_ids("bar", session)) == [1, 2]
+
+    session.execute(
+        update(Asset)
+        .where(Asset.id == 2)
+        .values(is_deleted=1, updated_at=datetime(2024, 1, 3))
+    )
+    session.commit()
+
+    assert asset_search.search_asset_ids("bar", session) == [1]
+
+
+def test_rebuild_does_not_block_searches(session, data, index, monkeypatch):
+    session.execute(update(Asset).where(Asset.id == 1).values(title="foo"))
+    session.commit()
+    assert asset_search.search_asset_ids("foo", session) == [1]
+    load = asset_search._load
+    during_rebuild = []
+
+    def slow_load(target, session, asset_ids=None):
+        if target is not index:
+            # Another thread searches while the new index is being built
+            searcher = threading.Thread(
+                target=lambda: during_rebuild.append(index.search("foo"))
+            )
+            searcher.start()
+            searcher.join(timeout=5)
+        load(target, session, asset_ids)
+
+    monkeypatch.setattr(asset_search, "_load", slow_load)
+    monkeypatch.setattr(index, "ttl", 0)
+    session.execute(insert(Asset), [asset_row(2, "foo")])
+    session.commit()
+    asset_search.search_asset_ids("foo", session)
+
+    assert during_rebuild == [[1]]
+    assert index.search("foo") == [1, 2]
+
+
+def test_regular_search_matches_listing(client, session, data, index):
+    # Another client's asset linked into a folder the user sees
+    session.execute(insert(Asset), [asset_row(2, "a", client_id=2)])
+    session.add(AssetsFolder(asset_id=2, folder_id=1))
+    session.commit()
+
+    listed = client.get(f"/assets/?user_id={REGULAR}&limit=10").json()
+    found = client.get(f"/assets/search?q=a&user_id={REGULAR}&limit=10").json()
+
+    assert sorted(a["id"] for a in found) == sorted(a["id"] for a in listed) == [1, 2]
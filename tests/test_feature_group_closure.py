@@ -0,0 +1,66 @@
+import pytest
+from fastapi import HTTPException
+
+from app.models.models import FeatureGroupClosure
+from app.services.feature_group import (
+    add_featureGroup_child,
+    rebuild_featureGroup_closure,
+    remove_featureGroup_child,
+)
+
+
+def closure(session):
+    return {
+        (row.ancestor_id, row.descendant_id, row.depth)
+        for row in session.query(FeatureGroupClosure).all()
+    }
+
+
+def rebuilt(session):
+    rebuild_featureGroup_closure(session)
+    return closure(session)
+
+
+def test_adding_children_extends_ancestors(session, data):
+    add_featureGroup_child(2, 3, session)
+    add_featureGroup_child(1, 2, session)
+
+    rows = closure(session)
+    assert {(1, 2, 1), (1, 3, 2), (2, 3, 1)} <= rows
+    assert rows == rebuilt(session)
+
+
+def test_removing_a_child_drops_paths_through_it(session, data):
+    add_featureGroup_child(1, 2, session)
+    add_featureGroup_child(2, 3, session)
+
+    remove_featureGroup_child(1, 2, session)
+
+    rows = closure(session)
+    assert (1, 2, 1) not in rows and (1, 3, 2) not in rows
+    assert (2, 3, 1) in rows
+    assert rows == rebuilt(session)
+
+
+def test_shortest_depth_survives_removing_the_longer_path(session, data):
+    add_featureGroup_child(1, 2, session)
+    add_featureGroup_child(2, 3, session)
+    add_featureGroup_child(1, 3, session)
+    assert (1, 3, 1) in closure(session)
+
+    remove_featureGroup_child(1, 3, session)
+
+    assert (1, 3, 2) in closure(session)
+
+
+@pytest.mark.parametrize("edges, parent, child", [([], 1, 1), ([(1, 2), (2, 3)], 3, 1)])
+def test_cycles_are_rejected(session, data, edges, parent, child):
+    for edge in edges:
+        add_featureGroup_child(*edge, session)
+    before = closure(session)
+
+    with pytest.raises(HTTPException) as error:
+        add_featureGroup_child(parent, child, session)
+
+    assert error.value.status_code == 400
+    assert closure(session) == before
@@ -0,0 +1,68 @@
+from datetime import datetime
+
+from sqlalchemy import insert
+
+from app.models.models import Asset, AssetsFolder, Folder
+
+ROOT = 1
+
+
+def setup_assets(session):
+    session.execute(insert(Asset), [
+        {
+            "id": i, "title": f"a{i}", "slug": f"a{i}", "thumbnail_url": "t",
+            "created_by": ROOT, "client_id": client_id, "asset_type": "DOCUMENT",
+            "created_at": datetime(2024, 1, 1), "updated_at": datetime(2024, 1, 1),
+        }
+        for i, client_id in ((2, 1), (3, 2))
+    ])
+    session.add(Folder(id=2, name="f2", created_by=ROOT, icon="i", client_id=1, owned_by=ROOT))
+    session.commit()
+
+
+def links(session):
+    return sorted(
+        (row.folder_id, row.asset_id) for row in session.query(AssetsFolder).all()
+    )
+
+
+def test_link_adds_assets(client, session, data):
+    setup_assets(session)
+
+    response = client.post(f"/folders/1/assets:link?user_id={ROOT}", json={"assets_ids": [2]})
+
+    assert response.status_code == 200, response.text
+    assert response.json() == {"assets": 1}
+    assert links(session) == [(1, 1), (1, 2)]
+
+
+def test_linking_an_already_linked_asset_is_a_conflict(client, session, data):
+    setup_assets(session)
+
+    response = client.post(f"/folders/1/assets:link?user_id={ROOT}", json={"assets_ids": [2, 1]})
+
+    assert response.status_code == 409
+    assert links(session) == [(1, 1)]
+
+
+def test_moving_onto_an_existing_link_is_a_conflict(client, session, data):
+    setup_assets(session)
+    session.add_all([AssetsFolder(folder_id=2, asset_id=1), AssetsFolder(folder_id=1, asset_id=2)])
+    session.commit()
+
+    response = client.post(
+        f"/folders/2/assets:move?user_id={ROOT}",
+        json={"source_folder_id": 1, "assets_ids": [1, 2]},
+    )
+
+    assert response.status_code == 409
+    assert links(session) == [(1, 1), (1, 2), (2, 1)]
+
+
+def test_assets_of_another_client_are_not_linked(client, session, data):
+    setup_assets(session)
+
+    response = client.post(f"/folders/1/assets:link?user_id={ROOT}", json={"assets_ids": [3]})
+
+    assert response.status_code == 404
+    assert links(session) == [(1, 1)]
@@ -0,0 +1,59 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import insert
+
+from app.models.models import Asset, AssetsFolder, AssetsTag, Folder, Tag
+from app.schemas.folder import FolderDelete
+from app.services import asset_search, tag_usage
+from app.services import folder as folder_service
+
+ROOT = 1
+
+
+def test_deleting_folder_releases_tag_usage_and_search(session, data, monkeypatch):
+    monkeypatch.setattr(asset_search.search_index, "poll_interval", 0)
+    session.add(Folder(id=2, name="sub", parent_id=1, created_by=ROOT, icon="i", client_id=1, owned_by=ROOT))
+    session.add(AssetsTag(asset_id=1, tag_id=1))
+    session.commit()
+    folder_service.backfill_folder_paths(session)
+    tag_usage.reconcile_tag_usage(session)
+    asset_search.search_index.clear()
+    assert asset_search.search_asset_ids("t", session) == [1]
+    assert session.get(Tag, 1).usage_count == 1
+
+    folder_service.delete_folder(
+        FolderDelete(id=1, deleted_by=ROOT, deleted_at=datetime(2024, 1, 2)), session
+    )
+
+    session.expire_all()
+    assert session.get(Asset, 1).is_deleted
+    assert session.get(Tag, 1).usage_count == 0
+    assert tag_usage.reconcile_tag_usage(session)["corrected"] == 0
+    assert asset_search.search_asset_ids("t", session) == []
+
+
+def delete_statements(session, statements, assets):
+    ids = range(2, assets + 2)
+    session.execute(insert(Asset), [
+        {"id": i, "title": "a", "slug": f"a{i}", "thumbnail_url": "t",
+         "created_by": ROOT, "client_id": 1, "asset_type": "DOCUMENT"}
+        for i in ids
+    ])
+    session.execute(insert(AssetsFolder), [{"asset_id": i, "folder_id": 1} for i in ids])
+    session.execute(insert(AssetsTag), [{"asset_id": i, "tag_id": 1} for i in ids])
+    session.commit()
+    statements.clear()
+    folder_service.delete_folder(
+        FolderDelete(id=1, deleted_by=ROOT, deleted_at=datetime(2024, 1, 2)), session
+    )
+    return [s for s in statements if not s.startswith(("BEGIN", "COMMIT"))]
+
+
+@pytest.mark.parametrize("assets", [10, 1000])
+def test_deleting_folder_runs_constant_statements(session, data, statements, assets):
+    executed = delete_statements(session, statements, assets)
+
+    # Folder lookup, tag counts, two UPDATEs, counter update and refresh
+    assert len(executed) == 6
+    assert all(s.count("?") < 10 for s in executed)
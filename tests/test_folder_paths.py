@@ -0,0 +1,66 @@
+import pytest
+from fastapi import HTTPException
+
+from app.models.models import Folder
+from app.schemas.folder import FolderCreate, FolderUpdate
+from app.services import folder as folder_service
+
+ROOT = 1
+
+
+def new_folder(parent_id):
+    return FolderCreate(
+        name="child", parent_id=parent_id, created_by=ROOT, icon="i", client_id=1
+    )
+
+
+def test_child_path_extends_parent_path(session, data):
+    child = folder_service.create_folder(ROOT, new_folder(1), session)
+    assert session.get(Folder, child.id).path == f"/1/{child.id}/"
+
+
+def test_child_of_folder_without_path_is_rejected(session, data):
+    session.get(Folder, 1).path = None
+    session.commit()
+    with pytest.raises(HTTPException) as error:
+        folder_service.create_folder(ROOT, new_folder(1), session)
+    assert error.value.status_code == 409
+    assert session.query(Folder).count() == 1
+
+
+def test_update_missing_folder_is_not_found(session, data):
+    with pytest.raises(HTTPException) as error:
+        folder_service.update_folder(99, FolderUpdate(name="x"), session)
+    assert error.value.status_code == 404
+
+
+def test_subtree_is_filtered_by_depth(client, session, data):
+    child = folder_service.create_folder(ROOT, new_folder(1), session)
+    grandchild = folder_service.create_folder(ROOT, new_folder(child.id), session)
+    deleted = folder_service.create_folder(ROOT, new_folder(child.id), session)
+    session.get(Folder, deleted.id).is_deleted = True
+    session.commit()
+
+    def subtree(query=""):
+        response = client.get(f"/folders/1/subtree?user_id={ROOT}{query}")
+        assert response.status_code == 200, response.text
+        return [folder["id"] for folder in response.json()]
+
+    assert subtree() == [1, child.id, grandchild.id]
+    assert subtree("&max_depth=1") == [1, child.id]
+    assert subtree("&max_depth=0") == [1]
+
+
+@pytest.mark.parametrize("url", ["/folders/tree", "/folders/boards/tree"])
+@pytest.mark.parametrize(
+    "max_depth, status",
+    [
+        (-1, 422),
+        (0, 200),
+        (folder_service.FOLDER_TREE_MAX_DEPTH, 200),
+        (folder_service.FOLDER_TREE_MAX_DEPTH + 1, 422),
+    ],
+)
+def test_tree_depth_is_bounded(client, data, url, max_depth, status):
+    response = client.get(f"{url}?user_id={ROOT}&max_depth={max_depth}")
+    assert response.status_code == status
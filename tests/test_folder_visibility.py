@@ -0,0 +1,107 @@
+import pytest
+
+from app.models.models import (
+    FeatureGroupsFolder,
+    FeatureGroupsUser,
+    Folder,
+    FoldersMarket,
+    Market,
+    User,
+    UsersFolder,
+    UserVisibleFolder,
+)
+from app.services.folder_visibility import check_user_visible_folders
+
+ROOT, CORPORATE, REGULAR = 1, 2, 3
+
+
+def visible(session, user_id):
+    return {
+        folder_id
+        for (folder_id,) in session.query(UserVisibleFolder.folder_id).filter(
+            UserVisibleFolder.user_id == user_id
+        )
+    }
+
+
+def add_board(session, shared_with=None):
+    session.add(Folder(id=2, name="board", created_by=ROOT, icon="i", client_id=1, owned_by=ROOT, is_user_folder=1))
+    if shared_with:
+        session.flush()
+        session.add(UsersFolder(user_id=shared_with, folder_id=2))
+    session.commit()
+
+
+def join_group_3(session):
+    session.add(FeatureGroupsUser(feature_group_id=3, user_id=CORPORATE))
+    session.commit()
+
+
+def leave_group_3(session):
+    session.delete(session.query(FeatureGroupsUser).filter_by(user_id=REGULAR).one())
+    session.commit()
+
+
+def move_to_other_market(session):
+    session.add(Market(id=2, name="m2", client_id=1, deleted_by=0))
+    session.get(User, REGULAR).market_id = 2
+    session.commit()
+
+
+def unlink_market(session):
+    session.delete(session.query(FoldersMarket).filter_by(folder_id=1).one())
+    session.commit()
+
+
+def unlink_group(session):
+    session.delete(session.query(FeatureGroupsFolder).filter_by(folder_id=1).one())
+    session.commit()
+
+
+def share_board(session):
+    add_board(session, shared_with=REGULAR)
+
+
+def unshare_board(session):
+    add_board(session, shared_with=REGULAR)
+    session.delete(session.query(UsersFolder).filter_by(folder_id=2).one())
+    session.commit()
+
+
+def make_private(session):
+    session.get(Folder, 1).is_public = False
+    session.commit()
+
+
+@pytest.mark.parametrize(
+    "write, user_id, folders",
+    [
+        (join_group_3, CORPORATE, {1}),
+        (leave_group_3, REGULAR, set()),
+        (move_to_other_market, REGULAR, set()),
+        (unlink_market, REGULAR, set()),
+        (unlink_group, REGULAR, set()),
+        (add_board, ROOT, {2}),
+        (share_board, REGULAR, {1, 2}),
+        (unshare_board, REGULAR, {1}),
+        (make_private, REGULAR, set()),
+    ],
+)
+def test_writes_leave_no_drift(session, data, write, user_id, folders):
+    assert visible(session, REGULAR) == {1}
+
+    write(session)
+
+    assert visible(session, user_id) == folders
+    assert check_user_visible_folders(session) == {"missing": [], "extra": []}
+
+
+def test_checker_reports_drift(session, data):
+    session.query(UserVisibleFolder).delete()
+    session.add(UserVisibleFolder(user_id=ROOT, folder_id=1, source="board"))
+    session.flush()
+
+    assert check_user_visible_folders(session) == {
+        "missing": [(REGULAR, 1, "feature_group")],
+        "extra": [(ROOT, 1, "board")],
+    }
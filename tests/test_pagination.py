@@ -0,0 +1,105 @@
+import time
+from datetime import datetime
+
+import pytest
+from sqlalchemy import insert
+
+from app.models.models import Asset, AssetsFolder
+from app.services.pagination import encode_cursor, paginate
+
+ROOT, REGULAR = 1, 3
+
+
+def add_assets(session, ids):
+    session.execute(insert(Asset), [
+        {
+            "id": i, "title": f"a{i}", "slug": f"a{i}", "thumbnail_url": "t",
+            "created_by": ROOT, "client_id": 1, "asset_type": "DOCUMENT",
+            "created_at": datetime(2024, 1, 1), "updated_at": datetime(2024, 1, 1),
+        }
+        for i in ids
+    ])
+    session.execute(insert(AssetsFolder), [{"asset_id": i, "folder_id": 1} for i in ids])
+    session.commit()
+
+
+def walk(client, url, key):
+    pages, cursor = [], None
+    while True:
+        response = client.get(url + (f"&cursor={cursor}" if cursor else ""))
+        assert response.status_code == 200, response.text
+        items = response.json() if key is None else response.json()[key]
+        pages.append([item["id"] for item in items])
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            return pages
+
+
+@pytest.mark.parametrize(
+    "url, key",
+    [
+        (f"/assets/?user_id={ROOT}&limit=5", None),
+        (f"/assets/?user_id={REGULAR}&limit=5", None),
+        (f"/folders/1?user_id={REGULAR}&limit=5", "assets"),
+    ],
+)
+def test_cursor_walks_every_asset_once(client, session, data, url, key):
+    add_assets(session, range(2, 13))
+
+    assert walk(client, url, key) == [[1, 2, 3, 4, 5], [6, 7, 8, 9, 10], [11, 12]]
+
+
+def test_cursor_skips_rows_deleted_between_pages(client, session, data):
+    add_assets(session, range(2, 8))
+    first = client.get(f"/assets/?user_id={REGULAR}&limit=3")
+    session.get(Asset, 4).is_deleted = True
+    session.commit()
+
+    second = client.get(
+        f"/assets/?user_id={REGULAR}&limit=3&cursor={first.headers['X-Next-Cursor']}"
+    )
+
+    assert [asset["id"] for asset in second.json()] == [5, 6, 7]
+
+
+def test_invalid_cursor_is_rejected(client, data):
+    assert client.get(f"/assets/?user_id={ROOT}&cursor=nope").status_code == 400
+
+
+@pytest.mark.parametrize("limit", [0, -1])
+def test_empty_page_has_no_cursor(session, data, limit):
+    assert paginate(session.query(Asset), Asset.id, limit=limit) == ([], None)
+
+
+@pytest.mark.parametrize("url", ["/assets/", "/folders/1"])
+def test_routes_reject_non_positive_limit(client, data, url):
+    assert client.get(f"{url}?user_id={ROOT}&limit=0").status_code == 422
+
+
+def best_of(runs, fetch):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fetch()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def test_page_depth_benchmark(session, data):
+    # Cursor pages seek on the primary key, so page 10,000 costs what page 1
+    # does; offset pages scan every row they skip.
+    limit, pages = 5, 10_000
+    add_assets(session, range(2, limit * pages + 2))
+    query = session.query(Asset).filter(Asset.is_deleted == False)
+    deep_cursor = encode_cursor(limit * (pages - 1))
+
+    first = best_of(20, lambda: paginate(query, Asset.id, limit))
+    cursor = best_of(20, lambda: paginate(query, Asset.id, limit, cursor=deep_cursor))
+    offset = best_of(5, lambda: paginate(query, Asset.id, limit, page=pages - 1))
+    print(f"\npage 1: {first * 1e3:.2f} ms, page {pages} by cursor: "
+          f"{cursor * 1e3:.2f} ms, by offset: {offset * 1e3:.2f} ms")
+
+    rows, _ = paginate(query, Asset.id, limit, cursor=deep_cursor)
+    assert [row.id for row in rows] == list(range(limit * (pages - 1) + 1, limit * pages + 1))
+    assert cursor < first * 3 + 0.002
+    assert offset > cursor
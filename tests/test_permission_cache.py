@@ -0,0 +1,86 @@
+from app.models.models import Feature, FeatureGroup, FeatureGroupsFeatureGroup
+from app.services import user as user_service
+from app.services.feature_group import rebuild_featureGroup_closure
+
+CORPORATE, REGULAR = 2, 3
+
+
+def slugs(user_id, session):
+    return user_service.resolve_user_permissions(user_id, session)[1]
+
+
+def test_restored_feature_reaches_members_of_enclosing_groups(session, data):
+    # Group 2 (with the "corporate" feature) becomes a child of group 3
+    session.add(FeatureGroupsFeatureGroup(parent_feature_group_id=3, child_feature_group_id=2))
+    session.commit()
+    rebuild_featureGroup_closure(session)
+    feature = session.get(Feature, 2)
+    feature.is_deleted = True
+    session.commit()
+    user_service._permission_cache.clear()
+    assert "corporate" not in slugs(CORPORATE, session)
+    assert "corporate" not in slugs(REGULAR, session)
+
+    feature.is_deleted = False
+    session.commit()
+
+    assert "corporate" in slugs(CORPORATE, session)
+    assert "corporate" in slugs(REGULAR, session)
+
+
+def test_feature_change_keeps_unrelated_users_cached(session, data):
+    slugs(1, session)
+    feature = session.get(Feature, 2)
+    feature.name = "Corporate"
+    session.commit()
+    assert user_service._permission_cache.get(1) is not None
+
+
+def nest(session, parent, child):
+    session.add(
+        FeatureGroupsFeatureGroup(parent_feature_group_id=parent, child_feature_group_id=child)
+    )
+    session.commit()
+    rebuild_featureGroup_closure(session)
+
+
+def test_deleted_direct_group_grants_nothing(session, data):
+    nest(session, 3, 2)
+    session.get(FeatureGroup, 3).is_deleted = True
+    session.commit()
+
+    assert slugs(REGULAR, session) == frozenset()
+    assert "corporate" in slugs(CORPORATE, session)
+
+
+def test_deleted_intermediate_group_cuts_the_path(session, data):
+    session.add(FeatureGroup(id=4, name="g4", client_id=1, deleted_by=0))
+    session.flush()
+    nest(session, 3, 4)
+    nest(session, 4, 2)
+    assert "corporate" in slugs(REGULAR, session)
+
+    group = session.get(FeatureGroup, 4)
+    group.is_deleted = True
+    session.commit()
+    assert "corporate" not in slugs(REGULAR, session)
+
+    group.is_deleted = False
+    session.commit()
+    assert "corporate" in slugs(REGULAR, session)
+
+
+def test_result_loaded_across_an_invalidation_is_not_cached(session, data, monkeypatch):
+    user_service._permission_cache.clear()
+    query = session.query
+
+    def query_then_commit(*entities):
+        # A concurrent request commits a change while this miss is loading
+        monkeypatch.setattr(session, "query", query)
+        user_service._permission_cache.invalidate(REGULAR)
+        return query(*entities)
+
+    monkeypatch.setattr(session, "query", query_then_commit)
+    slugs(REGULAR, session)
+
+    assert user_service._permission_cache.get(REGULAR) is None
@@ -0,0 +1,43 @@
+import pytest
+
+from app.services import user as user_service
+
+ROOT, CORPORATE, REGULAR = 1, 2, 3
+
+# Statements that resolve a user's feature groups and features
+MAX_FEATURE_RESOLUTIONS = 1
+
+
+def feature_resolutions(statements):
+    return [s for s in statements if "feature_groups_features" in s]
+
+
+REQUESTS = [
+    ("get", f"/assets/?user_id={REGULAR}", None),
+    ("get", f"/assets/1?user_id={REGULAR}", None),
+    ("get", f"/assets/search?q=a&user_id={CORPORATE}", None),
+    ("put", f"/assets/1?user_id={CORPORATE}", {"title": "b", "tags_ids": [1]}),
+    ("post", f"/assets/tags?user_id={CORPORATE}", {"assets_ids": [1], "add_tags_ids": [1]}),
+    ("get", f"/folders/1?user_id={REGULAR}", None),
+    ("get", f"/folders/tree?user_id={REGULAR}", None),
+    ("get", f"/tags/?user_id={CORPORATE}", None),
+    ("get", f"/users/all?user_id={CORPORATE}", None),
+    ("get", f"/users/all?user_id={ROOT}", None),
+]
+
+
+@pytest.mark.parametrize("method, url, body", REQUESTS)
+def test_permissions_resolved_at_most_once(client, data, statements, method, url, body):
+    statements.clear()
+    response = client.request(method, url, json=body)
+    assert response.status_code < 400, response.text
+    assert 1 <= len(feature_resolutions(statements)) <= MAX_FEATURE_RESOLUTIONS
+
+
+@pytest.mark.parametrize("method, url, body", REQUESTS)
+def test_cached_permissions_need_no_query(client, data, statements, method, url, body):
+    client.request(method, url, json=body)
+    statements.clear()
+    response = client.request(method, url, json=body)
+    assert response.status_code < 400, response.text
+    assert feature_resolutions(statements) == []
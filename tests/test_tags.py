@@ -0,0 +1,89 @@
+from app.models.models import Tag
+from app.schemas.tag import TagCreate, TagUpdate
+from app.services import tag_dictionary
+from app.services import tag as tag_service
+
+ROOT, REGULAR = 1, 3
+
+
+def test_root_defaults_to_own_client(client, data):
+    response = client.get(f"/tags/?user_id={ROOT}")
+
+    assert response.status_code == 200
+    assert [tag["id"] for tag in response.json()] == [1]
+
+
+def test_root_may_read_another_client(client, data):
+    response = client.get(f"/tags/?user_id={ROOT}&client_id=2")
+
+    assert response.status_code == 200
+    assert response.json() == []
+
+
+def test_other_users_are_kept_to_their_client(client, data):
+    assert client.get(f"/tags/?user_id={REGULAR}&client_id=2").status_code == 403
+
+
+def test_dictionary_loaded_across_a_tag_commit_is_not_cached(session, data, monkeypatch):
+    query = session.query
+
+    def query_then_commit(*entities):
+        # Another request renames the tag while the dictionary is loading
+        monkeypatch.setattr(session, "query", query)
+        rows = query(*entities)
+        session.get(Tag, 1).name = "renamed"
+        session.commit()
+        return rows
+
+    monkeypatch.setattr(session, "query", query_then_commit)
+    tag_dictionary.get_tag_dictionary(1, session)
+
+    assert tag_dictionary._tag_dictionaries.get(1) is None
+    assert tag_dictionary.get_tag_dictionary(1, session).suggest("ren")[0].id == 1
+
+
+def tag_queries(statements):
+    return [s for s in statements if s.lstrip().startswith("SELECT") and "FROM tags" in s]
+
+
+def test_tag_writes_patch_the_cached_dictionary(session, data, statements):
+    dictionary = tag_dictionary.get_tag_dictionary(1, session)
+    tag_service.create_tags(
+        [TagCreate(name=name, slug=name, client_id=1) for name in ("red", "rust", "blue")],
+        session,
+    )
+    tag_service.update_tag(1, TagUpdate(name="ruby", slug="ruby"), session)
+    tag_service.delete_tag(session.query(Tag).filter_by(name="blue").one(), session)
+    statements.clear()
+
+    patched = tag_dictionary.get_tag_dictionary(1, session)
+
+    assert patched is dictionary
+    # Only the stale tags are read back, with one query
+    assert len(tag_queries(statements)) == 1
+    assert "tags.id IN" in tag_queries(statements)[0]
+    assert [tag.name for tag in patched.suggest("r")] == ["red", "ruby", "rust"]
+    assert patched.suggest("t") == []
+    assert [tag.name for tag in patched.page(limit=10)[0]] == ["ruby", "red", "rust"]
+    # Same stamp as a dictionary loaded from scratch
+    tag_dictionary._tag_dictionaries.clear()
+    assert tag_dictionary.get_tag_dictionary(1, session).version == patched.version
+
+
+def test_unchanged_dictionary_is_served_without_queries(session, data, statements):
+    tag_dictionary.get_tag_dictionary(1, session)
+    statements.clear()
+
+    tag_dictionary.get_tag_dictionary(1, session)
+
+    assert tag_queries(statements) == []
+
+
+def test_other_clients_dictionaries_are_left_alone(session, data):
+    dictionary = tag_dictionary.get_tag_dictionary(1, session)
+    version = dictionary.version
+
+    tag_service.create_tags([TagCreate(name="x", slug="x", client_id=2)], session)
+
+    assert tag_dictionary.get_tag_dictionary(1, session).version == version
+    assert [tag.name for tag in tag_dictionary.get_tag_dictionary(2, session).suggest("x")] == ["x"]